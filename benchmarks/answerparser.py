@@ -0,0 +1,86 @@
+"""
+Throughput benchmark for `probcli.answerparser`.
+
+Builds synthetic `cbc_timed_solve_with_opts` answers with a single large
+`avl_set` binding and reports the parsing throughput for increasing answer
+sizes. Run with
+
+    python -m benchmarks.answerparser [<max size in MB>]
+
+A linear parser shows a roughly constant MB/s rate over all sizes.
+Afterwards, the dictionary and the compact term format are compared in
+parsing time, translation time via `Solver._translate_solution`, and peak
+memory.
+"""
+import sys
+import time
+import tracemalloc
+
+from probandit.solver import Solver
+from probcli.answerparser import parse_answer
+
+
+def avl_tree(lo, hi):
+    if lo > hi:
+        return 'empty'
+    mid = (lo + hi) // 2
+    return (f'node(int({mid}),true,0,'
+            f'{avl_tree(lo, mid - 1)},{avl_tree(mid + 1, hi)})')
+
+
+def solution_answer(n):
+    avl = avl_tree(1, n)
+    return ("yes([=('Res',solution([binding(x,avl_set(" + avl + "),"
+            "'{...}')])),=('Msec',42)])")
+
+
+def bench(answer, repeat=3, compact=False):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse_answer(answer, compact=compact)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compare_representations(n):
+    answer = solution_answer(n)
+    solver = Solver(path='bench', mock=True)
+    print(f'\nDictionary vs. compact terms for {n} elements '
+          f'({len(answer) / 1e6:.2f} MB)')
+    print(f"{'format':>10} {'parse (s)':>10} {'translate (s)':>14} "
+          f"{'peak (MB)':>10}")
+    for compact in (False, True):
+        tracemalloc.start()
+        _, info = parse_answer(answer, compact=compact)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        parse_secs = bench(answer, compact=compact)
+
+        start = time.perf_counter()
+        solver._translate_solution(info['Res'])
+        translate_secs = time.perf_counter() - start
+
+        label = 'compact' if compact else 'dict'
+        print(f'{label:>10} {parse_secs:10.3f} {translate_secs:14.3f} '
+              f'{peak / 1e6:10.2f}')
+
+
+def main(max_mb=8.0):
+    n = 1000
+    print(f"{'elements':>10} {'size (MB)':>10} {'time (s)':>10} {'MB/s':>8}")
+    while True:
+        answer = solution_answer(n)
+        size_mb = len(answer) / 1e6
+        if size_mb > max_mb:
+            break
+        secs = bench(answer)
+        print(f'{n:10d} {size_mb:10.2f} {secs:10.3f} {size_mb / secs:8.2f}')
+        n *= 2
+
+    compare_representations(100000)
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 8.0)
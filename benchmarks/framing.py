@@ -0,0 +1,58 @@
+"""
+Micro-benchmark for receiving large answers via `probcli.framing`.
+
+Sends answers of increasing size over a local socket pair and compares
+`FramedReader` against the former receive loop, which appended 1024 byte
+chunks to a bytes object and searched the whole buffer after each chunk.
+Run with
+
+    python -m benchmarks.framing [<max size in MB>]
+"""
+import socket
+import sys
+import threading
+import time
+
+from probcli.framing import FramedReader
+
+
+def naive_receive(sock, terminator):
+    data = b''
+    while True:
+        data += sock.recv(1024)
+        if terminator in data:
+            break
+    return data
+
+
+def framed_receive(sock, terminator):
+    return FramedReader(sock, terminator).receive()
+
+
+def bench(receive, size):
+    a, b = socket.socketpair()
+    with a, b:
+        payload = b'x' * size + b'\x01'
+        sender = threading.Thread(target=a.sendall, args=(payload,))
+        start = time.perf_counter()
+        sender.start()
+        receive(b, b'\x01')
+        secs = time.perf_counter() - start
+        sender.join()
+    return secs
+
+
+def main(max_mb=16.0):
+    print(f"{'size (MB)':>10} {'naive (s)':>10} {'framed (s)':>11} "
+          f"{'framed MB/s':>12}")
+    size = 1 << 18
+    while size / 1e6 <= max_mb:
+        naive = bench(naive_receive, size)
+        framed = bench(framed_receive, size)
+        print(f'{size / 1e6:10.2f} {naive:10.3f} {framed:11.4f} '
+              f'{size / 1e6 / framed:12.1f}')
+        size *= 4
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 16.0)
@@ -0,0 +1,212 @@
+"""
+Stand-in servers for probcli, the BParser and BanditFuzz.
+
+Each server listens on a free port of localhost and speaks the protocol of
+the real server closely enough for `ProBCli.connect`, `BParser` (via
+`acquire_parser` with a port) and `BFuzzer.connect` with an existing port.
+The answers are synthetic, but their size and latency are configurable,
+so that the client side of probandit can be measured without Java,
+SICStus or a ProB distribution:
+
+    with MockProBCli(latency=0.01, solution_size=1000) as cli_server:
+        solver = Solver('mock/probcli', id='mock', mock=True)
+        solver.with_cli_at(cli_server.port)
+
+Each connection is served in its own thread.
+"""
+from abc import ABC, abstractmethod
+import random
+import socket
+import threading
+import time
+
+from benchmarks.answerparser import avl_tree
+from probcli.framing import FramedReader
+
+
+class MockServer(ABC):
+    """
+    Serves requests delimited by `terminator` until the client halts or
+    disconnects. Subclasses implement `answer`.
+    """
+
+    terminator = b'\x00'
+
+    def __init__(self, latency=0.0):
+        """
+        Parameters
+        ----------
+        latency : float
+            Seconds the server waits before sending each answer.
+        """
+        self.latency = latency
+        self.requests = 0
+
+        self._lock = threading.Lock()
+        self._server = socket.create_server(('localhost', 0))
+        self.port = self._server.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    @abstractmethod
+    def answer(self, request):
+        """
+        Returns the answer to a request as bytes including its terminator,
+        or None to close the connection.
+        """
+
+    def close(self):
+        self._server.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:  # Closed
+                return
+            # Answers are sent right away, as by the real servers.
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._serve, args=(conn,),
+                             daemon=True).start()
+
+    def _serve(self, conn):
+        reader = FramedReader(conn, self.terminator)
+        with conn:
+            while True:
+                try:
+                    request = self._receive(reader)
+                except OSError:  # Includes ConnectionError
+                    return
+                answer = self.answer(request)
+                if answer is None:
+                    return
+                with self._lock:
+                    self.requests += 1
+                if self.latency:
+                    time.sleep(self.latency)
+                try:
+                    conn.sendall(answer)
+                except OSError:
+                    return
+
+    def _receive(self, reader):
+        return reader.receive().decode('utf-8').strip()
+
+
+class MockProBCli(MockServer):
+    """
+    Answers every query like `cbc_timed_solve_with_opts`, i.e. with a
+    solution binding `x` to a set of `solution_size` integers and a random
+    solving time, terminated by '\\x01'.
+    """
+
+    def __init__(self, latency=0.0, solution_size=1, msec=(10, 1000),
+                 seed=None):
+        """
+        Parameters
+        ----------
+        solution_size : int
+            Number of elements of the solution's set.
+        msec : tuple (int, int)
+            Range of the reported solving times in milliseconds.
+        seed : int
+            Seed of the reported solving times.
+        """
+        super().__init__(latency)
+        self.msec = msec
+        self._random = random.Random(seed)
+        pprint = '{...}' if solution_size else '{}'
+        self._solution = ("=('Res',solution([binding(x,avl_set("
+                          + avl_tree(1, solution_size) + f"),'{pprint}')]))")
+
+    def answer(self, request):
+        if request == 'halt.':
+            return None
+        with self._lock:
+            msec = self._random.randint(*self.msec)
+        answer = f"yes([{self._solution},=('Msec',{msec})])"
+        return answer.encode('utf-8') + b'\x01'
+
+
+class MockBParser(MockServer):
+    """
+    Answers each `predicate` command of the `-prepl` protocol with a Prolog
+    AST of `ast_size` conjuncts, one answer per line.
+    """
+
+    terminator = b'\n'
+
+    def __init__(self, latency=0.0, ast_size=1):
+        """
+        Parameters
+        ----------
+        ast_size : int
+            Number of conjuncts of the returned ASTs.
+        """
+        super().__init__(latency)
+        conjuncts = ','.join(['truth(none)'] * ast_size)
+        self._ast = f'conjunct(none,[{conjuncts}]).\n'.encode('utf-8')
+
+    def answer(self, request):
+        if request == 'halt':
+            return None
+        return self._ast
+
+    def _receive(self, reader):
+        command = super()._receive(reader)
+        if command == 'predicate':
+            return super()._receive(reader)
+        return command
+
+
+class MockBanditFuzz(MockServer):
+    """
+    Answers the requests of `BFuzzer` with distinct candidates of
+    `predicate_size` conjuncts. Answers are terminated by '\\x00'.
+    """
+
+    def __init__(self, latency=0.0, predicate_size=1,
+                 actions=('add_conjunct', 'swap_operator', 'new_literal')):
+        """
+        Parameters
+        ----------
+        predicate_size : int
+            Number of conjuncts of the candidates' predicates.
+        actions : list of str
+            The mutations returned by `list_actions`.
+        """
+        super().__init__(latency)
+        self.predicate_size = predicate_size
+        self.actions = list(actions)
+        self.candidates = 0
+        self._rand_state = [1, 1, 1, 1]
+
+    def answer(self, request):
+        if request.startswith('halt'):
+            return None
+        with self._lock:
+            if request.startswith(('generate(', 'mutate(')):
+                answer = self._candidate()
+            elif request.startswith('list_actions('):
+                answer = ','.join(self.actions)
+            elif request.startswith('getrand'):
+                answer = ','.join(map(str, self._rand_state))
+            elif request.startswith('setrand('):
+                args = request[len('setrand('):request.rindex(')')]
+                self._rand_state = [int(arg) for arg in args.split(',')]
+                answer = 'yes'
+            else:
+                raise ValueError(f'Unknown request: {request}')
+        return answer.encode('utf-8') + b'\x00'
+
+    def _candidate(self):
+        self.candidates += 1
+        n = self.candidates
+        self._rand_state[0] = self._rand_state[0] % 30268 + 1
+        pred = ' & '.join(f'x{i} = {n}' for i in range(self.predicate_size))
+        return f"Raw: pred({n})\nWD: '{pred}'\nEnv: env([])"
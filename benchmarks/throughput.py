@@ -0,0 +1,117 @@
+"""
+Throughput benchmark for the fuzzing loop and replay.
+
+Runs `run_bf` and `replay_results` against the stand-in servers of
+`benchmarks.mockservers` and reports iterations per second for
+increasing server latencies and answer sizes. As the stand-ins answer
+immediately apart from the configured latency, the results show the
+overhead of probandit itself: framing, answer parsing, translation,
+bookkeeping and the round trips to the servers. Run with
+
+    python -m benchmarks.throughput [<iterations>]
+"""
+import io
+import logging
+import sys
+import time
+
+from benchmarks.mockservers import MockBanditFuzz, MockBParser, MockProBCli
+from probandit.budget import Budget
+from probandit.fuzzing import BFuzzer
+from probandit.parsecache import shared_cache
+from probandit.replay import replay_results
+from probandit.solver import Solver
+from probandit.__main__ import run_bf, shutdown
+from probcli import ProBCli
+from probcli.bparser import acquire_parser, release_parser
+
+MOCK_PATH = 'mock/probcli'
+
+# (latency in ms, solution size)
+SCENARIOS = [(0, 1), (0, 1000), (0, 10000), (1, 1), (5, 1), (5, 1000)]
+
+
+class MockSetup():
+    """
+    Stand-in servers with a BFuzzer and target and reference solvers
+    connected to them.
+    """
+
+    def __init__(self, latency=0.0, solution_size=1, targets=1,
+                 references=1, seed=0):
+        self.cli_server = MockProBCli(latency, solution_size, seed=seed)
+        self.parser_server = MockBParser(latency)
+        self.bf_server = MockBanditFuzz(latency)
+
+        # The solvers' probcli instances share the connected parser.
+        self.parser = acquire_parser(ProBCli(MOCK_PATH).parser_path,
+                                     port=self.parser_server.port)
+
+        self.bfuzzer = BFuzzer('mock')
+        self.bfuzzer.connect(existing_port=self.bf_server.port)
+        self.bfuzzer.init_random_state()
+
+        self.targets = [self._solver(f'target{i}') for i in range(targets)]
+        self.references = [self._solver(f'reference{i}')
+                           for i in range(references)]
+
+    def close(self):
+        shutdown(self.bfuzzer, self.targets + self.references)
+        release_parser(self.parser)
+        for server in (self.cli_server, self.parser_server, self.bf_server):
+            server.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _solver(self, id):
+        solver = Solver(MOCK_PATH, id=id, mock=True)
+        solver.with_cli_at(self.cli_server.port)
+        return solver
+
+
+def bench_fuzzing(setup, iterations, **options):
+    """
+    Runs the fuzzing loop for the given number of iterations and returns
+    the iterations per second. Options are passed to `run_bf`.
+    """
+    budget = Budget(max_iterations=iterations)
+    start = time.perf_counter()
+    run_bf(setup.bfuzzer, setup.targets, setup.references, io.StringIO(),
+           budget=budget, **options)
+    return budget.iterations / (time.perf_counter() - start)
+
+
+def bench_replay(setup, iterations):
+    """
+    Replays the given number of generated benchmarks without restarting
+    the solvers and returns the benchmarks per second.
+    """
+    candidates = setup.bfuzzer.generate_many(iterations)
+    results = [{'pred': wd, 'margin': 100} for wd, _, _, _ in candidates]
+    shared_cache.clear()
+    start = time.perf_counter()
+    replay_results(results,
+                   {s.id: s for s in setup.targets},
+                   {s.id: s for s in setup.references},
+                   independent=False)
+    return len(results) / (time.perf_counter() - start)
+
+
+def main(iterations=200):
+    logging.getLogger().setLevel(logging.WARNING)
+    print(f"{'latency (ms)':>12} {'solution':>9} {'fuzzing (it/s)':>15} "
+          f"{'replay (it/s)':>14}")
+    for latency, solution_size in SCENARIOS:
+        with MockSetup(latency / 1000, solution_size) as setup:
+            fuzzing = bench_fuzzing(setup, iterations)
+            replay = bench_replay(setup, iterations)
+        print(f'{latency:12d} {solution_size:9d} {fuzzing:15.1f} '
+              f'{replay:14.1f}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
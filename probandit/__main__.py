@@ -1,12 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
+import argparse
 import logging
 from math import ceil
 import os
-import sys
+import random
 import yaml
 
 from probandit.agents import BfAgent
+from probandit.budget import Budget, stop_on_signals
+from probandit.campaign import run_campaign
+from probandit.checkpoint import load_checkpoint, save_checkpoint
 from probandit.fuzzing import BFuzzer
+from probandit.metrics import PhaseMetrics
+from probandit.prefetch import Prefetcher
+from probandit.racing import SolverRace
+from probandit.sampling import AdaptiveSampler, margin_variance
 from probandit.solver import Solver
+from probandit.store import ResultStore
+
+# Marks solvers whose evaluation was cut off by a SolverRace.
+CANCELLED = object()
 
 logging.basicConfig(
     level=logging.INFO,
@@ -15,33 +28,81 @@ logging.basicConfig(
 )
 
 
-def run_bf(bfuzzer, target_solvers, reference_solvers, csv, reset_after_solve=False):
-    samp_size = 1
-    for opt in bfuzzer.options:
-        if opt.startswith('samp_size('):
-            samp_size = int(opt.strip().split('(')[1][:-1])
-
-    pred, raw_ast, env, best_margin, results = bf_iteration(bfuzzer,
-                                                            None, None, None,
-                                                            target_solvers,
-                                                            reference_solvers,
-                                                            samp_size)
-
+def run_bf(bfuzzer, target_solvers, reference_solvers, csv, reset_after_solve=False,
+           timing_only=False, max_parallel=1, race=False, sampler=None,
+           use_raw_ast=False, verify_ast=0.0, prefetcher=None,
+           shared_stats=None, checkpoint=None, checkpoint_every=10,
+           resume=None, budget=None, metrics=None, store=None):
+    """
+    Runs the fuzzing loop, writing each new best candidate to csv.
+    The loop runs until the `Budget` is exhausted, or forever without one.
+    With `PhaseMetrics`, the phase durations of each iteration are recorded.
+    With a `ResultStore`, new best candidates and contradictions are also
+    stored there.
+
+    If a `checkpoint` path is given, the state of the loop is saved there
+    every `checkpoint_every` iterations. A state loaded from a checkpoint
+    can be passed as `resume` to continue a previous run instead of starting
+    with a generated candidate.
+    """
+    samp_size = sample_size(bfuzzer.options)
     sids = merged_solver_ids(target_solvers, reference_solvers)
-    write_results(csv, pred, raw_ast, results, best_margin, sids)
-
-    actions = bfuzzer.list_actions(env)
-
-    outer_agent = BfAgent(actions=['mutate', 'generate'])
-    inner_agent = BfAgent(actions=actions)
-
-    solution_filter = None
-    if 'solutions_only' in bfuzzer.options:
-        solution_filter = 'solutions_only'
-    elif 'min_one_solution' in bfuzzer.options:
-        solution_filter = 'min_one_solution'
+    solvers = target_solvers + reference_solvers
+
+    if resume:
+        pred, raw_ast, env = resume['pred'], resume['raw_ast'], resume['env']
+        best_margin = resume['best_margin']
+        actions = resume['actions']
+        iterations = resume['iterations']
+        bfuzzer.set_random_state(*resume['rand_state'])
+        logging.info("Resuming at iteration %d with best margin %dms",
+                     iterations, best_margin)
+    else:
+        solver_times = _solver_times(solvers)
+        pred, raw_ast, env, best_margin, results, sampling = bf_iteration(
+            bfuzzer, None, None, None, target_solvers, reference_solvers,
+            samp_size, timing_only=timing_only, max_parallel=max_parallel,
+            sampler=sampler, use_raw_ast=use_raw_ast, verify_ast=verify_ast,
+            prefetcher=prefetcher)
+        if budget:
+            budget.record(*(now - before for now, before
+                            in zip(_solver_times(solvers), solver_times)))
+
+        write_results(csv, pred, raw_ast, results, best_margin, sids,
+                      sampling=sampling if sampler else None)
+        if store:
+            store.add_benchmark(pred, raw_ast, results, best_margin,
+                                sampling=sampling if sampler else None)
+
+        actions = bfuzzer.list_actions(env)
+        iterations = 0
+
+    outer_agent = BfAgent(actions=['mutate', 'generate'],
+                          shared=shared_stats, name='outer')
+    inner_agent = BfAgent(actions=actions, shared=shared_stats, name='inner')
+    if resume:
+        outer_agent.set_state(resume['outer_agent'])
+        inner_agent.set_state(resume['inner_agent'])
+    if prefetcher:
+        prefetcher.agent = inner_agent
+
+    solution_filter = get_solution_filter(bfuzzer.options)
 
     while True:
+        stop_reason = budget.exhausted() if budget else None
+        if checkpoint and (stop_reason or iterations % checkpoint_every == 0):
+            save_checkpoint(checkpoint, {
+                'pred': pred, 'raw_ast': raw_ast, 'env': env,
+                'best_margin': best_margin, 'actions': actions,
+                'iterations': iterations,
+                'rand_state': bfuzzer.get_random_state(),
+                'outer_agent': outer_agent.get_state(),
+                'inner_agent': inner_agent.get_state()})
+            logging.debug("Saved checkpoint at iteration %d", iterations)
+        if stop_reason:
+            logging.info("Stopping the fuzzing loop: %s", stop_reason)
+            break
+
         outer_action = outer_agent.sample_action()
         if outer_action == 'mutate':
             mutation = inner_agent.sample_action()
@@ -50,65 +111,54 @@ def run_bf(bfuzzer, target_solvers, reference_solvers, csv, reset_after_solve=Fa
 
         logging.info("Action: (%s, %s)", outer_action, mutation)
 
-
+        solver_times = _solver_times(solvers)
         new_data = bf_iteration(bfuzzer, raw_ast, env, mutation,
                                 target_solvers, reference_solvers,
                                 samp_size=samp_size,
-                                reset_after_solve=reset_after_solve)
+                                reset_after_solve=reset_after_solve,
+                                timing_only=timing_only,
+                                max_parallel=max_parallel,
+                                best_margin=best_margin,
+                                race=race,
+                                sampler=sampler,
+                                use_raw_ast=use_raw_ast,
+                                verify_ast=verify_ast,
+                                prefetcher=prefetcher)
+
+        iterations += 1
+        if budget:
+            budget.record(*(now - before for now, before
+                            in zip(_solver_times(solvers), solver_times)))
+        if metrics:
+            metrics.end_iteration(iterations, action=mutation or 'generate',
+                                  skipped=new_data is None)
+        if iterations % 100 == 0:
+            if prefetcher:
+                prefetcher.report()
+            if metrics:
+                metrics.report()
 
         if new_data is None:
             logging.warning("Skipped iteration due to solver error")
             continue
-        new_pred, new_raw_ast, new_env, new_margin, results = new_data
-
-        # Check for contradictions
-        solutions = 0
-        contras = 0
-        for res in results.values():
-            if res[0] == 'yes':
-                if res[1][0] == 'solution':
-                    solutions += 1
-                elif res[1][0] == 'contradiction_found':
-                    contras += 1
-
-        if solutions > 0 and contras > 0:
-            yes_results = [f"{k}: {v[1][1]}"
-                            for k, v in results.items() if v[0] == 'yes']
-            yes_line = ', '.join(yes_results)
-            logging.warning("CONTRADICTION FOUND: %s; on %s", yes_line, new_pred)
-            with open('bf_contradictions.txt', 'a') as f:
-                f.write(f"{yes_line}; {new_pred}\n")
+        new_pred, new_raw_ast, new_env, new_margin, results, sampling = new_data
+
+        if is_contradiction(results, new_pred, store=store):
             continue
 
-        # Check if solution filter applies
-        filter_applies = False
-        if solution_filter:
-            yes_types = set()
-            for (answer, info, time) in results.values():
-                if answer == 'yes':
-                    typ = info[0]
-                    if solution_filter == 'solutions_only':
-                        if typ not in ['solution', 'contradiction_found']:
-                            filter_applies = True
-                    yes_types.add(info[0])
-                elif solution_filter == 'solutions_only':
-                    filter_applies = True
-
-            if solution_filter == 'min_one_solution':
-                has_contraduction = 'contradiction_found' in yes_types
-                has_solution = 'solution' in yes_types
-                if not (has_contraduction and has_solution):
-                    filter_applies = True
-
-            if filter_applies:
-                logging.info("Ignore results due to solution filter %s",
-                             solution_filter)
+        filter_applies = solution_filter_applies(results, solution_filter)
 
         if not filter_applies and new_margin > best_margin:
             logging.info("New best performance margin: %dms", new_margin)
             pred, raw_ast, env = new_pred, new_raw_ast, new_env
             best_margin = new_margin
-            write_results(csv, pred, raw_ast, results, best_margin, sids)
+            write_results(csv, pred, raw_ast, results, best_margin, sids,
+                          sampling=sampling if sampler else None)
+            if store:
+                store.add_benchmark(pred, raw_ast, results, best_margin,
+                                    sampling=sampling if sampler else None)
+            if budget:
+                budget.accept()
 
             reward = 1
         else:
@@ -119,36 +169,185 @@ def run_bf(bfuzzer, target_solvers, reference_solvers, csv, reset_after_solve=Fa
             inner_agent.receive_reward(mutation, reward)
 
 
-def bf_iteration(bfuzzer, raw_ast, env, mutation, target_solvers, reference_solvers,
-                 samp_size=1, reset_after_solve=False):
-    x, y, z, b = bfuzzer.get_random_state()
-    logging.info("Prolog RNG: random(%d,%d,%d,%d)", x, y, z, b)
+def _solver_times(solvers):
+    # Solving time reported by the solvers and wall-clock time of the solver
+    # calls, summed over all solvers.
+    return (sum(solver.reported_time for solver in solvers),
+            sum(solver.wall_time for solver in solvers))
 
-    try:
+
+def sample_size(options):
+    """
+    Returns the number of samples per solver set by the BanditFuzz option
+    samp_size(N), or 1.
+    """
+    samp_size = 1
+    for opt in options:
+        if opt.startswith('samp_size('):
+            samp_size = int(opt.strip().split('(')[1][:-1])
+    return samp_size
+
+
+def get_solution_filter(options):
+    if 'solutions_only' in options:
+        return 'solutions_only'
+    elif 'min_one_solution' in options:
+        return 'min_one_solution'
+    return None
+
+
+def is_contradiction(results, pred, store=None):
+    """
+    Checks whether some solvers found a solution and others a contradiction.
+    Contradictions are logged to bf_contradictions.txt and, if given, the
+    `ResultStore`.
+    """
+    solutions = 0
+    contras = 0
+    for res in results.values():
+        if res[0] == 'yes':
+            if res[1][0] == 'solution':
+                solutions += 1
+            elif res[1][0] == 'contradiction_found':
+                contras += 1
+
+    if solutions > 0 and contras > 0:
+        yes_results = [f"{k}: {v[1][1]}"
+                        for k, v in results.items() if v[0] == 'yes']
+        yes_line = ', '.join(yes_results)
+        logging.warning("CONTRADICTION FOUND: %s; on %s", yes_line, pred)
+        with open('bf_contradictions.txt', 'a') as f:
+            f.write(f"{yes_line}; {pred}\n")
+        if store:
+            store.add_contradiction(pred, results)
+        return True
+    return False
+
+
+def solution_filter_applies(results, solution_filter):
+    """
+    Checks whether the results are to be ignored due to the solution filter.
+    """
+    filter_applies = False
+    if solution_filter:
+        yes_types = set()
+        for (answer, info, time) in results.values():
+            if answer == 'yes':
+                typ = info[0]
+                if solution_filter == 'solutions_only':
+                    if typ not in ['solution', 'contradiction_found']:
+                        filter_applies = True
+                yes_types.add(info[0])
+            elif solution_filter == 'solutions_only':
+                filter_applies = True
+
+        if solution_filter == 'min_one_solution':
+            has_contraduction = 'contradiction_found' in yes_types
+            has_solution = 'solution' in yes_types
+            if not (has_contraduction and has_solution):
+                filter_applies = True
+
+        if filter_applies:
+            logging.info("Ignore results due to solution filter %s",
+                         solution_filter)
+    return filter_applies
+
+
+def bf_iteration(bfuzzer, raw_ast, env, mutation, target_solvers, reference_solvers,
+                 samp_size=1, reset_after_solve=False, timing_only=False,
+                 max_parallel=1, best_margin=None, race=False, sampler=None,
+                 use_raw_ast=False, verify_ast=0.0, prefetcher=None):
+    """
+    Generates or mutates a candidate predicate and evaluates it with all
+    solvers.
+
+    Returns None if the iteration failed, else a tuple
+    (pred, raw_ast, env, margin, results, sampling), where sampling is a
+    pair of the number of samples per solver and the variance of the
+    sampled margins (None if the samples were not taken in rounds).
+
+    With `race`, the evaluation is cut off once the candidate cannot beat
+    `best_margin`. With an `AdaptiveSampler`, the number of samples is
+    chosen adaptively instead of `samp_size`; racing is not applied then.
+
+    With `use_raw_ast`, the solvers are given the fuzzer's raw AST instead
+    of parsing the predicate. A fraction `verify_ast` of the candidates is
+    cross-checked first; on a mismatch the candidate is parsed instead.
+
+    With a `Prefetcher`, the candidate is taken from it if it was prefetched,
+    and the candidates of the next iteration are prefetched while solving.
+    """
+    best_raw_ast, best_env = raw_ast, env
+
+    candidate = None
+    if prefetcher:
         if mutation == None:
-            pred, raw_ast, env = bfuzzer.generate()
+            candidate = prefetcher.generate()
         else:
-            pred, raw_ast, env = bfuzzer.mutate(raw_ast, env, mutation)
-    except TimeoutError:
-        logging.error("Timeout error for mutation '%s'", mutation)
-        bfuzzer.restart()
-        return None
+            candidate = prefetcher.mutate(raw_ast, env, mutation)
+
+    if candidate:
+        pred, raw_ast, env = candidate
+    else:
+        # The RNG state is requested within the same round trip.
+        try:
+            if mutation == None:
+                [(pred, raw_ast, env, rand_state)] = bfuzzer.generate_many(1)
+            else:
+                [(pred, raw_ast, env, rand_state)] = bfuzzer.mutate_many(
+                    raw_ast, env, [mutation])
+        except TimeoutError:
+            logging.error("Timeout error for mutation '%s'", mutation)
+            bfuzzer.restart()
+            return None
+        logging.info("Prolog RNG: random(%d,%d,%d,%d)", *rand_state)
+
+    if prefetcher:
+        prefetcher.prefetch(best_raw_ast, best_env)
 
     logging.info("Next predicate: %s", pred)
     logging.info("Raw AST: %s", raw_ast)
 
     discard_socket_timeouts = 'solutions_only' in bfuzzer.options
 
-    ref_results = eval_solvers(reference_solvers, pred, samp_size,
-                               reset_after_solve=reset_after_solve,
-                               discard_socket_timeouts=discard_socket_timeouts)
-    if ref_results is None:
-        return None
-    tar_results = eval_solvers(target_solvers, pred, samp_size,
-                               reset_after_solve=reset_after_solve,
-                               discard_socket_timeouts=discard_socket_timeouts)
-    if tar_results is None:
-        return None
+    ast = None
+    if use_raw_ast:
+        ast = raw_ast
+        if verify_ast and random.random() < verify_ast:
+            checker = (reference_solvers + target_solvers)[0]
+            if not cross_check_ast(checker, pred, raw_ast,
+                                   reset_after_solve=reset_after_solve):
+                ast = None  # Fall back to parsing this candidate.
+
+    if sampler:
+        evaluation = eval_adaptive(target_solvers, reference_solvers, pred,
+                                   sampler, best_margin,
+                                   reset_after_solve=reset_after_solve,
+                                   discard_socket_timeouts=discard_socket_timeouts,
+                                   timing_only=timing_only,
+                                   max_parallel=max_parallel,
+                                   ast=ast)
+        if evaluation is None:
+            return None
+        solver_results, margins = evaluation
+        ref_results = {s.id: solver_results[s.id] for s in reference_solvers}
+        tar_results = {s.id: solver_results[s.id] for s in target_solvers}
+        sampling = (len(margins), margin_variance(margins))
+        logging.info("Adaptive sampling: %d samples, margin variance %.1f",
+                     *sampling)
+    else:
+        ref_results, tar_results = eval_fixed(target_solvers,
+                                              reference_solvers, pred,
+                                              samp_size, best_margin,
+                                              reset_after_solve=reset_after_solve,
+                                              discard_socket_timeouts=discard_socket_timeouts,
+                                              timing_only=timing_only,
+                                              max_parallel=max_parallel,
+                                              race=race,
+                                              ast=ast)
+        if ref_results is None:
+            return None
+        sampling = (samp_size, None)
 
     report_results(ref_results, label='Reference')
     report_results(tar_results, label='Target')
@@ -161,40 +360,257 @@ def bf_iteration(bfuzzer, raw_ast, env, mutation, target_solvers, reference_solv
 
     solver_results = ref_results | tar_results
 
-    return pred, raw_ast, env, new_performance_margin, solver_results
+    return pred, raw_ast, env, new_performance_margin, solver_results, sampling
+
+
+def eval_fixed(target_solvers, reference_solvers, pred, samp_size,
+               best_margin=None, reset_after_solve=False,
+               discard_socket_timeouts=True, timing_only=False,
+               max_parallel=1, race=False, ast=None):
+    """
+    Evaluates a predicate with `samp_size` samples per solver.
+    Returns a pair of the reference and the target results, or (None, None)
+    if the evaluation failed.
+    """
+    # With a known best margin, the evaluation is cut off as soon as the
+    # candidate provably cannot beat it.
+    if race and best_margin is not None:
+        race = SolverRace([s.id for s in target_solvers], best_margin)
+    else:
+        race = None
+
+    if max_parallel > 1:
+        # References and targets are solved concurrently.
+        all_results = eval_solvers(reference_solvers + target_solvers, pred,
+                                   samp_size,
+                                   reset_after_solve=reset_after_solve,
+                                   discard_socket_timeouts=discard_socket_timeouts,
+                                   timing_only=timing_only,
+                                   max_parallel=max_parallel,
+                                   race=race,
+                                   ast=ast)
+        if all_results is None:
+            return None, None
+        ref_results = {s.id: all_results[s.id] for s in reference_solvers
+                       if s.id in all_results}
+        tar_results = {s.id: all_results[s.id] for s in target_solvers
+                       if s.id in all_results}
+    else:
+        ref_results = eval_solvers(reference_solvers, pred, samp_size,
+                                   reset_after_solve=reset_after_solve,
+                                   discard_socket_timeouts=discard_socket_timeouts,
+                                   timing_only=timing_only,
+                                   race=race,
+                                   ast=ast)
+        if ref_results is None:
+            return None, None
+        tar_results = eval_solvers(target_solvers, pred, samp_size,
+                                   reset_after_solve=reset_after_solve,
+                                   discard_socket_timeouts=discard_socket_timeouts,
+                                   timing_only=timing_only,
+                                   race=race,
+                                   ast=ast)
+        if tar_results is None:
+            return None, None
+
+    if race:
+        race.report()
+
+    return ref_results, tar_results
+
+
+def eval_adaptive(target_solvers, reference_solvers, pred, sampler,
+                  best_margin=None, reset_after_solve=False,
+                  discard_socket_timeouts=True, timing_only=False,
+                  max_parallel=1, ast=None):
+    """
+    Evaluates a predicate in rounds of one sample per solver until the
+    `AdaptiveSampler` needs no more samples.
+    Returns a pair of the results per solver, with times averaged over all
+    rounds, and the margin of each round; or None if the evaluation failed.
+    """
+    solvers = reference_solvers + target_solvers
+    times = {s.id: [] for s in solvers}
+    first_results = None
+    margins = []
+    while True:
+        results = eval_solvers(solvers, pred, samp_size=1,
+                               reset_after_solve=reset_after_solve,
+                               discard_socket_timeouts=discard_socket_timeouts,
+                               timing_only=timing_only or bool(margins),
+                               max_parallel=max_parallel,
+                               ast=ast)
+        if results is None:
+            return None
+        if first_results is None:
+            first_results = results
+        for solver_id, (_, _, time) in results.items():
+            times[solver_id].append(time)
+
+        ref_time = max(results[s.id][2] for s in reference_solvers)
+        tar_time = min(results[s.id][2] for s in target_solvers)
+        margins.append(tar_time - ref_time)
+
+        if not sampler.needs_more(margins, best_margin):
+            break
+
+    solver_results = {}
+    for solver_id, (answer, info, _) in first_results.items():
+        solver_times = times[solver_id]
+        solver_results[solver_id] = (answer, info,
+                                     ceil(sum(solver_times) / len(solver_times)))
+    return solver_results, margins
 
 
 def eval_solvers(solvers: list[Solver], pred, samp_size=1, par2=True,
                  reset_after_solve=False,
-                 discard_socket_timeouts=True):
+                 discard_socket_timeouts=True,
+                 timing_only=False,
+                 max_parallel=1,
+                 race=None,
+                 ast=None):
+    """
+    Solves the predicate with each solver and returns a dictionary mapping
+    the solver ids to their (answer, info, time) results, or None if the
+    evaluation failed.
+
+    If max_parallel is greater than 1, up to that many solvers are run
+    concurrently. Each solver has its own probcli process, so the results
+    are the same as for sequential solving.
+
+    If a `SolverRace` is given, solvers are skipped or interrupted once the
+    race is cut off; their ids are missing in the returned dictionary.
+
+    If a Prolog AST of the predicate is given, the solvers use it instead of
+    parsing the predicate.
+    """
+    solvers = list(solvers)
+
+    def evaluate(solver):
+        return _eval_solver(solver, pred, samp_size, par2=par2,
+                            reset_after_solve=reset_after_solve,
+                            discard_socket_timeouts=discard_socket_timeouts,
+                            timing_only=timing_only,
+                            race=race,
+                            ast=ast)
+
+    if max_parallel > 1 and len(solvers) > 1:
+        workers = min(max_parallel, len(solvers))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            outcomes = list(pool.map(evaluate, solvers))
+    else:
+        outcomes = []
+        for solver in solvers:
+            outcome = evaluate(solver)
+            if outcome is None:
+                return None
+            outcomes.append(outcome)
+
     results = {}
-    for solver in solvers:
-        try:
-            logging.debug("Solving with %s, 1/%d", solver.id, samp_size)
-            answer, info, time = solver.solve(pred, par2=par2)
-            if reset_after_solve: solver.restart()
-            if samp_size > 1:
-                time_sum = time
-                for i in range(samp_size - 1):
-                    logging.debug("Solving again, %d/%d", i+2, samp_size)
-                    _, _, new_time = solver.solve(pred, par2=par2)
-                    time_sum += new_time
-                    if reset_after_solve: solver.restart()
-                time = ceil(time_sum / samp_size)
-            results[solver.id] = (answer, info, time)
-        except ValueError as e:
-            logging.error("Parse error for %s over %s: %s", solver.id, pred, e)
+    for solver, outcome in zip(solvers, outcomes):
+        if outcome is None:
             return None
-        except TimeoutError as e:
-            logging.error("Timeout error for %s over %s", solver.id, pred)
-            solver.restart()  # Restart the solver to avoid further errors.
-            time = solver.cli.SOCKET_TIMEOUT
+        if outcome is not CANCELLED:
+            results[solver.id] = outcome
+    return results
 
-            if not discard_socket_timeouts:
-                results[solver.id] = ('no', 'Socket timeout', time)
-            else:
+
+def _eval_solver(solver, pred, samp_size=1, par2=True,
+                 reset_after_solve=False,
+                 discard_socket_timeouts=True,
+                 timing_only=False,
+                 race=None,
+                 ast=None):
+    # Returns the (answer, info, time) result of one solver, None if the
+    # evaluation has to be discarded, or CANCELLED if a race was cut off.
+    def solve(sample):
+        # Solves once; returns None if the solver was interrupted.
+        if race and not race.start_solve(solver):
+            race.skip(samp_size - sample)
+            return None
+        try:
+            result = solver.solve(pred, par2=par2,
+                                  timing_only=timing_only or sample > 0,
+                                  ast=ast)
+        except (ValueError, TimeoutError):
+            if race and race.end_solve(solver):
+                solver.restart()  # Interrupted; reset the solver state.
                 return None
-    return results
+            raise
+        if race and race.end_solve(solver, result[2]):
+            solver.restart()  # Interrupted; reset the solver state.
+            return None
+        if reset_after_solve: solver.restart()
+        return result
+
+    try:
+        logging.debug("Solving with %s, 1/%d", solver.id, samp_size)
+        result = solve(0)
+        if result is None:
+            return CANCELLED
+        answer, info, time = result
+        if samp_size > 1:
+            time_sum = time
+            for i in range(samp_size - 1):
+                logging.debug("Solving again, %d/%d", i+2, samp_size)
+                result = solve(i + 1)
+                if result is None:
+                    return CANCELLED
+                time_sum += result[2]
+            time = ceil(time_sum / samp_size)
+        if race:
+            race.finish(solver.id, time)
+        return (answer, info, time)
+    except ValueError as e:
+        logging.error("Parse error for %s over %s: %s", solver.id, pred, e)
+        return None
+    except TimeoutError as e:
+        logging.error("Timeout error for %s over %s", solver.id, pred)
+        solver.restart()  # Restart the solver to avoid further errors.
+        time = solver.cli.SOCKET_TIMEOUT
+
+        if not discard_socket_timeouts:
+            result = ('no', 'Socket timeout', time)
+            if race:
+                race.finish(solver.id, time)
+            return result
+        return None
+
+
+def cross_check_ast(solver, pred, raw_ast, reset_after_solve=False):
+    """
+    Solves the predicate once after parsing it and once from the raw AST
+    and returns whether both answers agree. Timeouts are inconclusive and
+    count as agreement. Mismatches are logged to bf_ast_mismatches.txt.
+    With `reset_after_solve`, the solver is restarted after each solve, so
+    that the check does not warm it up for the measured solves.
+    """
+    outcomes = []
+    for ast in (None, raw_ast):
+        try:
+            answer, info, _ = solver.solve(pred, timing_only=True, ast=ast)
+        except ValueError as e:
+            answer, info = f'error: {e}', None
+        except TimeoutError:
+            solver.restart()
+            return True
+        if reset_after_solve: solver.restart()
+        if answer == 'yes':
+            answer = info[0]
+        if answer == 'time_out':
+            return True
+        outcomes.append(answer)
+
+    parsed_outcome, raw_outcome = outcomes
+    if parsed_outcome == raw_outcome:
+        logging.debug("AST check passed for %s: %s", solver.id, raw_outcome)
+        return True
+
+    logging.warning("AST MISMATCH: parsed %s, raw %s; on %s",
+                    parsed_outcome, raw_outcome, pred)
+    with open('bf_ast_mismatches.txt', 'a') as f:
+        f.write(f"{parsed_outcome}; {raw_outcome}; {pred}; {raw_ast}\n")
+    return False
 
 
 def report_results(results, label='Results'):
@@ -207,18 +623,30 @@ def report_results(results, label='Results'):
     logging.info(f"{label}: {result_line}")
 
 
-def write_results(csv, pred, raw_ast, results, margin, sids):
+def write_results(csv, pred, raw_ast, results, margin, sids, sampling=None):
+    """
+    Writes a result line to the CSV: the margin, the time of each solver
+    (empty if it has no result), optionally the sampling statistics, and
+    the quoted predicate and raw AST. Quotes within them are doubled.
+    """
     line = f"{margin},"
     for sid in sids:
         if sid in results:
             line += f"{results[sid][2]},"
         else:
             line += ","
-    line += f"\"{pred}\",\"{raw_ast}\"\n"
+    if sampling:
+        samples, variance = sampling
+        line += f"{samples},{variance:.2f},"
+    line += f"{_quote(pred)},{_quote(raw_ast)}\n"
     csv.write(line)
     csv.flush()
 
 
+def _quote(value):
+    return '"' + str(value).replace('"', '""') + '"'
+
+
 def correct_bf_path(bf_path):
     if not os.path.exists(bf_path):
         raise ValueError(
@@ -239,55 +667,229 @@ def merged_solver_ids(target_solvers, reference_solvers):
     return sorted(sids)
 
 
-if __name__ == '__main__':
-    # First argument is the config file path
-    if len(sys.argv) < 2:
-        print("Usage: python probandit.py <config_file> [<target_csv>]")
-        sys.exit(1)
-
-    config_file = sys.argv[1]
-    config = yaml.safe_load(open(config_file, 'r'))
-
-    if len(sys.argv) > 2:
-        config['fuzzer']['csv'] = sys.argv[2]
+def csv_header(config):
+    """
+    Returns the header line of the result CSV for the configuration.
+    """
+    sids = sorted(config['fuzzer']['targets'] + config['fuzzer']['references'])
+    header = 'margin,'
+    header += ','.join(sids)
+    if config['fuzzer'].get('adaptive_sampling', False):
+        header += ',samples,variance'
+    header += ',pred,raw_ast\n'
+    return header
+
+
+def run_config(config, csv, rand_state=None, shared_stats=None,
+               checkpoint=None, resume=False, metrics=None, store=None):
+    """
+    Starts BanditFuzz and the solvers of the configuration and runs the
+    fuzzing loop, writing the results (without header) to csv.
+
+    Parameters
+    ----------
+    rand_state : tuple (x, y, z, b)
+        Initial state of BanditFuzz' random number generator. Random if
+        not given.
+    shared_stats : tuple (dict, lock)
+        Bandit statistics shared with other fuzzing loops, see `BfAgent`.
+    checkpoint : str
+        Path of the checkpoint file, or None for no checkpoints.
+    resume : bool
+        If set, the fuzzing loop resumes from the checkpoint file.
+    metrics : str
+        Path of the file to which phase metrics are written, or None for no
+        metrics.
+    store : str
+        Path of the `ResultStore` database to which the results are also
+        written, or None for no store.
+    """
+    state = None
+    if resume and checkpoint:
+        if os.path.exists(checkpoint):
+            state = load_checkpoint(checkpoint)
+        else:
+            logging.warning("No checkpoint at %s; starting afresh", checkpoint)
+
+    budget = Budget(max_time=config['fuzzer'].get('max_time', None),
+                    max_iterations=config['fuzzer'].get('max_iterations', None),
+                    max_solver_time=config['fuzzer'].get('max_solver_time',
+                                                         None),
+                    max_solver_wall_time=config['fuzzer'].get(
+                        'max_solver_wall_time', None))
+    stop_on_signals(budget)
+
+    phase_metrics = None
+    result_store = None
+    started = None
+    try:
+        if metrics:
+            phase_metrics = PhaseMetrics(metrics, append=resume)
+            phase_metrics.instrument()
 
+        if store:
+            result_store = ResultStore(store)
+            result_store.start_run(config)
 
+        started = setup_config(config, rand_state)
+        bfuzzer, target_solvers, reference_solvers, options = started
+        run_bf(bfuzzer, target_solvers, reference_solvers, csv,
+               shared_stats=shared_stats, checkpoint=checkpoint,
+               checkpoint_every=config['fuzzer'].get('checkpoint_every', 10),
+               resume=state, budget=budget, metrics=phase_metrics,
+               store=result_store, **options)
+    finally:
+        csv.flush()
+        if phase_metrics:
+            phase_metrics.report()
+            phase_metrics.close()
+        if started:
+            shutdown(bfuzzer, target_solvers + reference_solvers,
+                     options['prefetcher'])
+        budget.summary()
+        if result_store:
+            result_store.end_run(iterations=budget.iterations,
+                                 accepted=budget.accepted,
+                                 elapsed=budget.elapsed())
+            result_store.close()
+
+
+def shutdown(bfuzzer, solvers, prefetcher=None):
+    """
+    Closes all solvers and BanditFuzz instances, logging but otherwise
+    ignoring errors, so that no processes are left behind.
+    """
+    for solver in solvers:
+        try:
+            solver.close()
+        except Exception as e:
+            logging.warning("Error while closing solver %s: %s", solver.id, e)
+    if prefetcher:
+        try:
+            prefetcher.close()
+        except Exception as e:
+            logging.warning("Error while closing the prefetcher: %s", e)
+    try:
+        bfuzzer.disconnect()
+    except Exception as e:
+        logging.warning("Error while closing BanditFuzz: %s", e)
+
+
+def setup_config(config, rand_state=None):
+    """
+    Starts BanditFuzz and the solvers of the configuration.
+    Returns a tuple (bfuzzer, target_solvers, reference_solvers, options),
+    where options are the keyword arguments of `bf_iteration` and `run_bf`
+    set by the configuration. If starting fails, whatever was started is
+    closed again before the error is raised.
+    """
     bf_path = os.path.expandvars(config['fuzzer']['path'])
     bf_path = correct_bf_path(bf_path)
     logging.info(f"Using BanditFuzzer at {bf_path}")
 
-    bfuzzer = BFuzzer(bf_path=bf_path,
-                      options=config['fuzzer'].get('options', []))
+    sampler = None
+    adaptive = config['fuzzer'].get('adaptive_sampling', False)
+    if adaptive:
+        sampler = AdaptiveSampler(**(adaptive if isinstance(adaptive, dict)
+                                     else {}))
 
-    port = config['fuzzer'].get('port', None)
-    bfuzzer.connect(existing_port=port)
-    bfuzzer.init_random_state()
+    reset_after_solve = config['fuzzer'].get('independent', False)
+    timing_only = config['fuzzer'].get('timing_only', False)
+    max_parallel = config['fuzzer'].get('max_parallel', 1)
+    race = config['fuzzer'].get('race', False)
+    use_raw_ast = config['fuzzer'].get('solve_raw_ast', False)
+    verify_ast = config['fuzzer'].get('verify_raw_ast', 0.0)
 
+    bfuzzer = BFuzzer(bf_path=bf_path,
+                      options=config['fuzzer'].get('options', []))
+    started = []  # Solvers which were started
+    prefetcher = None
+    try:
+        port = config['fuzzer'].get('port', None)
+        bfuzzer.connect(existing_port=port)
+        if rand_state:
+            bfuzzer.set_random_state(*rand_state)
+        else:
+            bfuzzer.init_random_state()
+
+        target_is = config['fuzzer']['targets']
+        target_solvers = [Solver(id=id, **(config['solvers'][id]))
+                          for id in target_is]
+        reference_is = config['fuzzer']['references']
+        reference_solvers = [Solver(id=id, **(config['solvers'][id]))
+                             for id in reference_is]
+        for solver in target_solvers + reference_solvers:
+            logging.info('Starting solver %s', solver.id)
+            solver.start()
+            started.append(solver)
+
+        prefetch = config['fuzzer'].get('prefetch', False)
+        if prefetch:
+            mutations = (prefetch.get('mutations', 0)
+                         if isinstance(prefetch, dict) else 0)
+            prefetcher = Prefetcher(
+                BFuzzer(bf_path=bf_path,
+                        options=config['fuzzer'].get('options', [])),
+                mutations=mutations)
+            prefetcher.bfuzzer.connect()
+            prefetcher.bfuzzer.init_random_state()
+    except BaseException:
+        # Stop what was started, so that no processes are left behind.
+        shutdown(bfuzzer, started, prefetcher)
+        raise
+
+    options = dict(reset_after_solve=reset_after_solve,
+                   timing_only=timing_only,
+                   max_parallel=max_parallel,
+                   race=race,
+                   sampler=sampler,
+                   use_raw_ast=use_raw_ast,
+                   verify_ast=verify_ast,
+                   prefetcher=prefetcher)
+    return bfuzzer, target_solvers, reference_solvers, options
 
-    target_is = config['fuzzer']['targets']
-    target_solvers = [Solver(id=id, **(config['solvers'][id]))
-                      for id in target_is]
-    for solver in target_solvers:
-        logging.info('Starting solver %s', solver.id)
-        solver.start()
 
-    reference_is = config['fuzzer']['references']
-    reference_solvers = [Solver(id=id, **(config['solvers'][id]))
-                         for id in reference_is]
-    for solver in reference_solvers:
-        logging.info('Starting solver %s', solver.id)
-        solver.start()
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m probandit',
+                                     description='External BanditFuzz for ProB.')
+    parser.add_argument('config', help='The configuration file.')
+    parser.add_argument('csv', nargs='?', default=None,
+                        help='The target CSV file.')
+    parser.add_argument('--resume', action='store_true',
+                        help='Resume from the checkpoint of a previous run '
+                             'and append to its CSV file.')
+    parser.add_argument('--checkpoint', default=None,
+                        help='The checkpoint file. Defaults to the CSV file '
+                             'name with the suffix .checkpoint.json.')
+    args = parser.parse_args()
+
+    config = yaml.safe_load(open(args.config, 'r'))
+
+    if args.csv:
+        config['fuzzer']['csv'] = args.csv
 
     outfile = config['fuzzer'].get('csv', 'results.csv')
-
-    with open(outfile, 'w') as csv:
-        sids = merged_solver_ids(target_solvers, reference_solvers)
-        header = 'margin,'
-        header += ','.join(sids)
-        header += ',pred,raw_ast\n'
-        csv.write(header)
-        csv.flush()
-
-        reset_after_solve = config['fuzzer'].get('independent', False)
-        run_bf(bfuzzer, target_solvers, reference_solvers, csv,
-               reset_after_solve=reset_after_solve)
+    checkpoint = (args.checkpoint or config['fuzzer'].get('checkpoint', None)
+                  or outfile + '.checkpoint.json')
+    metrics = config['fuzzer'].get('metrics', False)
+    if metrics is True:
+        metrics = outfile + '.metrics.jsonl'
+    store = config['fuzzer'].get('store', False)
+    if store is True:
+        store = os.path.splitext(outfile)[0] + '.db'
+
+    workers = config['fuzzer'].get('workers', 1)
+    if workers > 1:
+        run_campaign(config, outfile, workers,
+                     share_stats=config['fuzzer'].get('share_stats', False),
+                     pin_cpus=config['fuzzer'].get('pin_cpus', True),
+                     checkpoint=checkpoint, resume=args.resume,
+                     metrics=metrics or None, store=store or None)
+    else:
+        resume = args.resume and os.path.exists(outfile)
+        with open(outfile, 'a' if resume else 'w') as csv:
+            if not resume:
+                csv.write(csv_header(config))
+                csv.flush()
+            run_config(config, csv, checkpoint=checkpoint, resume=args.resume,
+                       metrics=metrics or None, store=store or None)
@@ -3,17 +3,29 @@ import numpy as np
 
 class BfAgent:
 
-    def __init__(self, actions: list) -> None:
+    def __init__(self, actions: list, shared=None, name='') -> None:
         """
         Parameters
         ----------
         actions: List of action names.
+        shared: Optional pair (stats, lock) of a dictionary and a lock
+            shared between processes, e.g. created by a
+            multiprocessing.Manager. If given, the statistics of the actions
+            are kept in the dictionary, so that all agents with the same name
+            learn from each other's rewards.
+        name: Name of the agent, distinguishing its statistics from those
+            of other agents in the shared dictionary.
         """
         self.actions = actions
         self.agents = {}
 
         for action in actions:
-            self.agents[action] = ThompsonSampling()
+            if shared:
+                stats, lock = shared
+                self.agents[action] = SharedThompsonSampling(
+                    stats, f'{name}:{action}', lock)
+            else:
+                self.agents[action] = ThompsonSampling()
 
     def sample_action(self):
         """
@@ -35,9 +47,41 @@ class BfAgent:
         """
         self.agents[last_action].receive_reward(reward)
 
+    def likely_actions(self, k):
+        """
+        Returns the k actions with the highest expected reward, i.e. the
+        actions most likely to be sampled next. Does not sample.
+        """
+        def expected_reward(action):
+            a, b = self.agents[action].get_ab()
+            return a / (a + b)
+
+        return sorted(self.actions, key=expected_reward, reverse=True)[:k]
+
     def get_actions(self):
         return self.actions
 
+    def get_state(self):
+        """
+        Returns
+        -------
+        state: Dictionary mapping each action to the statistics (a, b) of
+            its Thompson sampling.
+        """
+        return {action: self.agents[action].get_state()
+                for action in self.actions}
+
+    def set_state(self, state):
+        """
+        Parameters
+        ----------
+        state: Statistics as returned by `get_state`. Unknown actions are
+            ignored.
+        """
+        for action, (a, b) in state.items():
+            if action in self.agents:
+                self.agents[action].set_state(a, b)
+
     def get_agent(self, action):
         return self.agents[action]
 
@@ -53,6 +97,13 @@ class ThompsonSampling:
     def get_ab(self):
         return (self.a+1, self.b+1)
 
+    def get_state(self):
+        return (self.a, self.b)
+
+    def set_state(self, a, b):
+        self.a = a
+        self.b = b
+
     def receive_reward(self, reward):
         if reward == 0:
             self.a = reward + self.decay * self.a
@@ -66,3 +117,40 @@ class ThompsonSampling:
 
     def sample(self) -> float:
         return self.rng.beta(self.a + 1, self.b + 1, size=1)
+
+
+class SharedThompsonSampling(ThompsonSampling):
+    """
+    Thompson sampling with its statistics stored under a key in a shared
+    dictionary. Rewards are applied under the shared lock.
+    """
+
+    def __init__(self, stats, key, lock, decay=0.95) -> None:
+        super().__init__(decay)
+        self.stats = stats
+        self.key = key
+        self.lock = lock
+        with lock:
+            if key not in stats:
+                stats[key] = (0, 0)
+
+    def get_ab(self):
+        self.a, self.b = self.stats[self.key]
+        return super().get_ab()
+
+    def get_state(self):
+        return self.stats[self.key]
+
+    def set_state(self, a, b):
+        with self.lock:
+            self.stats[self.key] = (a, b)
+
+    def receive_reward(self, reward):
+        with self.lock:
+            self.a, self.b = self.stats[self.key]
+            super().receive_reward(reward)
+            self.stats[self.key] = (self.a, self.b)
+
+    def sample(self) -> float:
+        self.a, self.b = self.stats[self.key]
+        return super().sample()
@@ -0,0 +1,128 @@
+import logging
+import signal
+import threading
+import time
+
+
+class Budget():
+    """
+    Limits a fuzzing run by wall-clock time, iterations and the time spent
+    solving, and collects the run's throughput.
+
+    Two solving times are summed over all solvers: the solver time reported
+    by probcli for each call, on which the margins are based, and the
+    wall-clock time of the calls measured by ProBandit, which includes the
+    communication with probcli. With solvers evaluated in parallel, both
+    can exceed the run's wall-clock time; the summary therefore reports the
+    mean number of busy solvers rather than a share of the run.
+
+    The run checks `exhausted` before each iteration. `stop` ends the run
+    after the current iteration regardless of the limits, e.g. when a
+    signal is received.
+    """
+
+    def __init__(self, max_time=None, max_iterations=None,
+                 max_solver_time=None, max_solver_wall_time=None):
+        """
+        Parameters
+        ----------
+        max_time : float
+            Maximal wall-clock time of the run in seconds.
+        max_iterations : int
+            Maximal number of iterations.
+        max_solver_time : float
+            Maximal solver time reported by probcli in seconds, summed over
+            all solvers.
+        max_solver_wall_time : float
+            Maximal wall-clock time of the solver calls in seconds, summed
+            over all solvers.
+        """
+        self.max_time = max_time
+        self.max_iterations = max_iterations
+        self.max_solver_time = max_solver_time
+        self.max_solver_wall_time = max_solver_wall_time
+
+        self.iterations = 0
+        self.accepted = 0
+        self.solver_time = 0.0
+        self.solver_wall_time = 0.0
+
+        self._start = time.perf_counter()
+        self._stop_reason = None
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def record(self, solver_time=0.0, solver_wall_time=0.0):
+        """
+        Records an iteration whose solver calls took `solver_time` seconds
+        as reported by probcli and `solver_wall_time` seconds of wall-clock
+        time, each summed over all solvers.
+        """
+        self.iterations += 1
+        self.solver_time += solver_time
+        self.solver_wall_time += solver_wall_time
+
+    def accept(self):
+        """
+        Records that the last iteration found a new best candidate.
+        """
+        self.accepted += 1
+
+    def stop(self, reason):
+        if self._stop_reason is None:
+            self._stop_reason = reason
+
+    def exhausted(self):
+        """
+        Returns the reason for ending the run, or None if it may continue.
+        """
+        if self._stop_reason:
+            return self._stop_reason
+        if self.max_time is not None and self.elapsed() >= self.max_time:
+            return 'time budget'
+        if (self.max_iterations is not None
+                and self.iterations >= self.max_iterations):
+            return 'iteration budget'
+        if (self.max_solver_time is not None
+                and self.solver_time >= self.max_solver_time):
+            return 'solver time budget'
+        if (self.max_solver_wall_time is not None
+                and self.solver_wall_time >= self.max_solver_wall_time):
+            return 'solver wall-clock budget'
+        return None
+
+    def summary(self):
+        elapsed = self.elapsed()
+        hours = max(elapsed, 1e-9) / 3600
+        logging.info("Run ended (%s) after %.1fs: %d iterations "
+                     "(%.1f/hour), %d improvements, %.1fs solver time and "
+                     "%.1fs wall-clock solving summed over all solvers "
+                     "(%.2f solvers busy on average)",
+                     self.exhausted() or 'error', elapsed, self.iterations,
+                     self.iterations / hours, self.accepted, self.solver_time,
+                     self.solver_wall_time,
+                     self.solver_wall_time / max(elapsed, 1e-9))
+
+
+def stop_on_signals(budget):
+    """
+    Stops the budget's run after the current iteration on SIGINT or
+    SIGTERM. A second signal interrupts immediately. Only possible in the
+    main thread; returns whether the handlers were installed.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return False
+
+    previous = {}
+
+    def handle(signum, frame):
+        logging.warning("Received %s; stopping after the current iteration",
+                        signal.Signals(signum).name)
+        budget.stop(signal.Signals(signum).name)
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous[sig] = signal.signal(sig, handle)
+    return True
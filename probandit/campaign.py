@@ -0,0 +1,175 @@
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+
+from probandit.fuzzing import random_state
+
+
+class QueueWriter():
+    """
+    File-like object which forwards written result lines to a queue, from
+    which a single process writes them to the result CSV.
+    """
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def write(self, line):
+        self.lines.put(line)
+
+    def flush(self):
+        pass
+
+
+def run_campaign(config, outfile, workers, share_stats=False, pin_cpus=True,
+                 checkpoint=None, resume=False, metrics=None, store=None):
+    """
+    Runs `workers` independent fuzzing loops in separate processes, each
+    with its own BanditFuzz server, solver instances and random seed.
+    The results of all workers are written to the CSV file `outfile`.
+
+    Parameters
+    ----------
+    share_stats : bool
+        If set, the workers share the statistics of their bandit agents.
+    pin_cpus : bool
+        If set, each worker (and the solvers it starts) is pinned to its own
+        subset of the available CPUs, so that the workers do not compete
+        for cores and the solving times stay comparable.
+    checkpoint : str
+        Checkpoint path of the campaign. Each worker saves its checkpoints
+        to its own file derived from it.
+    resume : bool
+        If set, the workers resume from their checkpoints and the results
+        are appended to `outfile`.
+    metrics : str
+        Path of the phase metrics file of the campaign. Each worker writes
+        its metrics to its own file derived from it.
+    store : str
+        Path of the result store database, shared by all workers.
+    """
+    if config['fuzzer'].get('port', None):
+        logging.warning('Ignoring the fuzzer port; each worker starts its '
+                        'own BanditFuzz server')
+        config['fuzzer'] = dict(config['fuzzer'], port=None)
+
+    cpu_sets = (assign_cpus(workers) if pin_cpus
+                else [None] * workers)
+
+    ctx = multiprocessing.get_context('spawn')
+    manager = ctx.Manager()
+    lines = manager.Queue()
+    shared_stats = (manager.dict(), manager.Lock()) if share_stats else None
+
+    processes = []
+    for worker_id in range(workers):
+        rand_state = random_state()
+        logging.info('Worker %d: Prolog RNG random(%d,%d,%d,%d), CPUs %s',
+                     worker_id, *rand_state, cpu_sets[worker_id])
+        process = ctx.Process(target=_worker,
+                              args=(worker_id, config, lines, rand_state,
+                                    shared_stats, cpu_sets[worker_id],
+                                    worker_path(checkpoint, worker_id),
+                                    resume,
+                                    worker_path(metrics, worker_id),
+                                    store),
+                              daemon=True)
+        process.start()
+        processes.append(process)
+
+    _forward_signals(processes)
+
+    from probandit.__main__ import csv_header
+    append = resume and os.path.exists(outfile)
+    try:
+        with open(outfile, 'a' if append else 'w') as csv:
+            if not append:
+                csv.write(csv_header(config))
+                csv.flush()
+            _write_lines(csv, lines, processes)
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        manager.shutdown()
+
+
+def assign_cpus(workers):
+    """
+    Splits the CPUs available to this process into `workers` disjoint sets.
+    If there are fewer CPUs than workers, CPUs are shared round-robin.
+    Returns a list of None if CPU affinity is not supported.
+    """
+    if not hasattr(os, 'sched_getaffinity'):
+        logging.warning('CPU pinning is not supported on this platform')
+        return [None] * workers
+    cpus = sorted(os.sched_getaffinity(0))
+    if len(cpus) < workers:
+        return [{cpus[i % len(cpus)]} for i in range(workers)]
+    per_worker = len(cpus) // workers
+    return [set(cpus[i * per_worker:(i + 1) * per_worker])
+            for i in range(workers)]
+
+
+def worker_path(path, worker_id):
+    """
+    Returns the path of a worker's own file, e.g. its checkpoint, derived
+    from the path for the campaign. None stays None.
+    """
+    if path is None:
+        return None
+    root, ext = os.path.splitext(path)
+    return f'{root}.{worker_id}{ext}'
+
+
+def _forward_signals(processes):
+    # Workers stop gracefully after their current iteration on SIGINT or
+    # SIGTERM. SIGINT from a terminal reaches the whole process group, so
+    # only SIGTERM needs to be forwarded. The parent keeps writing results
+    # until all workers have ended.
+    if threading.current_thread() is not threading.main_thread():
+        return
+
+    def handle(signum, frame):
+        logging.warning("Received %s; waiting for the workers to stop",
+                        signal.Signals(signum).name)
+        if signum == signal.SIGTERM:
+            for process in processes:
+                if process.is_alive():
+                    os.kill(process.pid, signal.SIGTERM)
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, handle)
+
+
+def _write_lines(csv, lines, processes):
+    while True:
+        try:
+            line = lines.get(timeout=1)
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                break
+            continue
+        csv.write(line)
+        csv.flush()
+
+    for worker_id, process in enumerate(processes):
+        if process.exitcode:
+            logging.error('Worker %d exited with code %d', worker_id,
+                          process.exitcode)
+
+
+def _worker(worker_id, config, lines, rand_state, shared_stats, cpus,
+            checkpoint, resume, metrics, store):
+    from probandit.__main__ import run_config
+
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    logging.info('Worker %d started (pid %d)', worker_id, os.getpid())
+    run_config(config, QueueWriter(lines), rand_state=rand_state,
+               shared_stats=shared_stats, checkpoint=checkpoint,
+               resume=resume, metrics=metrics, store=store)
@@ -0,0 +1,23 @@
+import json
+import os
+
+
+def save_checkpoint(path, state):
+    """
+    Writes the state of a fuzzing loop to a JSON file. The file is replaced
+    atomically, so a crash while saving leaves the previous checkpoint.
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path):
+    """
+    Reads a state written by `save_checkpoint`.
+    """
+    with open(path, 'r') as f:
+        return json.load(f)
@@ -0,0 +1,430 @@
+import argparse
+import json
+import logging
+import socket
+import threading
+import time
+
+import yaml
+
+from probandit.agents import BfAgent
+from probandit.__main__ import (bf_iteration, csv_header, get_solution_filter,
+                                is_contradiction, sample_size, setup_config,
+                                shutdown, solution_filter_applies,
+                                write_results)
+from probandit.budget import Budget, stop_on_signals
+from probcli.framing import FramedReader
+
+
+class Coordinator():
+    """
+    Coordinates a fuzzing campaign over several hosts.
+
+    The coordinator owns the bandit agents and the best candidate so far,
+    i.e. the state of `run_bf`, and writes the result CSV. Workers connect
+    to it via TCP, each owning BanditFuzz and the solvers, and evaluate
+    candidates on request. Messages are JSON objects, one per line:
+
+        worker:      {"worker": name}
+        coordinator: {"raw_ast": ..., "env": ..., "mutation": ...,
+                      "best_margin": ..., "list_actions": ...}
+        worker:      {"pred": ..., "raw_ast": ..., "env": ..., "margin": ...,
+                      "results": ..., "sampling": ..., "actions": ...}
+                     or {"skipped": true}
+        ...
+        coordinator: {"op": "stop"}
+
+    Each worker gets a new task as soon as it answers the previous one.
+    Workers which fail or disconnect are dropped; the campaign goes on with
+    the remaining workers.
+
+    Workers are not authenticated, and the raw ASTs, environments and
+    actions of their replies end up in the BanditFuzz queries of all
+    workers. Replies in which these are not single Prolog terms are
+    rejected, but the coordinator should only listen on a trusted network.
+    """
+
+    def __init__(self, sids, csv, options=[], adaptive=False,
+                 host='localhost', port=0):
+        """
+        Parameters
+        ----------
+        sids : list of str
+            The ids of all solvers, in the order of the CSV columns.
+        csv : file-like
+            The result CSV, with the header already written.
+        options : list of str
+            The BanditFuzz options, used for the solution filter.
+        adaptive : bool
+            Whether the workers use adaptive sampling, i.e. whether the CSV
+            has the sampling columns.
+        port : int
+            The port to listen on. A free port is chosen for 0.
+        """
+        self.sids = sids
+        self.csv = csv
+        self.solution_filter = get_solution_filter(options)
+        self.adaptive = adaptive
+
+        self._server = socket.create_server((host, port))
+        self._server.settimeout(1)
+        self.port = self._server.getsockname()[1]
+
+        self.best = None  # (pred, raw_ast, env, margin)
+        self.outer_agent = BfAgent(actions=['mutate', 'generate'])
+        self.inner_agent = None
+
+        self.results = 0
+        self.worker_stats = {}  # name -> [evaluated, skipped, start time]
+
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._max_results = None
+
+    def serve(self, max_results=None):
+        """
+        Accepts workers and hands out tasks until `max_results` results were
+        received, or forever.
+        """
+        self._max_results = max_results
+        threads = []
+        try:
+            while not self._done.is_set():
+                try:
+                    conn, address = self._server.accept()
+                except socket.timeout:
+                    continue
+                logging.info('Worker connected from %s:%d', *address)
+                thread = threading.Thread(target=self._handle_worker,
+                                          args=(conn,), daemon=True)
+                thread.start()
+                threads.append(thread)
+        finally:
+            self._done.set()
+            self._server.close()
+            for thread in threads:
+                thread.join()
+            self.report()
+
+    def stop(self):
+        self._done.set()
+
+    def report(self):
+        now = time.perf_counter()
+        for name, (evaluated, skipped, start) in self.worker_stats.items():
+            minutes = max(now - start, 1e-9) / 60
+            logging.info('Worker %s: %d candidates evaluated, %d skipped, '
+                         '%.1f candidates/min', name, evaluated, skipped,
+                         evaluated / minutes)
+
+    def _handle_worker(self, conn):
+        reader = FramedReader(conn, b'\n')
+        name = None
+        try:
+            name = json.loads(reader.receive())['worker']
+            with self._lock:
+                if name in self.worker_stats:
+                    name = f'{name}-{len(self.worker_stats)}'
+                self.worker_stats[name] = [0, 0, time.perf_counter()]
+
+            while not self._done.is_set():
+                task = self._next_task()
+                _send_json(conn, task)
+                reply = json.loads(reader.receive())
+                _check_reply(reply)
+                self._receive_result(name, task, reply)
+            _send_json(conn, {'op': 'stop'})
+        except (ConnectionError, OSError, ValueError, KeyError) as e:
+            logging.error('Worker %s failed: %s', name, e)
+        finally:
+            conn.close()
+
+    def _next_task(self):
+        with self._lock:
+            if self.best is None or self.inner_agent is None:
+                # Bootstrap with a generated candidate.
+                return {'raw_ast': None, 'env': None, 'mutation': None,
+                        'best_margin': None, 'list_actions': True,
+                        'outer_action': None}
+
+            outer_action = self.outer_agent.sample_action()
+            if outer_action == 'mutate':
+                mutation = self.inner_agent.sample_action()
+            else:
+                mutation = None
+            _, raw_ast, env, margin = self.best
+            return {'raw_ast': raw_ast, 'env': env, 'mutation': mutation,
+                    'best_margin': margin, 'list_actions': False,
+                    'outer_action': outer_action}
+
+    def _receive_result(self, name, task, reply):
+        with self._lock:
+            stats = self.worker_stats[name]
+            if reply.get('skipped'):
+                stats[1] += 1
+                logging.warning("Worker %s skipped an iteration due to "
+                                "solver error", name)
+                return
+            stats[0] += 1
+
+            self.results += 1
+            if self.results % 100 == 0:
+                self.report()
+            if self._max_results and self.results >= self._max_results:
+                self._done.set()
+
+            pred, margin = reply['pred'], reply['margin']
+            results = _load_results(reply['results'])
+            sampling = tuple(reply['sampling']) if self.adaptive else None
+
+            if self.best is None:
+                self.best = (pred, reply['raw_ast'], reply['env'], margin)
+                write_results(self.csv, pred, reply['raw_ast'], results,
+                              margin, self.sids, sampling=sampling)
+            if self.inner_agent is None and reply.get('actions'):
+                self.inner_agent = BfAgent(actions=reply['actions'])
+            if task['outer_action'] is None:
+                return
+
+            if is_contradiction(results, pred):
+                return
+
+            filter_applies = solution_filter_applies(results,
+                                                     self.solution_filter)
+            if not filter_applies and margin > self.best[3]:
+                logging.info("New best performance margin: %dms (worker %s)",
+                             margin, name)
+                self.best = (pred, reply['raw_ast'], reply['env'], margin)
+                write_results(self.csv, pred, reply['raw_ast'], results,
+                              margin, self.sids, sampling=sampling)
+                reward = 1
+            else:
+                reward = 0
+
+            self.outer_agent.receive_reward(task['outer_action'], reward)
+            if task['mutation']:
+                self.inner_agent.receive_reward(task['mutation'], reward)
+
+
+class Worker():
+    """
+    Evaluates candidates on request of a `Coordinator`, using its own
+    BanditFuzz instance and solvers.
+    """
+
+    def __init__(self, bfuzzer, target_solvers, reference_solvers, name=None,
+                 budget=None, **options):
+        """
+        Parameters
+        ----------
+        name : str
+            Name of the worker as reported by the coordinator. Defaults to
+            the host name.
+        budget : Budget
+            Records the evaluated candidates. The worker disconnects when
+            the budget is exhausted, e.g. after a signal.
+        options :
+            Keyword arguments for `bf_iteration`.
+        """
+        self.bfuzzer = bfuzzer
+        self.target_solvers = target_solvers
+        self.reference_solvers = reference_solvers
+        self.name = name or socket.gethostname()
+        self.budget = budget
+        self.options = options
+        self.samp_size = sample_size(bfuzzer.options)
+
+    def serve(self, host, port):
+        """
+        Connects to the coordinator and evaluates candidates until it stops.
+        """
+        sock = socket.create_connection((host, port))
+        reader = FramedReader(sock, b'\n')
+        try:
+            _send_json(sock, {'worker': self.name})
+            while True:
+                task = json.loads(reader.receive())
+                if task.get('op') == 'stop':
+                    break
+                if self.budget and self.budget.exhausted():
+                    logging.info('Worker %s stopping (%s)', self.name,
+                                 self.budget.exhausted())
+                    break
+                _send_json(sock, self.evaluate(task))
+                if self.budget:
+                    self.budget.record()
+        finally:
+            sock.close()
+
+    def evaluate(self, task):
+        """
+        Evaluates the candidate of a task and returns the reply.
+        """
+        logging.info("Action: %s", task['mutation'] or 'generate')
+        new_data = bf_iteration(self.bfuzzer, task['raw_ast'], task['env'],
+                                task['mutation'], self.target_solvers,
+                                self.reference_solvers,
+                                samp_size=self.samp_size,
+                                best_margin=task['best_margin'],
+                                **self.options)
+        if new_data is None:
+            return {'skipped': True}
+        pred, raw_ast, env, margin, results, sampling = new_data
+
+        reply = {'pred': pred, 'raw_ast': raw_ast, 'env': env,
+                 'margin': margin, 'results': _dump_results(results),
+                 'sampling': sampling}
+        if task['list_actions']:
+            reply['actions'] = self.bfuzzer.list_actions(env)
+        return reply
+
+
+def _check_reply(reply):
+    # The raw AST, environment and actions are inserted into BanditFuzz
+    # queries, so they must not be able to end or extend the query.
+    if reply.get('skipped'):
+        return
+    terms = [reply['raw_ast'], reply['env']] + reply.get('actions', [])
+    for term in terms:
+        if not isinstance(term, str) or not is_prolog_term(term):
+            raise ValueError(f'reply is not a Prolog term: {str(term)[:80]}')
+
+
+def is_prolog_term(text):
+    """
+    Returns whether the text is a single Prolog term which can be used as
+    an argument, i.e. its brackets are balanced, its quotes closed, and it
+    has no comments, end tokens, or commas and bars outside of brackets.
+    """
+    closing = {'(': ')', '[': ']', '{': '}'}
+    expected = []
+    pos = 0
+    while pos < len(text):
+        char = text[pos]
+        if char in '\'"`':
+            pos = _skip_quoted(text, pos)
+            if pos is None:
+                return False
+            continue
+        if char == '0' and text.startswith("'", pos + 1):
+            pos += 3  # Character code such as 0'a
+            continue
+        if char in closing:
+            expected.append(closing[char])
+        elif char in ')]}':
+            if not expected or expected.pop() != char:
+                return False
+        elif char == '%' or text.startswith('/*', pos):
+            return False
+        elif char == '.' and (pos + 1 == len(text)
+                              or text[pos + 1].isspace()):
+            return False
+        elif char in ',|' and not expected:
+            return False
+        pos += 1
+    return bool(text.strip()) and not expected
+
+
+def _skip_quoted(text, pos):
+    # Returns the position after the quoted item starting at pos, or None
+    # if it is not closed. Quotes are escaped by doubling or a backslash.
+    quote = text[pos]
+    pos += 1
+    while pos < len(text):
+        if text[pos] == '\\':
+            pos += 2
+        elif text[pos] != quote:
+            pos += 1
+        elif text.startswith(quote, pos + 1):
+            pos += 2
+        else:
+            return pos + 1
+    return None
+
+
+def _send_json(sock, message):
+    sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+
+
+def _dump_results(results):
+    # Solutions are only needed for logging, so the infos are stringified.
+    dumped = {}
+    for sid, (answer, info, time) in results.items():
+        if answer == 'yes' and isinstance(info, tuple):
+            info = [info[0], str(info[1])]
+        elif info is not None:
+            info = str(info)
+        dumped[sid] = [answer, info, time]
+    return dumped
+
+
+def _load_results(dumped):
+    results = {}
+    for sid, (answer, info, time) in dumped.items():
+        if isinstance(info, list):
+            info = tuple(info)
+        results[sid] = (answer, info, time)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='python -m probandit.distributed',
+        description='Distributed fuzzing campaign over several hosts.')
+    subparsers = parser.add_subparsers(dest='mode', required=True)
+
+    coordinator_parser = subparsers.add_parser(
+        'coordinator', help='Run the coordinator writing the results.')
+    coordinator_parser.add_argument('config', help='The configuration file.')
+    coordinator_parser.add_argument('csv', nargs='?', default=None,
+                                    help='The target CSV file.')
+    coordinator_parser.add_argument('--host', default='localhost',
+                                    help='The address to listen on. Only '
+                                    'use network addresses of trusted '
+                                    'networks; workers are not '
+                                    'authenticated.')
+    coordinator_parser.add_argument('--port', type=int, default=0,
+                                    help='The port to listen on.')
+
+    worker_parser = subparsers.add_parser(
+        'worker', help='Run a worker evaluating candidates.')
+    worker_parser.add_argument('config', help='The configuration file.')
+    worker_parser.add_argument('coordinator',
+                               help='Address of the coordinator as host:port.')
+    worker_parser.add_argument('--name', default=None,
+                               help='Name of the worker.')
+
+    args = parser.parse_args()
+    config = yaml.safe_load(open(args.config, 'r'))
+
+    if args.mode == 'coordinator':
+        outfile = args.csv or config['fuzzer'].get('csv', 'results.csv')
+        sids = sorted(config['fuzzer']['targets']
+                      + config['fuzzer']['references'])
+        with open(outfile, 'w') as csv:
+            csv.write(csv_header(config))
+            csv.flush()
+            coordinator = Coordinator(
+                sids, csv, options=config['fuzzer'].get('options', []),
+                adaptive=bool(config['fuzzer'].get('adaptive_sampling',
+                                                   False)),
+                host=args.host, port=args.port)
+            logging.info('Coordinator listening on port %d', coordinator.port)
+            try:
+                coordinator.serve()
+            except KeyboardInterrupt:
+                coordinator.stop()
+    else:
+        host, port = args.coordinator.rsplit(':', 1)
+        bfuzzer, target_solvers, reference_solvers, options = setup_config(
+            config)
+        budget = Budget()
+        stop_on_signals(budget)
+        worker = Worker(bfuzzer, target_solvers, reference_solvers,
+                        name=args.name, budget=budget, **options)
+        try:
+            worker.serve(host, int(port))
+        finally:
+            shutdown(bfuzzer, target_solvers + reference_solvers,
+                     options['prefetcher'])
+            budget.summary()
@@ -4,12 +4,14 @@ import socket
 import subprocess
 import time
 
+from probcli.framing import FramedReader
 
 class BFuzzer():
     def __init__(self, bf_path, options=[]):
         self.path = bf_path
         self.process = None
         self._socket = None
+        self._reader = None
 
         self.options = options
         self._prolog_option_string = '[' + ','.join(options) + ']'
@@ -38,13 +40,18 @@ class BFuzzer():
         self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._socket.connect(('localhost', self.port))
         self._socket.settimeout(60)
+        self._reader = FramedReader(self._socket, b'\x00')
         logging.info('Connected to BanditFuzz')
 
     def disconnect(self):
-        self._send_to_socket('halt.')
         if self._socket:
+            try:
+                self._send_to_socket('halt.')
+            except OSError as e:
+                logging.warning('Could not halt BanditFuzz: %s', e)
             self._socket.close()
         self._socket = None
+        self._reader = None
         if self.process:
             self.process.terminate()
             self.process.wait()
@@ -67,15 +74,21 @@ class BFuzzer():
         env : str
             The environment in which the B constraint was generated.
         """
-        self._send_to_socket(f'generate({self._prolog_option_string}).')
-        answer = self._receive_from_socket()
-        # Answer is three lines: generated AST, WD predicate, and environment
-        lines = answer.split('\n')
-        raw = lines[0][len('Raw: '):]
-        wd = _deatomify(lines[1][len('WD: '):])
-        env = lines[2][len('Env: '):]
+        self._send_to_socket(self._generate_request())
+        return _parse_candidate(self._receive_from_socket())
 
-        return wd, raw, env
+    def generate_many(self, k):
+        """
+        Generate k new B constraints in a single round trip.
+
+        Returns
+        -------
+        candidates : list of tuples (wd, raw, env, rand_state)
+            The generated constraints as returned by `generate`, each with
+            the state of the random number generator before generating it
+            as returned by `get_random_state`.
+        """
+        return self._request_candidates([self._generate_request()] * k)
 
     def list_actions(self, env):
         self._send_to_socket(f'list_actions({env}).')
@@ -84,27 +97,24 @@ class BFuzzer():
         return actions
 
     def mutate(self, raw_pred, env, action):
-        request = f"mutate({raw_pred},{env},{action})."
-        self._send_to_socket(request)
-
-        answer = self._receive_from_socket()
-        # Answer is three lines: mutated AST, WD predicate, and environment
-        lines = answer.split('\n')
-        raw = lines[0][len('Raw: '):]
-        wd = _deatomify(lines[1][len('WD: '):])
-        new_env = lines[2][len('Env: '):]
+        self._send_to_socket(_mutate_request(raw_pred, env, action))
+        return _parse_candidate(self._receive_from_socket())
 
-        return wd, raw, new_env
+    def mutate_many(self, raw_pred, env, actions):
+        """
+        Apply each of the actions to the same B constraint in a single round
+        trip. Returns a list of tuples (wd, raw, env, rand_state) as
+        `generate_many`.
+        """
+        return self._request_candidates([_mutate_request(raw_pred, env, action)
+                                         for action in actions])
 
     def init_random_state(self):
         """
         Initialize the random number generator state within Prolog with a
         random seed.
         """
-        x = random.randint(1, 30268)
-        y = random.randint(1, 30306)
-        z = random.randint(1, 30322)
-        b = random.randint(1, 1000000)
+        x, y, z, b = random_state()
         self.set_random_state(x, y, z, b)
         return x, y, z, b
 
@@ -124,33 +134,31 @@ class BFuzzer():
 
     def get_random_state(self):
         self._send_to_socket('getrand.')
-        answer = self._receive_from_socket().strip()
-        [x, y, z, b] = answer.split(',')
-        return int(x), int(y), int(z), int(b)
+        return _parse_random_state(self._receive_from_socket())
+
+    def _generate_request(self):
+        return f'generate({self._prolog_option_string}).'
+
+    def _request_candidates(self, requests):
+        # Each request is preceded by getrand, and all requests are sent at
+        # once. The server answers them in order.
+        messages = []
+        for request in requests:
+            messages += ['getrand.', request]
+        self._socket.sendall(b''.join(_encode_message(m) for m in messages))
+
+        candidates = []
+        for _ in requests:
+            rand_state = _parse_random_state(self._receive_from_socket())
+            candidates.append((*_parse_candidate(self._receive_from_socket()),
+                               rand_state))
+        return candidates
 
     def _send_to_socket(self, message):
-        # Ensure message ends with '.\n'
-        if message[-1] != '\n':
-            if message[-1] != '.':
-                message += '.'
-            message += '\n'
-        elif message[-2] != '.':
-            message = message[:-1] + '.\n'
-
-        message += '\x00'
-
-        self._socket.sendall(message.encode('utf-8'))
+        self._socket.sendall(_encode_message(message))
 
     def _receive_from_socket(self):
-        data = b''
-        while True:
-            chunk = self._socket.recv(1024)
-            data += chunk
-            if b'\x00' in chunk:
-                break
-        data = data.decode('utf-8').strip('\x00')
-
-        return data
+        return self._reader.receive().decode('utf-8')
 
     def __enter__(self):
         self.connect()
@@ -160,6 +168,48 @@ class BFuzzer():
         self.disconnect()
 
 
+def random_state():
+    """
+    Returns a random state (x, y, z, b) for BanditFuzz' random number
+    generator, see `BFuzzer.set_random_state`.
+    """
+    return (random.randint(1, 30268), random.randint(1, 30306),
+            random.randint(1, 30322), random.randint(1, 1000000))
+
+
+def _encode_message(message):
+    # Ensure message ends with '.\n'
+    if message[-1] != '\n':
+        if message[-1] != '.':
+            message += '.'
+        message += '\n'
+    elif message[-2] != '.':
+        message = message[:-1] + '.\n'
+
+    message += '\x00'
+
+    return message.encode('utf-8')
+
+
+def _mutate_request(raw_pred, env, action):
+    return f"mutate({raw_pred},{env},{action})."
+
+
+def _parse_candidate(answer):
+    # Answer is three lines: raw AST, WD predicate, and environment
+    lines = answer.split('\n')
+    raw = lines[0][len('Raw: '):]
+    wd = _deatomify(lines[1][len('WD: '):])
+    env = lines[2][len('Env: '):]
+
+    return wd, raw, env
+
+
+def _parse_random_state(answer):
+    [x, y, z, b] = answer.strip().split(',')
+    return int(x), int(y), int(z), int(b)
+
+
 def _deatomify(string):
     if string == '':
         return "''"
@@ -0,0 +1,180 @@
+from collections import deque
+import functools
+import json
+import logging
+import threading
+import time
+
+import probcli.answerparser as answerparser
+from probandit.fuzzing import BFuzzer
+from probandit.prefetch import THREAD_NAME as PREFETCH_THREAD
+from probandit.solver import Solver
+from probcli import ProBCli
+from probcli.bparser import BParser
+
+
+# Instrumented functions: (owner, attribute, phase).
+PHASES = [
+    (BFuzzer, 'generate', 'fuzzer'),
+    (BFuzzer, 'mutate', 'fuzzer'),
+    (BFuzzer, 'generate_many', 'fuzzer'),
+    (BFuzzer, 'mutate_many', 'fuzzer'),
+    (BFuzzer, 'get_random_state', 'fuzzer'),
+    (BFuzzer, 'list_actions', 'fuzzer'),
+    (BParser, 'parse_to_prolog', 'bparser'),
+    (BParser, 'parse_many', 'bparser'),
+    (ProBCli, 'send_prolog', 'send'),
+    (ProBCli, 'receive_prolog', 'receive'),
+    (answerparser, 'parse_answer', 'answer_parsing'),
+    (Solver, '_translate_solution', 'translation'),
+    (Solver, 'restart', 'restart'),
+]
+
+
+class PhaseMetrics():
+    """
+    Records how long the phases of the fuzzing iterations take.
+
+    `instrument` wraps the functions listed in PHASES, so that each call
+    adds its duration to its phase. Note that phases can contain each
+    other: 'receive' includes waiting for the solver and 'answer_parsing'.
+    Hence, the solving time reported by probcli (see `Solver.reported_time`)
+    is recorded as the phase 'solving', and the remainder of 'receive',
+    i.e. receive - solving - answer_parsing, as the derived phase
+    'transport' at the end of each iteration.
+    With solvers running in parallel, the durations of an iteration's phases
+    can add up to more than its wall-clock time. Calls on the `Prefetcher`'s
+    thread overlap with the iteration instead of delaying it; they are
+    recorded in the separate phase 'prefetch'.
+
+    `end_iteration` closes the current iteration. The durations of the
+    iteration's phases are kept for rolling averages over the last `window`
+    iterations and, given a path, appended to a metrics file with one JSON
+    object per line.
+    """
+
+    def __init__(self, path=None, window=100, append=False):
+        """
+        Parameters
+        ----------
+        path : str
+            Path of the metrics file, or None to not write one.
+        window : int
+            Number of iterations over which the rolling averages are taken.
+        append : bool
+            If set, an existing metrics file is appended to instead of
+            overwritten.
+        """
+        self.path = path
+        self.window = window
+
+        self.totals = {}  # phase -> [calls, seconds]
+        self._current = {}  # phase -> seconds in the current iteration
+        self._recent = {}  # phase -> deque of seconds per iteration
+        self._lock = threading.Lock()
+        self._originals = []
+        self._iteration_start = time.perf_counter()
+        self._file = open(path, 'a' if append else 'w') if path else None
+
+    def add(self, phase, duration):
+        with self._lock:
+            total = self.totals.setdefault(phase, [0, 0.0])
+            total[0] += 1
+            total[1] += duration
+            self._current[phase] = self._current.get(phase, 0.0) + duration
+
+    def end_iteration(self, iteration, **fields):
+        """
+        Closes the current iteration and returns the durations of its phases.
+        Additional fields are written to the metrics file.
+        """
+        now = time.perf_counter()
+        with self._lock:
+            phases, self._current = self._current, {}
+            if 'receive' in phases:
+                phases['transport'] = max(
+                    0.0, phases['receive'] - phases.get('solving', 0.0)
+                    - phases.get('answer_parsing', 0.0))
+            for phase in set(phases) | set(self._recent):
+                recent = self._recent.setdefault(
+                    phase, deque(maxlen=self.window))
+                recent.append(phases.get(phase, 0.0))
+        wall_time = now - self._iteration_start
+        self._iteration_start = now
+
+        if self._file:
+            record = {'iteration': iteration, 'wall_time': wall_time,
+                      'phases': phases, **fields}
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+        return phases
+
+    def rolling_mean(self, phase):
+        """
+        Mean duration of the phase per iteration over the recent iterations.
+        """
+        with self._lock:
+            recent = self._recent.get(phase)
+            if not recent:
+                return 0.0
+            return sum(recent) / len(recent)
+
+    def report(self):
+        parts = [f"{phase} {1000 * self.rolling_mean(phase):.1f}ms"
+                 for phase in sorted(self._recent)]
+        logging.info("Mean phase times per iteration (last %d): %s",
+                     self.window, ', '.join(parts))
+
+    def instrument(self):
+        """
+        Wraps the functions listed in PHASES to record their durations.
+        """
+        if self._originals:
+            return
+        for owner, name, phase in PHASES:
+            original = getattr(owner, name)
+            self._originals.append((owner, name, original))
+            setattr(owner, name, _timed(original, phase, self))
+        self._originals.append((Solver, 'solve', Solver.solve))
+        Solver.solve = _reported(Solver.solve, self)
+
+    def uninstrument(self):
+        """
+        Restores the functions wrapped by `instrument`.
+        """
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals = []
+
+    def close(self):
+        self.uninstrument()
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def _timed(func, phase, metrics):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if threading.current_thread().name.startswith(PREFETCH_THREAD):
+                metrics.add('prefetch', time.perf_counter() - start)
+            else:
+                metrics.add(phase, time.perf_counter() - start)
+    return wrapper
+
+
+def _reported(solve, metrics):
+    # Records the solving time reported by probcli during a `Solver.solve`.
+    @functools.wraps(solve)
+    def wrapper(solver, *args, **kwargs):
+        before = solver.reported_time
+        try:
+            return solve(solver, *args, **kwargs)
+        finally:
+            if solver.reported_time > before:
+                metrics.add('solving', solver.reported_time - before)
+    return wrapper
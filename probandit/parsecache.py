@@ -0,0 +1,150 @@
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import threading
+
+
+class ParseCache():
+    """
+    Bounded LRU cache of B predicates and their Prolog ASTs as returned by
+    the BParser.
+
+    Entries are keyed by the predicate and the version of the parser jar,
+    so that ASTs of different ProB distributions are not mixed up. The
+    cache is thread-safe and can be saved to and loaded from a JSON file,
+    e.g. to reuse the ASTs over several replay runs.
+    """
+
+    def __init__(self, maxsize=4096):
+        """
+        Parameters
+        ----------
+        maxsize : int
+            Maximum number of cached ASTs. The least recently used ASTs are
+            evicted first.
+        """
+        if maxsize < 1:
+            raise ValueError(f"Cache size must be positive, got {maxsize}")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def parse(self, parser, predicate):
+        """
+        Returns the Prolog AST of the predicate, parsing it with the given
+        BParser only if it is not cached. Parsing errors are not cached.
+        """
+        key = (jar_version(parser.jar), predicate)
+        with self._lock:
+            ast = self._entries.get(key)
+            if ast is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return ast
+            self.misses += 1
+
+        ast = parser.parse_to_prolog(predicate)
+        self._put(key, ast)
+        return ast
+
+    def parse_many(self, parser, predicates):
+        """
+        Caches the Prolog ASTs of all given predicates. The predicates which
+        are not cached yet are parsed in one batch with the given BParser.
+        Returns the number of newly parsed predicates.
+        """
+        version = jar_version(parser.jar)
+        with self._lock:
+            missing = list(dict.fromkeys(
+                pred for pred in predicates
+                if (version, pred) not in self._entries))
+        if not missing:
+            return 0
+
+        asts = parser.parse_many(missing)
+        parsed = 0
+        for pred, ast in zip(missing, asts):
+            if ast is not None:
+                self._put((version, pred), ast)
+                parsed += 1
+        return parsed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def log_stats(self):
+        logging.info("Parse cache: %d hits, %d misses (%.1f%% hit rate), "
+                     "%d entries", self.hits, self.misses,
+                     100 * self.hit_rate(), len(self))
+
+    def save(self, path):
+        """
+        Writes the cached ASTs to a JSON file.
+        """
+        with self._lock:
+            entries = [[version, pred, ast]
+                       for (version, pred), ast in self._entries.items()]
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        """
+        Adds the ASTs of a JSON file written by `save`. A missing file is
+        ignored. Returns the number of loaded ASTs.
+        """
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'r') as f:
+            entries = json.load(f)
+        for version, pred, ast in entries:
+            self._put((version, pred), ast)
+        return len(entries)
+
+    def _put(self, key, ast):
+        with self._lock:
+            self._entries[key] = ast
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+_versions = {}  # (path, size, mtime) -> version
+
+
+def jar_version(jar_path):
+    """
+    Returns a version identifier of the parser jar, i.e. the hash of its
+    contents. Falls back to the path if the jar cannot be read.
+    """
+    try:
+        stat = os.stat(jar_path)
+    except (OSError, TypeError, ValueError):
+        return str(jar_path)
+    key = (os.path.realpath(jar_path), stat.st_size, stat.st_mtime_ns)
+    version = _versions.get(key)
+    if version is None:
+        with open(jar_path, 'rb') as f:
+            version = hashlib.sha1(f.read()).hexdigest()
+        _versions[key] = version
+    return version
+
+
+# The cache shared by all solvers.
+shared_cache = ParseCache()
@@ -0,0 +1,131 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import queue
+import threading
+import time
+
+from probcli import ProBCli
+
+
+class CliPool():
+    """
+    Keeps a number of freshly started probcli instances of one solver
+    configuration on standby.
+
+    Instances are started in the background. `get` hands out a ready
+    instance and immediately starts a replacement, so that restarting a
+    solver does not have to wait for probcli (and its parser) to start up.
+    Retired instances are closed in the background as well.
+
+    The pool records how much startup time was hidden in the background
+    and how much was exposed, i.e. spent waiting in `get`.
+    """
+
+    def __init__(self, path, args=[], size=1):
+        """
+        Parameters
+        ----------
+        path : str
+            Path to the probcli binary.
+        args : list of str
+            Command line arguments for probcli.
+        size : int
+            Number of instances to keep on standby.
+        """
+        if size < 1:
+            raise ValueError(f"Pool size must be positive, got {size}")
+        self.path = path
+        self.args = args
+        self.size = size
+
+        self.startups = 0
+        self.startup_time = 0.
+        self.exposed_time = 0.
+
+        self._ready = queue.Queue()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=size + 1)
+
+        self._refill()
+
+    def get(self):
+        """
+        Returns a pair (cli, port) of a started ProBCli instance and its
+        port. Blocks until an instance is ready.
+        """
+        if self._closed:
+            raise ValueError('Pool is closed')
+        start = time.perf_counter()
+        cli, port, error = self._ready.get()
+        self.exposed_time += time.perf_counter() - start
+        self._refill()
+
+        if error:
+            raise error
+        return cli, port
+
+    def retire(self, cli):
+        """
+        Closes a used instance in the background.
+        """
+        self._executor.submit(_close_cli, cli)
+
+    def close(self):
+        """
+        Closes all standby instances and stops refilling.
+        """
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=True)
+        while not self._ready.empty():
+            cli, _, error = self._ready.get()
+            if not error:
+                _close_cli(cli)
+        self.log_stats()
+
+    def hidden_time(self):
+        """
+        Startup time in seconds which was spent in the background without
+        anyone waiting for it.
+        """
+        return max(0., self.startup_time - self.exposed_time)
+
+    def log_stats(self):
+        logging.info("Standby pool for %s: %d startups, %.1fs startup time "
+                     "hidden, %.1fs exposed", self.path, self.startups,
+                     self.hidden_time(), self.exposed_time)
+
+    def _refill(self):
+        with self._lock:
+            if self._closed:
+                return
+            missing = self.size - self._ready.qsize() - self._pending
+            self._pending += max(0, missing)
+        for _ in range(missing):
+            self._executor.submit(self._spawn)
+
+    def _spawn(self):
+        start = time.perf_counter()
+        cli = ProBCli(self.path)
+        try:
+            port = cli.start(None, self.args)
+            entry = (cli, port, None)
+        except Exception as e:
+            logging.error("Standby probcli failed to start: %s", e)
+            entry = (None, None, e)
+        with self._lock:
+            self.startups += 1
+            self.startup_time += time.perf_counter() - start
+            # Within the lock, so that `_refill` never sees the instance
+            # neither pending nor ready and starts a superfluous one.
+            self._ready.put(entry)
+            self._pending -= 1
+
+
+def _close_cli(cli):
+    try:
+        cli.close()
+    except Exception as e:
+        logging.warning("Error while closing probcli: %s", e)
@@ -0,0 +1,148 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import time
+
+# Name prefix of the prefetching threads, see `PhaseMetrics`.
+THREAD_NAME = 'prefetch'
+
+
+class Prefetcher():
+    """
+    Speculatively requests candidates from a second BanditFuzz connection
+    while the current candidate is being solved.
+
+    After each candidate is obtained, `prefetch` requests the next generated
+    candidate and, optionally, mutations of the current best predicate by
+    the actions the agent most likely plays next. If the next iteration
+    asks for one of them, it is taken from the prefetcher instead of
+    waiting for BanditFuzz. Speculative mutations of a predicate which is
+    no longer the best are discarded.
+
+    The prefetcher records how much of the time spent on prefetched
+    candidates overlapped with solving, i.e. was not waited for.
+    """
+
+    def __init__(self, bfuzzer, agent=None, mutations=0):
+        """
+        Parameters
+        ----------
+        bfuzzer : BFuzzer
+            A connected BFuzzer used only for prefetching.
+        agent : BfAgent
+            The agent choosing the mutations. Can be set later.
+        mutations : int
+            Number of speculative mutations per iteration.
+        """
+        self.bfuzzer = bfuzzer
+        self.agent = agent
+        self.mutations = mutations
+
+        self.prefetched = 0
+        self.used = 0
+        self.fetch_time = 0.
+        self.wait_time = 0.
+
+        self._executor = ThreadPoolExecutor(max_workers=1,
+                                            thread_name_prefix=THREAD_NAME)
+        self._generated = None
+        self._mutated = {}  # (raw_ast, env, action) -> (future, index)
+
+    def prefetch(self, raw_ast, env):
+        """
+        Requests a generated candidate unless one is pending, and mutations
+        of the given predicate. Pending mutations of other predicates are
+        discarded.
+        """
+        if self._generated is None:
+            self._generated = (self._submit(1, self.bfuzzer.generate_many, 1),
+                               0)
+
+        stale = [key for key in self._mutated if key[:2] != (raw_ast, env)]
+        for key in stale:
+            future, _ = self._mutated.pop(key)
+            future.cancel()
+
+        if raw_ast is None or self.agent is None or not self.mutations:
+            return
+        actions = [action
+                   for action in self.agent.likely_actions(self.mutations)
+                   if (raw_ast, env, action) not in self._mutated]
+        if not actions:
+            return
+        # All mutations are requested in a single round trip.
+        future = self._submit(len(actions), self.bfuzzer.mutate_many,
+                              raw_ast, env, actions)
+        for i, action in enumerate(actions):
+            self._mutated[(raw_ast, env, action)] = (future, i)
+
+    def generate(self):
+        """
+        Returns the prefetched generated candidate (wd, raw, env), or None
+        if none was requested or it failed.
+        """
+        pending, self._generated = self._generated, None
+        return self._take(pending)
+
+    def mutate(self, raw_ast, env, action):
+        """
+        Returns the prefetched mutation (wd, raw, env) of the predicate by
+        the action, or None if it was not requested or failed.
+        """
+        return self._take(self._mutated.pop((raw_ast, env, action), None))
+
+    def overlap(self):
+        """
+        Fraction of the time spent on used prefetched candidates which
+        overlapped with solving.
+        """
+        if self.fetch_time == 0:
+            return 0.0
+        return max(0., self.fetch_time - self.wait_time) / self.fetch_time
+
+    def report(self):
+        logging.info("Prefetching: used %d of %d candidates, %.1fs of %.1fs "
+                     "fuzzer time overlapped (%.1f%%)", self.used,
+                     self.prefetched, self.fetch_time - self.wait_time,
+                     self.fetch_time, 100 * self.overlap())
+
+    def close(self):
+        for future, _ in self._mutated.values():
+            future.cancel()
+        self._mutated = {}
+        self._executor.shutdown(wait=True)
+        self.report()
+        self.bfuzzer.disconnect()
+
+    def _submit(self, count, request, *args):
+        self.prefetched += count
+        return self._executor.submit(self._fetch, request, *args)
+
+    def _fetch(self, request, *args):
+        # Returns the candidates, with their RNG states, and the duration.
+        start = time.perf_counter()
+        try:
+            candidates = request(*args)
+        except TimeoutError:
+            logging.error("Timeout while prefetching; restarting BanditFuzz")
+            self.bfuzzer.restart()
+            self.bfuzzer.init_random_state()
+            candidates = None
+        return candidates, time.perf_counter() - start
+
+    def _take(self, pending):
+        if pending is None:
+            return None
+        future, index = pending
+        start = time.perf_counter()
+        candidates, duration = future.result()
+        self.wait_time += time.perf_counter() - start
+        if candidates is None:
+            return None
+        # The duration of a batch is shared by its candidates.
+        self.fetch_time += duration / len(candidates)
+
+        self.used += 1
+        wd, raw, env, rand_state = candidates[index]
+        logging.info("Prefetched candidate; Prolog RNG: random(%d,%d,%d,%d)",
+                     *rand_state)
+        return wd, raw, env
@@ -0,0 +1,138 @@
+import logging
+import threading
+
+
+class SolverRace():
+    """
+    Early cut-off for the evaluation of a candidate predicate.
+
+    The performance margin of a candidate is the minimal target time minus
+    the maximal reference time. Hence, any target and any reference which
+    finished all their samples bound the margin from above. Once this bound
+    does not exceed the best margin found so far, the candidate cannot be
+    accepted anymore: the race is cancelled, remaining samples are skipped,
+    and solvers which are still solving get interrupted.
+
+    The usage within an evaluation is as follows:
+
+        race = SolverRace(target_ids, best_margin)
+        if race.start_solve(solver):  # False once the race is cancelled
+            answer, info, time = solver.solve(pred)
+            interrupted = race.end_solve(solver, time)
+        race.finish(solver.id, averaged_time)
+    """
+
+    def __init__(self, target_ids, best_margin):
+        """
+        Parameters
+        ----------
+        target_ids : iterable of str
+            Ids of the target solvers. All other solvers are references.
+        best_margin : int
+            The best performance margin so far, which a candidate needs to
+            exceed.
+        """
+        self.target_ids = set(target_ids)
+        self.best_margin = best_margin
+
+        self.ref_max = None
+        self.tar_min = None
+
+        self.skipped_solves = 0
+        self.interrupted_solves = 0
+        self.solve_times = []
+
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._running = {}
+        self._interrupted = set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def start_solve(self, solver):
+        """
+        Registers the solver as solving. Returns False if the race is
+        already cancelled, in which case the solver must not start.
+        """
+        with self._lock:
+            if self._cancelled.is_set():
+                return False
+            self._running[solver.id] = solver
+            return True
+
+    def end_solve(self, solver, time=None):
+        """
+        Unregisters the solver after solving. Returns True if the solver was
+        interrupted during solving, i.e. the result is to be discarded.
+        """
+        with self._lock:
+            self._running.pop(solver.id, None)
+            interrupted = solver.id in self._interrupted
+            if time is not None and not interrupted:
+                self.solve_times.append(time)
+            return interrupted
+
+    def skip(self, count):
+        """
+        Records that `count` solves were skipped due to the cut-off.
+        """
+        with self._lock:
+            self.skipped_solves += count
+
+    def finish(self, solver_id, time):
+        """
+        Records the final (averaged) time of a solver and cancels the race
+        if the candidate can no longer beat the best margin.
+        """
+        with self._lock:
+            if solver_id in self.target_ids:
+                if self.tar_min is None or time < self.tar_min:
+                    self.tar_min = time
+            elif self.ref_max is None or time > self.ref_max:
+                self.ref_max = time
+
+            if self._cancelled.is_set() or not self.is_decided():
+                return
+
+            self._cancelled.set()
+            running = list(self._running.values())
+            self._interrupted.update(s.id for s in running)
+            self.interrupted_solves += len(running)
+
+        logging.debug("Cut-off: margin bound %dms does not exceed %dms",
+                      self.tar_min - self.ref_max, self.best_margin)
+        for solver in running:
+            logging.debug("Interrupting %s", solver.id)
+            try:
+                solver.interrupt()
+            except Exception as e:
+                logging.warning("Could not interrupt %s: %s", solver.id, e)
+
+    def is_decided(self):
+        """
+        True if the finished solvers prove that the candidate's margin does
+        not exceed the best margin.
+        """
+        if self.tar_min is None or self.ref_max is None:
+            return False
+        return self.tar_min - self.ref_max <= self.best_margin
+
+    def saved_time(self):
+        """
+        Estimated solver time in ms saved by skipped solves, based on the
+        mean time of the completed solves. Time saved by interrupting
+        running solves is not included.
+        """
+        if not self.solve_times:
+            return 0
+        mean_time = sum(self.solve_times) / len(self.solve_times)
+        return round(self.skipped_solves * mean_time)
+
+    def report(self):
+        if not self.is_cancelled():
+            return
+        logging.info("Cut-off: skipped %d solves, interrupted %d; "
+                     "saved ~%dms solver time",
+                     self.skipped_solves, self.interrupted_solves,
+                     self.saved_time())
@@ -1,38 +1,93 @@
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import os
 import sys
 
 import yaml
 
+from probandit.campaign import assign_cpus
+from probandit.parsecache import shared_cache
+from probandit.selection import ReplaySelection, split_shards
 from probandit.solver import Solver
 from probandit.__main__ import eval_solvers
 
 
 def read_csv(csv_file):
+    """
+    Reads the results of a CSV file written by the fuzzing loop, yielding
+    one dictionary per row as the file is read. Besides the columns, each
+    dictionary has the benchmark's 1-based `number` among the read rows.
+
+    Missing solver times, i.e. empty columns, are None. The predicate and
+    the raw AST are quoted with quotes doubled inside them. Older files
+    did not double the quotes; such rows are split at the last '","'.
+    Rows which cannot be read are logged and skipped.
+    """
     with open(csv_file, 'r') as f:
         header = next(f).strip().split(',')
-        body = []
-        for line in f:
-            row_values = []
-            line = line.strip()
-            pred_pos = line.find('"')
-
-            # -1 skips trailing comma.
-            for val in line[:pred_pos-1].split(','):
-                row_values.append(int(val))
-
-            [pred, raw] = line[pred_pos+1:].split('","')
-            row_values.append(pred)
-            row_values.append(raw[:-1])  # -1 removes trailing quote.
-
-            body.append(row_values)
-
-    results = []
-    for row in body:
-        result = {}
-        for i, key in enumerate(header):
-            result[key] = row[i]
-        results.append(result)
-    return results
+        columns = len(header) - 2  # Columns before the predicate
+        benchmarks = 0
+        for number, line in enumerate(f, 2):
+            line = line.rstrip('\r\n')
+            if not line:
+                continue
+            try:
+                row = _read_row(line, columns)
+            except ValueError as e:
+                logging.warning('Skipping line %d of %s: %s', number,
+                                csv_file, e)
+                continue
+            benchmarks += 1
+            yield dict(zip(header, row), number=benchmarks)
+
+
+def _read_row(line, columns):
+    values = line.split(',', columns)
+    if len(values) <= columns:
+        raise ValueError('too few columns')
+    row = [_read_number(value) for value in values[:columns]]
+    return row + list(_split_quoted(values[columns]))
+
+
+def _read_number(value):
+    if value == '':
+        return None
+    if value.lstrip('-').isdigit():
+        return int(value)
+    return float(value)
+
+
+def _split_quoted(text):
+    # Returns the predicate and the raw AST of '"pred","raw_ast"'.
+    pred, pos = _read_quoted(text, 0)
+    if pred is not None and text.startswith(',', pos):
+        raw_ast, pos = _read_quoted(text, pos + 1)
+        if raw_ast is not None and pos == len(text):
+            return pred, raw_ast
+
+    # Legacy format without escaped quotes.
+    split = text.rfind('","')
+    if len(text) < 2 or text[0] != '"' or text[-1] != '"' or split == -1:
+        raise ValueError(f'malformed predicate and AST: {text[:80]}')
+    return text[1:split], text[split + 3:-1]
+
+
+def _read_quoted(text, pos):
+    # Reads the quoted field at pos. Returns its value and the position
+    # after it, or None if there is no quoted field.
+    if not text.startswith('"', pos):
+        return None, pos
+    parts = []
+    pos += 1
+    while True:
+        end = text.find('"', pos)
+        if end == -1:
+            return None, pos
+        parts.append(text[pos:end])
+        if not text.startswith('""', end):
+            return ''.join(parts), end + 1
+        parts.append('"')
+        pos = end + 2
 
 
 def replay(result, target_solvers, reference_solvers, discard_socket_timeouts=False):
@@ -56,21 +111,28 @@ def replay(result, target_solvers, reference_solvers, discard_socket_timeouts=Fa
 
 def replay_results(results, target_solvers, reference_solvers,
                    independent=True, discard_socket_timeouts=False):
-    counter = 0
+    """
+    Replays the benchmarks as they are read from the iterable `results`.
+    Returns a list with a pair (original margin, replay margin) for each
+    benchmark. The replay margin is None for skipped benchmarks, i.e. those
+    with margin 0. The benchmarks are logged with their `number` from
+    `read_csv`, or their position in `results` if they have none.
+    """
     margin_factors = []
     margins = []
-    for result in results:
-        counter += 1
+    for position, result in enumerate(results, 1):
+        counter = result.get('number', position)
         orig_margin = result['margin']
 
-        if orig_margin == 0:
+        if not orig_margin:
             logging.info('Skipping benchmark %d with margin 0', counter)
+            margins.append((orig_margin, None))
             continue
 
         replay_margin, _ = replay(result, target_solvers, reference_solvers,
                                   discard_socket_timeouts=discard_socket_timeouts)
 
-        margins.append(replay_margin)
+        margins.append((orig_margin, replay_margin))
 
         logging.info('Benchmark %d: Original margin %d, replay margin %d',
                      counter, orig_margin, replay_margin)
@@ -81,68 +143,221 @@ def replay_results(results, target_solvers, reference_solvers,
             for solver in (target_solvers | reference_solvers).values():
                 logging.debug('Restarting solver %s', solver.id)
                 solver.restart()
-    logging.info('Average margin factor: %f', sum(
-        margin_factors) / len(margin_factors))
+    if margin_factors:
+        logging.info('Average margin factor: %f', sum(
+            margin_factors) / len(margin_factors))
 
     return margins
 
 
-if __name__ == '__main__':
-    # First argument is the config file path
-    if len(sys.argv) < 2:
-        print("Usage: python probandit.py <config_file> <results_csv>")
-        sys.exit(1)
-
-    config_file = sys.argv[1]
-    config = yaml.safe_load(open(config_file, 'r'))
-
-    bf_options = config['fuzzer'].get('options', [])
-    discard_socket_timeout = 'solutions_only' in bf_options
+def replay_parallel(results, solver_sets, independent=True,
+                    discard_socket_timeouts=False):
+    """
+    Replays the benchmarks over several sets of solvers in parallel, each a
+    pair (target_solvers, reference_solvers) with its own probcli
+    instances. The benchmarks are split into contiguous shards, one per
+    set, and each shard is replayed in order by `replay_results`, so that
+    replays without restarts see the same preceding benchmarks as in a
+    sequential replay, apart from the shard boundaries.
+
+    Returns the margins of all benchmarks in their original order. With a
+    single set, the results are streamed; otherwise they are read up front.
+    """
+    if len(solver_sets) == 1:
+        target_solvers, reference_solvers = solver_sets[0]
+        return replay_results(results, target_solvers, reference_solvers,
+                              independent=independent,
+                              discard_socket_timeouts=discard_socket_timeouts)
+
+    shards = split_shards(list(results), len(solver_sets))
+    with ThreadPoolExecutor(max_workers=len(solver_sets)) as executor:
+        futures = []
+        for shard, (target_solvers, reference_solvers) in zip(shards,
+                                                              solver_sets):
+            futures.append(executor.submit(
+                replay_results, shard, target_solvers, reference_solvers,
+                independent=independent,
+                discard_socket_timeouts=discard_socket_timeouts))
+        margins = []
+        for future in futures:
+            margins += future.result()
+
+    factors = [replay / orig for orig, replay in margins
+               if replay is not None]
+    if factors:
+        logging.info('Average margin factor over all shards: %f',
+                     sum(factors) / len(factors))
+    return margins
 
-    csv_file = sys.argv[2]
 
+def start_solvers(config, selection=None):
+    """
+    Starts the target and reference solvers of the configuration, or only
+    those chosen by the `ReplaySelection`. Returns a pair of dictionaries
+    from solver ids to solvers.
+    """
     target_ids = config['fuzzer']['targets']
+    reference_ids = config['fuzzer']['references']
+    if selection is not None:
+        target_ids = selection.solver_ids(target_ids)
+        reference_ids = selection.solver_ids(reference_ids)
+    if not target_ids or not reference_ids:
+        raise ValueError('At least one target and one reference solver '
+                         'must be replayed')
+
     target_solvers = {id: Solver(id=id, **(config['solvers'][id]))
                       for id in target_ids}
     for id, solver in target_solvers.items():
         logging.info('Starting solver %s', solver.id)
         solver.start()
 
-    reference_ids = config['fuzzer']['references']
     reference_solvers = {id: Solver(id=id, **(config['solvers'][id]))
                          for id in reference_ids}
     for id, solver in reference_solvers.items():
         logging.info('Starting solver %s', solver.id)
         solver.start()
+    return target_solvers, reference_solvers
+
+
+def pin_solver_sets(solver_sets):
+    """
+    Pins the probcli processes of each solver set to its own disjoint set
+    of CPUs, so that parallel replays do not compete for CPUs. Raises a
+    ValueError if there are fewer CPUs available than solver sets.
+    """
+    if len(solver_sets) == 1:
+        return
+    if (hasattr(os, 'sched_getaffinity')
+            and len(os.sched_getaffinity(0)) < len(solver_sets)):
+        raise ValueError(f'{len(solver_sets)} parallel replays need at least '
+                         f'as many CPUs, found {len(os.sched_getaffinity(0))}')
+    for cpus, (target_solvers, reference_solvers) in zip(
+            assign_cpus(len(solver_sets)), solver_sets):
+        for solver in (target_solvers | reference_solvers).values():
+            solver.pin(cpus)
+
+
+def preparse(results, solvers, chunk_size=256):
+    """
+    Passes the results through while parsing their predicates ahead in
+    chunks of `chunk_size`, once per parser of the solvers, into the shared
+    parse cache.
+    """
+    chunk = []
+    for result in results:
+        chunk.append(result)
+        if len(chunk) == chunk_size:
+            _preparse_chunk(chunk, solvers)
+            yield from chunk
+            chunk = []
+    _preparse_chunk(chunk, solvers)
+    yield from chunk
+
 
-    logging.info('Reading results from %s', csv_file)
-    results = read_csv(csv_file)
+def _preparse_chunk(chunk, solvers):
+    # The parsers are looked up for each chunk, as restarting a solver may
+    # close its parser and start a new one.
+    parsers = {solver.cli.parser.jar: solver.cli.parser
+               for solver in solvers
+               if solver.parse_cache and solver.cli.parser is not None}
+    preds = [result['pred'] for result in chunk]
+    for parser in parsers.values():
+        parsed = shared_cache.parse_many(parser, preds)
+        logging.debug('Pre-parsed %d predicates with %s', parsed, parser.jar)
 
-    logging.info('Replaying results independently')
-    ind_margins = replay_results(results,
-                                 target_solvers=target_solvers,
-                                 reference_solvers=reference_solvers,
-                                 independent=True,
-                                 discard_socket_timeouts=discard_socket_timeout)
+
+def _percentage(margin, orig_margin):
+    if margin is None or not orig_margin:
+        return '     N/A'
+    return f'{margin / orig_margin: 4.2%}'
+
+
+def _margin(margin):
+    return '     N/A' if margin is None else f'{margin: 8d}'
+
+
+if __name__ == '__main__':
+    # First argument is the config file path
+    if len(sys.argv) < 2:
+        print("Usage: python probandit.py <config_file> <results_csv>")
+        sys.exit(1)
+
+    config_file = sys.argv[1]
+    config = yaml.safe_load(open(config_file, 'r'))
+
+    bf_options = config['fuzzer'].get('options', [])
+    discard_socket_timeout = 'solutions_only' in bf_options
+
+    csv_file = sys.argv[2]
+
+    selection = ReplaySelection(**config['fuzzer'].get('replay_select', {}))
+
+    # Each parallel replay uses its own set of solvers.
+    parallel = config['fuzzer'].get('replay_parallel', 1)
+    solver_sets = [start_solvers(config, selection) for _ in range(parallel)]
+    solvers = [solver for target_solvers, reference_solvers in solver_sets
+               for solver in (target_solvers | reference_solvers).values()]
+    try:
+        pin_solver_sets(solver_sets)
+    except ValueError as e:
+        logging.error('Cannot replay in parallel: %s', e)
+        for solver in solvers:
+            solver.close()
+        sys.exit(1)
+
+    parse_cache_file = config['fuzzer'].get('parse_cache_file', None)
+    if parse_cache_file:
+        loaded = shared_cache.load(parse_cache_file)
+        shared_cache.maxsize = max(shared_cache.maxsize, loaded)
+        logging.info('Loaded %d parsed predicates from %s', loaded,
+                     parse_cache_file)
+
+    # The benchmarks are selected by their margins in a first pass, and
+    # streamed from the CSV file again in each replay pass. The margins are
+    # those over the replayed solvers.
+    def csv_results():
+        return selection.restrict(read_csv(csv_file),
+                                  config['fuzzer']['targets'],
+                                  config['fuzzer']['references'])
+
+    selection.fit(result['margin'] for result in csv_results())
+    logging.info('Selected %d of %d benchmarks: %s', len(selection.indices),
+                 selection.total, selection.describe())
+
+    # Benchmarks are parsed ahead in batches, once per parser.
+    def selected_results():
+        return preparse(selection.filter(csv_results()), solvers)
+
+    logging.info('Replaying results from %s independently', csv_file)
+    ind_margins = replay_parallel(selected_results(),
+                                  solver_sets, independent=True,
+                                  discard_socket_timeouts=discard_socket_timeout)
 
     logging.info('Replaying results without restarting solvers')
-    dep_margins = replay_results(results,
-                                 target_solvers=target_solvers,
-                                 reference_solvers=reference_solvers,
-                                 independent=False,
-                                 discard_socket_timeouts=discard_socket_timeout)
+    dep_margins = replay_parallel(selected_results(),
+                                  solver_sets, independent=False,
+                                  discard_socket_timeouts=discard_socket_timeout)
+
+    for solver in solvers:
+        solver.close()
+
 
+    shared_cache.log_stats()
+    if parse_cache_file:
+        shared_cache.save(parse_cache_file)
 
-    orig_margins = [result['margin'] for result in results]
+    selection.log_summary(ind_margins, label='Independent replay')
+    selection.log_summary(dep_margins, label='Dependent replay')
 
     print('No.  ', '    Orig', '  Indiv.', '  % Orig', '    Dep.', '  % Orig')
-    for i in range(len(orig_margins)):
+    for i, (orig, ind), (_, dep) in zip(selection.indices, ind_margins,
+                                        dep_margins):
         row = [
             f'# {i+1:03d}',
-            f'{orig_margins[i]: 8d}',
-            f'{ind_margins[i]: 8d}',
-            f'{ind_margins[i]/orig_margins[i]: 4.2%}' if orig_margins[i] != 0 else '     N/A',
-            f'{dep_margins[i]: 8d}',
-            f'{ind_margins[i]/orig_margins[i]: 4.2%}' if orig_margins[i] != 0 else '     N/A',
+            f'{orig: 8d}',
+            _margin(ind),
+            _percentage(ind, orig),
+            _margin(dep),
+            _percentage(dep, orig),
         ]
         print(' '.join(row))
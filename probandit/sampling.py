@@ -0,0 +1,111 @@
+from functools import lru_cache
+from math import atan, cos, pi, sin, sqrt
+from statistics import mean, variance
+
+
+class AdaptiveSampler():
+    """
+    Decides how often a candidate predicate is sampled.
+
+    Instead of a fixed number of samples, the candidate is sampled in
+    rounds, each yielding one sample of the performance margin. Sampling
+    continues while the confidence interval of the mean margin still
+    contains the best margin so far, i.e. while it is statistically unclear
+    whether the candidate beats it. At least `min_samples` and at most
+    `max_samples` rounds are done.
+
+    Candidates which are clearly no improvement are not sampled up to
+    `min_samples`: sampling stops early if the mean margin is not positive
+    or below `discard_below` times the best margin.
+    """
+
+    def __init__(self, min_samples=2, max_samples=10, confidence=0.95,
+                 discard_below=0.5):
+        if min_samples < 1 or max_samples < min_samples:
+            raise ValueError(
+                f"Invalid sample bounds: [{min_samples}, {max_samples}]")
+        if not 0 < confidence < 1:
+            raise ValueError(f"Confidence must be in (0, 1), got {confidence}")
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.confidence = confidence
+        self.discard_below = discard_below
+
+    def needs_more(self, margins, best_margin):
+        """
+        Returns True if another round of samples is needed for the given
+        margin samples.
+        """
+        n = len(margins)
+        if n < self.min_samples:
+            return n == 0 or not self.hopeless(margins, best_margin)
+        if n >= self.max_samples or best_margin is None or n < 2:
+            return False
+        low, high = self.confidence_interval(margins)
+        return low <= best_margin <= high
+
+    def hopeless(self, margins, best_margin):
+        """
+        Returns True if the margin samples are clearly no improvement over
+        the best margin.
+        """
+        m = mean(margins)
+        if m <= 0:
+            return True
+        return best_margin is not None and m < self.discard_below * best_margin
+
+    def confidence_interval(self, margins):
+        """
+        Two-sided confidence interval of the mean margin, based on Student's
+        t-distribution and the sample variance.
+        """
+        n = len(margins)
+        m = mean(margins)
+        if n < 2:
+            return m, m
+        half_width = (_t_quantile((1 + self.confidence) / 2, n - 1)
+                      * sqrt(variance(margins) / n))
+        return m - half_width, m + half_width
+
+
+def margin_variance(margins):
+    """
+    Sample variance of the margins; 0 for less than two samples.
+    """
+    return variance(margins) if len(margins) > 1 else 0.0
+
+
+@lru_cache(maxsize=None)
+def _t_quantile(p, df):
+    # Quantile of Student's t-distribution for p > 0.5 and an integer
+    # number of degrees of freedom, by bisection of the exact distribution
+    # function.
+    target = 2 * p - 1
+    low, high = 0.0, 1.0
+    while _t_central(high, df) < target:
+        low, high = high, 2 * high
+    for _ in range(100):
+        middle = (low + high) / 2
+        if _t_central(middle, df) < target:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def _t_central(t, df):
+    # P(|T| <= t) for Student's t-distribution with df degrees of freedom,
+    # by the finite series for integer df (Abramowitz and Stegun 26.7.3/4).
+    theta = atan(t / sqrt(df))
+    c2 = cos(theta) ** 2
+    if df % 2 == 1:
+        term = total = cos(theta) if df > 1 else 0.0
+        for k in range(3, df - 1, 2):
+            term *= c2 * (k - 1) / k
+            total += term
+        return 2 / pi * (theta + sin(theta) * total)
+    term = total = 1.0
+    for k in range(2, df - 1, 2):
+        term *= c2 * (k - 1) / k
+        total += term
+    return sin(theta) * total
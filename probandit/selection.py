@@ -0,0 +1,219 @@
+import logging
+import random
+
+
+class ReplaySelection():
+    """
+    Selects the benchmarks of a result CSV which are replayed.
+
+    The selection is made from the original margins of all benchmarks.
+    Benchmarks with margin 0 are never selected, as they are not replayed.
+    The criteria are applied in order:
+
+    1. Only margins within [`min_margin`, `max_margin`] are kept.
+    2. Only the `top_k` largest margins are kept.
+    3. A random sample of `sample` benchmarks is drawn. With `strata` > 1,
+       the benchmarks are split into strata of similar margins and the
+       sample is spread over them in proportion to their sizes.
+
+    Each selected benchmark has a weight, the number of benchmarks it
+    represents in its stratum. Weighted statistics over a sample estimate
+    the statistics over all benchmarks kept by the first two criteria.
+
+    Additionally, the replay can be restricted to the `solvers` with the
+    given ids, i.e. to some of the CSV's solver columns. The original
+    margins are then recomputed over these solvers by `restrict`, so that
+    the selection and the statistics compare margins of the same solvers.
+    """
+
+    def __init__(self, top_k=None, min_margin=None, max_margin=None,
+                 sample=None, strata=1, seed=None, solvers=None):
+        if top_k is not None and top_k < 1:
+            raise ValueError(f"top_k must be positive, got {top_k}")
+        if sample is not None and sample < 1:
+            raise ValueError(f"Sample size must be positive, got {sample}")
+        if strata < 1:
+            raise ValueError(
+                f"Number of strata must be positive, got {strata}")
+        self.top_k = top_k
+        self.min_margin = min_margin
+        self.max_margin = max_margin
+        self.sample = sample
+        self.strata = strata
+        self.seed = seed
+        self.solvers = solvers
+
+        self.total = 0  # Number of benchmarks
+        self.population = 0  # Number of benchmarks kept before sampling
+        self.indices = []  # Selected benchmarks in their original order
+        self.weights = []  # Weight of each selected benchmark
+
+    def solver_ids(self, ids):
+        """
+        Returns the given solver ids which are replayed.
+        """
+        if self.solvers is None:
+            return list(ids)
+        return [id for id in ids if id in self.solvers]
+
+    def restrict(self, results, target_ids, reference_ids):
+        """
+        Yields the results of the iterable `results` with their margins over
+        the replayed solvers, given all target and reference ids. Without
+        `solvers`, the results are passed through. Otherwise, the margin is
+        recomputed from the selected solvers' times as the minimal target
+        time minus the maximal reference time, or None if a selected time
+        is missing, which makes the benchmark unselectable.
+        """
+        if self.solvers is None:
+            yield from results
+            return
+        targets = self.solver_ids(target_ids)
+        references = self.solver_ids(reference_ids)
+        for result in results:
+            times = [result.get(id) for id in targets + references]
+            if any(time is None for time in times):
+                margin = None
+            else:
+                margin = (min(result[id] for id in targets)
+                          - max(result[id] for id in references))
+            yield dict(result, margin=margin)
+
+    def fit(self, margins):
+        """
+        Selects benchmarks by their original margins, given in the order of
+        the CSV file. Returns the indices of the selected benchmarks.
+        """
+        margins = list(margins)
+        self.total = len(margins)
+        candidates = [i for i, margin in enumerate(margins)
+                      if margin and self._within_bounds(margin)]
+        if self.top_k is not None:
+            candidates.sort(key=lambda i: margins[i], reverse=True)
+            candidates = candidates[:self.top_k]
+        self.population = len(candidates)
+
+        weights = {i: 1.0 for i in candidates}
+        if self.sample is not None and self.sample < len(candidates):
+            weights = self._draw_sample(candidates, margins)
+
+        self.indices = sorted(weights)
+        self.weights = [weights[i] for i in self.indices]
+        return self.indices
+
+    def filter(self, results):
+        """
+        Yields the selected benchmarks of the iterable `results`, which must
+        contain the benchmarks passed to `fit` in the same order.
+        """
+        selected = iter(self.indices)
+        next_index = next(selected, None)
+        for i, result in enumerate(results):
+            if next_index is None:
+                return
+            if i == next_index:
+                yield result
+                next_index = next(selected, None)
+
+    def describe(self):
+        criteria = []
+        if self.min_margin is not None or self.max_margin is not None:
+            criteria.append(f'margin in [{self.min_margin}, '
+                            f'{self.max_margin}]')
+        if self.top_k is not None:
+            criteria.append(f'top {self.top_k} by margin')
+        if self.sample is not None:
+            kind = (f'stratified over {self.strata} strata'
+                    if self.strata > 1 else 'random')
+            criteria.append(f'{kind} sample of {self.sample}')
+        if self.solvers is not None:
+            criteria.append('solvers ' + ', '.join(self.solvers))
+        return ', '.join(criteria) or 'all benchmarks'
+
+    def log_summary(self, margins, label='Replay'):
+        """
+        Logs statistics of the replayed margins, a list of pairs (original
+        margin, replay margin) of the selected benchmarks as returned by
+        `replay_results`, weighted by the selection weights.
+        """
+        stats = summary_statistics(margins, self.weights)
+        if stats is None:
+            logging.info('%s: no benchmarks replayed', label)
+            return
+        scope = ('estimated over %d benchmarks' % self.population
+                 if len(self.indices) < self.population
+                 else 'over the selection')
+        logging.info('%s (%s): mean margin factor %.3f, reproduced %.1f%%, '
+                     'mean replay margin %.1f', label, scope,
+                     stats['mean_factor'], 100 * stats['reproduced'],
+                     stats['mean_margin'])
+
+    def _within_bounds(self, margin):
+        if self.min_margin is not None and margin < self.min_margin:
+            return False
+        if self.max_margin is not None and margin > self.max_margin:
+            return False
+        return True
+
+    def _draw_sample(self, candidates, margins):
+        rng = random.Random(self.seed)
+        by_margin = sorted(candidates, key=lambda i: margins[i])
+        strata = split_shards(by_margin, min(self.strata, self.sample))
+
+        weights = {}
+        for stratum, size in zip(strata, _allocate(self.sample, strata)):
+            for i in rng.sample(stratum, size):
+                weights[i] = len(stratum) / size
+        return weights
+
+
+def summary_statistics(margins, weights):
+    """
+    Returns the weighted mean margin factor, the weighted fraction of
+    reproduced benchmarks (replay margin > 0) and the weighted mean replay
+    margin over the replayed benchmarks, or None if none was replayed.
+    """
+    replayed = [(orig, replay, weight)
+                for (orig, replay), weight in zip(margins, weights)
+                if replay is not None and orig]
+    total_weight = sum(weight for _, _, weight in replayed)
+    if not total_weight:
+        return None
+    factors = sum(weight * replay / orig for orig, replay, weight in replayed)
+    reproduced = sum(weight for _, replay, weight in replayed if replay > 0)
+    replay_sum = sum(weight * replay for _, replay, weight in replayed)
+    return {'mean_factor': factors / total_weight,
+            'reproduced': reproduced / total_weight,
+            'mean_margin': replay_sum / total_weight}
+
+
+def split_shards(items, count):
+    """
+    Splits the list into `count` contiguous shards whose sizes differ by at
+    most one.
+    """
+    size, rest = divmod(len(items), count)
+    shards = []
+    start = 0
+    for i in range(count):
+        end = start + size + (1 if i < rest else 0)
+        shards.append(items[start:end])
+        start = end
+    return shards
+
+
+def _allocate(sample, strata):
+    # Proportional allocation by largest remainders; every non-empty
+    # stratum gets at least one sample.
+    total = sum(len(stratum) for stratum in strata)
+    shares = [sample * len(stratum) / total for stratum in strata]
+    sizes = [max(1, int(share)) if stratum else 0
+             for share, stratum in zip(shares, strata)]
+    order = sorted(range(len(strata)),
+                   key=lambda h: shares[h] - int(shares[h]), reverse=True)
+    for h in order:
+        if sum(sizes) >= sample:
+            break
+        if sizes[h] < len(strata[h]):
+            sizes[h] += 1
+    return sizes
@@ -1,8 +1,12 @@
 import logging
 import os
+from time import perf_counter
 
+from probandit.parsecache import shared_cache
+from probandit.pool import CliPool
 import probcli.answerparser as answerparser
 from probcli import ProBCli
+from probcli.bparser import acquire_parser, release_parser
 
 
 class Solver():
@@ -30,6 +34,15 @@ class Solver():
         - call_time_var (optional): the name of the variable in the Prolog call
             that contains the time it took to solve the predicate
             - Default is 'Msec'
+        - compact_terms (optional): if True, answers of probcli are parsed
+            into the compact term format, which is faster for large solutions
+            - Default is True
+        - standby (optional): number of probcli instances kept started on
+            standby, so that restarts do not wait for probcli to start up
+            - Default is 0, i.e. no standby instances
+        - parse_cache (optional): if True, parsed predicates are cached in
+            the parse cache shared by all solvers
+            - Default is True
         """
         self.config = solver_config
         self.id = id
@@ -59,6 +72,14 @@ class Solver():
             self.pred_call = self.pred_call.replace('$base', self.base_solver)
         self.res_var = self.config.get('call_result_var', 'Res')
         self.time_var = self.config.get('call_time_var', 'Msec')
+        self.compact_terms = self.config.get('compact_terms', True)
+        self.standby = self.config.get('standby', 0)
+        self.parse_cache = self.config.get('parse_cache', True)
+        self.reported_time = 0.0  # Total solving time reported by probcli in s
+        self.wall_time = 0.0  # Total wall-clock time of the solver calls in s
+        self.cpus = None  # CPUs the probcli process is pinned to, see `pin`
+        self.pool = None
+        self._parser = None
 
         self._cli_args = []
         if not isinstance(self.cli_preferences, list):
@@ -86,8 +107,18 @@ class Solver():
                     break
 
     def start(self, port=None):
-        used_port = self.cli.start(port, self._cli_args)
+        if self.standby and port is None:
+            if self.pool is None:
+                self.pool = CliPool(self.path, self._cli_args, self.standby)
+            self.cli, used_port = self.pool.get()
+        else:
+            used_port = self.cli.start(port, self._cli_args)
         self.port = used_port
+        self._pin()
+
+        # Hold on to the shared parser so it survives restarts.
+        if self._parser is None and self.cli.parser is not None:
+            self._parser = acquire_parser(self.cli.parser.jar)
 
     def with_cli_at(self, port):
         self.cli = ProBCli(self.path)
@@ -97,15 +128,40 @@ class Solver():
     def close(self):
         self.cli.close()
         self.port = None
+        if self.pool:
+            self.pool.close()
+            self.pool = None
+        if self._parser:
+            release_parser(self._parser)
+            self._parser = None
 
     def restart(self, port=None):
-        self.close()
-        self.start(port)
+        if self.pool and port is None:
+            # Swap in a standby instance and close the used one meanwhile.
+            self.pool.retire(self.cli)
+            self.cli, self.port = self.pool.get()
+            self._pin()
+        else:
+            self.cli.close()
+            self.start(port)
+
+    def pin(self, cpus):
+        """
+        Pins the solver's probcli process to the given set of CPUs. The
+        processes of later restarts are pinned as well.
+        """
+        self.cpus = cpus
+        self._pin()
+
+    def _pin(self):
+        if self.cpus and self.cli.cli_process is not None:
+            os.sched_setaffinity(self.cli.cli_process.pid, self.cpus)
 
     def interrupt(self):
         self.cli.send_interrupt()
 
-    def solve(self, predicate, sequence_like_as_list=True, par2=False):
+    def solve(self, predicate, sequence_like_as_list=True, par2=False,
+              timing_only=False, ast=None):
         """
         Attempt to solve the given predicate and return the answer
 
@@ -115,6 +171,11 @@ class Solver():
           to sequences into lists. For instance, "f:{1,2}-->{1,2}" would
           have the solution 'f': [1, 1] instead of 'f': {(1,1), (2,1)}.
         - par2: if True, the returned time is the par2 score of the solver
+        - timing_only: if True, only the answer type and the time are
+          parsed from probcli's answer. The bindings of a 'solution' are
+          not parsed and returned as None.
+        - ast: the Prolog AST of the predicate as accepted by the
+          prolog_call. If given, the predicate is not parsed.
 
         Returns:
         - answer: the answer from the solver
@@ -131,26 +192,44 @@ class Solver():
           time unit. The value -1 indicates that the time measurement was not
           possible.
         """
-        parsed_pred = self.cli.parser.parse_to_prolog(predicate)
+        if ast is not None:
+            parsed_pred = ast
+        elif self.parse_cache:
+            parsed_pred = shared_cache.parse(self.cli.parser, predicate)
+        else:
+            parsed_pred = self.cli.parser.parse_to_prolog(predicate)
         query = self.pred_call.replace('$pred', parsed_pred)
         query = query.replace('$options', self._call_option_string)
 
         logging.debug('Query: %s', query)
 
-        self.cli.send_prolog(query)
-        answer, info = self.cli.receive_prolog()
+        start = perf_counter()
+        try:
+            self.cli.send_prolog(query)
+            answer, info = self.cli.receive_prolog(compact=self.compact_terms,
+                                                   lazy=timing_only)
+        finally:
+            self.wall_time += perf_counter() - start
 
         logging.debug('Answer: %s; info: %s', answer, info)
 
         time = -1
         if info and self.time_var in info:
-            time = self._translate_solution_value(info[self.time_var]['value'])
+            time = self._translate_solution_value(
+                _term_value(info[self.time_var]))
+            self.reported_time += time / 1000
 
         if answer == 'yes' and info and self.res_var in info:
             res = info[self.res_var]
 
-            yes_type = res['value']
             yes_info = None
+            if timing_only and res.functor == 'solution':
+                # The solution's bindings are left unparsed.
+                yes_type = 'solution'
+            else:
+                if timing_only:
+                    res = res.term
+                yes_type = _term_value(res)
 
             if yes_type == 'contradiction_found':
                 ...
@@ -159,8 +238,15 @@ class Solver():
             elif isinstance(yes_type, tuple) and yes_type[0] == 'no_solution_found':
                 yes_info = yes_type[1]
                 yes_type = yes_type[0]
+            elif (isinstance(yes_type, answerparser.Compound)
+                  and yes_type.functor == 'no_solution_found'):
+                yes_info = [answerparser.to_dict_term(arg)
+                            for arg in yes_type.args]
+                yes_type = yes_type.functor
             elif yes_type == 'error':
                 yes_info = "ProB error"
+            elif yes_type == 'solution':
+                ...
             else:
                 yes_type = 'solution'
                 yes_info = self._translate_solution(res,
@@ -180,22 +266,36 @@ class Solver():
         return answer, info, time
 
     def _translate_solution(self, solution, seq_as_list=True):
-        if not solution['type'] == 'compound' or not solution['value'][0] == 'solution':
+        if isinstance(solution, answerparser.Compound):
+            if solution.functor != 'solution':
+                raise ValueError(f"Invalid solution format: {solution}")
+            solution_list = solution.args[0]
+        elif solution['type'] == 'compound' and solution['value'][0] == 'solution':
+            solution_list = solution['value'][1][0]
+        else:
             raise ValueError(f"Invalid solution format: {solution}")
-        solution_list = solution['value'][1][0]
         solution_list = answerparser.translate_prolog_dot_list(solution_list)
 
         solution_dict = {}
         for binding in solution_list:
-            binding_data = binding['value'][1]
-            identifier = binding_data[0]['value']
-            value = self._translate_solution_value(binding_data[1]['value'],
-                                                   binding_data[2]['value'],
+            if isinstance(binding, answerparser.Compound):
+                identifier, value, pprint = binding.args[:3]
+            else:
+                binding_data = binding['value'][1]
+                identifier = binding_data[0]['value']
+                value = binding_data[1]['value']
+                pprint = binding_data[2]['value']
+            value = self._translate_solution_value(value, pprint,
                                                    seq_as_list=seq_as_list)
             solution_dict[identifier] = value
         return solution_dict
 
     def _translate_solution_value(self, value, pprint=None, seq_as_list=True):
+        """
+        Translates a bound value into a Python object. The value is either
+        the 'value' entry of a term in the dictionary format or a term in
+        the compact format of `answerparser`.
+        """
         if pprint == '{}':
             # Empty set special case
             return frozenset()
@@ -204,6 +304,8 @@ class Solver():
 
         if value == 'contradiction_found':
             return None
+        if isinstance(value, answerparser.Compound):
+            return self._translate_compact_value(value, seq_as_list)
         if type(value) is tuple:
             typ = value[0]
             val = value[1]
@@ -233,21 +335,48 @@ class Solver():
                 raise ValueError(f"Unknown type: {typ}; value: {val}")
         return value
 
+    def _translate_compact_value(self, value, seq_as_list=True):
+        typ = value.functor
+        args = value.args
+        if typ in ('int', 'floating', 'string', 'global_set'):
+            return args[0]
+        elif typ == 'avl_set':
+            bset = frozenset(self._translate_avl_set(args[0]))
+            # This could be a sequence.
+            if seq_as_list:
+                if bseq := self._translate_bseq(bset):
+                    return bseq
+            return bset
+        elif typ == 'term':
+            if (isinstance(args[0], answerparser.Compound)
+                    and args[0].functor == 'floating'):
+                return args[0].args[0]
+            return value
+        elif typ == ',':
+            lhs = self._translate_solution_value(args[0])
+            rhs = self._translate_solution_value(args[1])
+            return (lhs, rhs)
+        raise ValueError(f"Unknown type: {typ}; value: {args}")
+
     def _translate_avl_set(self, value) -> list:
         # AVL layout: node(Value, True, Balance, Left, Right)
-        if value['value'] == 'empty':
-            return []
-
+        # The tree is traversed with an explicit stack in pre-order.
         result = []
-        val = value['value'][1][0]['value']
-        truth = value['value'][1][1]
-        left = value['value'][1][3]
-        right = value['value'][1][4]
+        stack = [value]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, answerparser.Compound):
+                val, _, _, left, right = node.args
+            elif node == 'empty' or node['value'] == 'empty':
+                continue
+            else:
+                args = node['value'][1]
+                val = args[0]['value']
+                left, right = args[3], args[4]
 
-        trans_val = self._translate_solution_value(val)
-        result.append(trans_val)
-        result += self._translate_avl_set(left)
-        result += self._translate_avl_set(right)
+            result.append(self._translate_solution_value(val))
+            stack.append(right)
+            stack.append(left)
 
         return result
 
@@ -271,3 +400,15 @@ class Solver():
             bseq.append(d[i])
 
         return tuple(bseq)
+
+
+def _term_value(term):
+    """
+    Returns the 'value' entry of a term in the dictionary format, or the
+    term itself if it is in the compact format. Lazy terms are parsed first.
+    """
+    if isinstance(term, answerparser.LazyTerm):
+        term = term.term
+    if isinstance(term, dict):
+        return term['value']
+    return term
@@ -0,0 +1,362 @@
+import argparse
+from contextlib import contextmanager
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL,
+    finished REAL,
+    host TEXT,
+    pid INTEGER,
+    config TEXT,
+    stats TEXT
+);
+CREATE TABLE IF NOT EXISTS benchmarks (
+    id INTEGER PRIMARY KEY,
+    pred_hash TEXT NOT NULL,
+    pred TEXT NOT NULL,
+    raw_ast TEXT,
+    margin NUMERIC,
+    run_id INTEGER REFERENCES runs(id),
+    found REAL,
+    occurrences INTEGER NOT NULL DEFAULT 1
+);
+CREATE UNIQUE INDEX IF NOT EXISTS benchmarks_pred_hash
+    ON benchmarks(pred_hash);
+CREATE TABLE IF NOT EXISTS timings (
+    benchmark_id INTEGER NOT NULL REFERENCES benchmarks(id),
+    solver TEXT NOT NULL,
+    answer TEXT,
+    result TEXT,
+    time NUMERIC,
+    PRIMARY KEY (benchmark_id, solver)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    benchmark_id INTEGER PRIMARY KEY REFERENCES benchmarks(id),
+    samples INTEGER,
+    variance REAL
+);
+CREATE TABLE IF NOT EXISTS contradictions (
+    id INTEGER PRIMARY KEY,
+    pred_hash TEXT NOT NULL,
+    pred TEXT NOT NULL,
+    results TEXT,
+    run_id INTEGER REFERENCES runs(id),
+    found REAL
+);
+CREATE INDEX IF NOT EXISTS contradictions_pred_hash
+    ON contradictions(pred_hash);
+"""
+
+
+class ResultStore():
+    """
+    Stores the results of fuzzing runs in an SQLite database: the found
+    benchmarks with the timings of each solver and, with adaptive sampling,
+    their sample statistics, contradictions, and metadata of each run.
+
+    Benchmarks are identified by the hash of their predicate. A predicate
+    which is found again, e.g. by another run, is not stored twice; its
+    occurrences are counted and a larger margin replaces the stored one.
+
+    The database is opened in WAL mode, so that several processes, e.g. the
+    workers of a campaign, can write to it and readers do not block
+    writers. Results are buffered in memory and written by a background
+    thread in a single short transaction per batch, once `batch_size`
+    results are buffered or after `commit_interval` seconds. Thus, the
+    fuzzing loop never waits for the disk or for other writers.
+
+    Errors of the database are logged and otherwise ignored, so that they
+    do not end the fuzzing run; the result CSV stays complete. Batches
+    which failed because the database was locked are retried.
+    """
+
+    def __init__(self, path, batch_size=50, commit_interval=5.0, timeout=60):
+        """
+        Parameters
+        ----------
+        path : str
+            Path of the database file. It is created if it does not exist.
+        batch_size : int
+            Number of buffered results after which they are written.
+        commit_interval : float
+            Seconds after which buffered results are written.
+        timeout : float
+            Seconds a batch waits for the transactions of other writers.
+        """
+        if sqlite3.sqlite_version_info < (3, 24, 0):
+            raise RuntimeError('The result store needs SQLite 3.24 or later, '
+                               f'found {sqlite3.sqlite_version}')
+        self.path = path
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.run_id = None
+        self.duplicates = 0
+
+        self._pending = []  # Buffered writes (function, arguments)
+        self._pending_lock = threading.Lock()
+        self._lock = threading.RLock()  # Guards the connection
+        # Transactions are begun explicitly, see `_transaction`.
+        self._conn = sqlite3.connect(path, timeout=timeout,
+                                     isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        with self._transaction() as conn:
+            for statement in SCHEMA.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+
+        self._wake = threading.Event()
+        self._closing = False
+        self._writer = threading.Thread(target=self._write_batches,
+                                        name='result-store', daemon=True)
+        self._writer.start()
+
+    def start_run(self, config=None):
+        """
+        Records the start of a run with its configuration. Subsequent
+        results are attributed to this run. Returns the run's id.
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                'INSERT INTO runs (started, host, pid, config) '
+                'VALUES (?, ?, ?, ?)',
+                (time.time(), socket.gethostname(), os.getpid(),
+                 json.dumps(config, default=str)))
+            self.run_id = cursor.lastrowid
+        return self.run_id
+
+    def end_run(self, **stats):
+        """
+        Writes the buffered results and records the end of the current run
+        with the given statistics.
+        """
+        self.flush()
+        try:
+            with self._transaction() as conn:
+                conn.execute(
+                    'UPDATE runs SET finished = ?, stats = ? WHERE id = ?',
+                    (time.time(), json.dumps(stats), self.run_id))
+        except sqlite3.Error as e:
+            logging.error("Could not record the end of the run: %s", e)
+
+    def add_benchmark(self, pred, raw_ast, results, margin, sampling=None):
+        """
+        Buffers a benchmark with the results of its solvers and, optionally,
+        its sampling statistics (samples, variance).
+        """
+        self._buffer(self._write_benchmark,
+                     (pred, raw_ast, results, margin, sampling, self.run_id,
+                      time.time()))
+
+    def add_contradiction(self, pred, results):
+        """
+        Buffers a predicate on which the solvers contradict each other.
+        """
+        dumped = {sid: [answer, None if info is None else str(info), time_]
+                  for sid, (answer, info, time_) in results.items()}
+        self._buffer(self._write_contradiction,
+                     (pred, json.dumps(dumped), self.run_id, time.time()))
+
+    def flush(self):
+        """
+        Writes the buffered results in a single transaction.
+        """
+        with self._lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, []
+            if not pending or self._conn is None:
+                return
+            try:
+                with self._transaction():
+                    for write, args in pending:
+                        write(*args)
+            except sqlite3.OperationalError as e:
+                # E.g. locked for longer than the timeout; retried later.
+                logging.error("Could not store %d results: %s",
+                              len(pending), e)
+                with self._pending_lock:
+                    self._pending[:0] = pending
+            except sqlite3.Error as e:
+                logging.error("Could not store %d results: %s",
+                              len(pending), e)
+
+    def contains(self, pred):
+        self.flush()
+        with self._lock:
+            return self._conn.execute(
+                'SELECT 1 FROM benchmarks WHERE pred_hash = ?',
+                (pred_hash(pred),)).fetchone() is not None
+
+    def close(self):
+        if self._conn is None:
+            return
+        self._closing = True
+        self._wake.set()
+        self._writer.join()
+        self.flush()
+        self._conn.close()
+        self._conn = None
+        logging.info("Closed result store %s; %d duplicate benchmarks",
+                     self.path, self.duplicates)
+
+    def export_csv(self, csv, run_id=None):
+        """
+        Writes the stored benchmarks, or only those of one run, to a CSV
+        file in the format of the fuzzing loop. Returns the number of
+        written benchmarks.
+        """
+        from probandit.__main__ import write_results
+
+        self.flush()
+        where, params = ('WHERE run_id = ?', (run_id,)) if run_id else ('', ())
+        with self._lock:
+            benchmarks = self._conn.execute(
+                'SELECT id, pred, raw_ast, margin FROM benchmarks '
+                f'{where} ORDER BY id', params).fetchall()
+            timings = self._conn.execute(
+                'SELECT benchmark_id, solver, answer, time FROM timings'
+            ).fetchall()
+            samples = {row[0]: row[1:] for row in self._conn.execute(
+                'SELECT benchmark_id, samples, variance FROM samples')}
+
+        results = {}  # benchmark id -> sid -> (answer, info, time)
+        for benchmark_id, solver, answer, time_ in timings:
+            results.setdefault(benchmark_id, {})[solver] = (answer, None,
+                                                            time_)
+        ids = {row[0] for row in benchmarks}
+        sids = sorted({sid for benchmark_id, sid_results in results.items()
+                       if benchmark_id in ids for sid in sid_results})
+        adaptive = any(benchmark_id in samples for benchmark_id in ids)
+
+        header = 'margin,' + ','.join(sids)
+        if adaptive:
+            header += ',samples,variance'
+        csv.write(header + ',pred,raw_ast\n')
+        for benchmark_id, pred, raw_ast, margin in benchmarks:
+            sampling = samples.get(benchmark_id, (0, 0.0)) if adaptive else None
+            write_results(csv, pred, raw_ast, results.get(benchmark_id, {}),
+                          margin, sids, sampling=sampling)
+        return len(benchmarks)
+
+    def _buffer(self, write, args):
+        with self._pending_lock:
+            self._pending.append((write, args))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def _write_batches(self):
+        while not self._closing:
+            self._wake.wait(self.commit_interval)
+            self._wake.clear()
+            if not self._closing:
+                self.flush()
+
+    def _write_benchmark(self, pred, raw_ast, results, margin, sampling,
+                         run_id, found):
+        # Runs within the transaction of `flush`, which holds the write
+        # lock from its start, so the stored margin cannot change meanwhile.
+        key = pred_hash(pred)
+        row = self._conn.execute(
+            'SELECT id, margin FROM benchmarks WHERE pred_hash = ?',
+            (key,)).fetchone()
+        self._conn.execute(
+            'INSERT INTO benchmarks '
+            '(pred_hash, pred, raw_ast, margin, run_id, found) '
+            'VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(pred_hash) DO UPDATE SET '
+            'occurrences = occurrences + 1',
+            (key, pred, raw_ast, margin, run_id, found))
+        if row is None:
+            benchmark_id = self._conn.execute(
+                'SELECT id FROM benchmarks WHERE pred_hash = ?',
+                (key,)).fetchone()[0]
+        else:
+            benchmark_id, stored_margin = row
+            self.duplicates += 1
+            logging.info("Benchmark was already stored (%d duplicates): %s",
+                         self.duplicates, pred)
+            if margin <= stored_margin:
+                return
+            self._conn.execute(
+                'UPDATE benchmarks SET raw_ast = ?, margin = ?, run_id = ?, '
+                'found = ? WHERE id = ?',
+                (raw_ast, margin, run_id, found, benchmark_id))
+            self._conn.execute('DELETE FROM timings WHERE benchmark_id = ?',
+                               (benchmark_id,))
+            self._conn.execute('DELETE FROM samples WHERE benchmark_id = ?',
+                               (benchmark_id,))
+        self._insert_results(benchmark_id, results, sampling)
+
+    def _write_contradiction(self, pred, results, run_id, found):
+        self._conn.execute(
+            'INSERT INTO contradictions '
+            '(pred_hash, pred, results, run_id, found) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (pred_hash(pred), pred, results, run_id, found))
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent
+        # writers wait for it (up to the timeout) instead of failing later.
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def _insert_results(self, benchmark_id, results, sampling):
+        self._conn.executemany(
+            'INSERT INTO timings (benchmark_id, solver, answer, result, time) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [(benchmark_id, sid, answer, _result_type(answer, info), time_)
+             for sid, (answer, info, time_) in results.items()])
+        if sampling:
+            self._conn.execute(
+                'INSERT INTO samples (benchmark_id, samples, variance) '
+                'VALUES (?, ?, ?)', (benchmark_id, *sampling))
+
+
+def pred_hash(pred):
+    """
+    Returns the hash identifying a predicate in the store.
+    """
+    return hashlib.sha256(pred.encode('utf-8')).hexdigest()
+
+
+def _result_type(answer, info):
+    # The type of a 'yes' answer, e.g. 'solution'; solutions are not stored.
+    if answer == 'yes' and isinstance(info, tuple):
+        return info[0]
+    return None if info is None else str(info)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='python -m probandit.store',
+        description='Export the benchmarks of a result store to CSV.')
+    parser.add_argument('store', help='The result store database.')
+    parser.add_argument('csv', help='The target CSV file.')
+    parser.add_argument('--run', type=int, default=None,
+                        help='Only export the benchmarks of this run.')
+    args = parser.parse_args()
+
+    store = ResultStore(args.store)
+    with open(args.csv, 'w') as csv:
+        exported = store.export_csv(csv, run_id=args.run)
+    store.close()
+    print(f'Exported {exported} benchmarks to {args.csv}')
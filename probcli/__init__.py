@@ -4,7 +4,8 @@ import socket
 import subprocess
 
 import probcli.answerparser as answerparser
-from probcli.bparser import BParser
+from probcli.bparser import acquire_parser, release_parser
+from probcli.framing import FramedReader
 
 
 class ProBCli():
@@ -40,7 +41,11 @@ class ProBCli():
         self.interrupt_cmd_path = os.path.join(interrupt_path,
                                                interrupt_bin_name)
 
+        self.parser_path = os.path.join(os.path.dirname(self.path),
+                                        'lib', 'probcliparser.jar')
+
         self._socket = None
+        self._reader = None
         self.parser = None
         self.cli_process = None
 
@@ -53,12 +58,12 @@ class ProBCli():
         self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._socket.connect(('localhost', used_port))
         self._socket.settimeout(self.SOCKET_TIMEOUT)  # Sicstus 4.8.0 bug caused runtimes >200s
+        self._reader = FramedReader(self._socket, b'\x01')
 
         self.is_connected = True
 
-        parser_path = os.path.join(os.path.dirname(self.path),
-                                   'lib', 'probcliparser.jar')
-        self.parser = BParser(parser_path)
+        # The parser is shared with other instances of the same distribution.
+        self.parser = acquire_parser(self.parser_path)
 
         return used_port
 
@@ -66,12 +71,11 @@ class ProBCli():
         self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._socket.connect(('localhost', port))
         self._socket.settimeout(60)
+        self._reader = FramedReader(self._socket, b'\x01')
 
         self.is_connected = True
 
-        parser_path = os.path.join(os.path.dirname(self.path),
-                                   'lib', 'probcliparser.jar')
-        self.parser = BParser(parser_path)
+        self.parser = acquire_parser(self.parser_path)
 
     def close(self):
         if not self.is_connected:
@@ -81,8 +85,13 @@ class ProBCli():
         self._halt()
 
         self._socket.close()
+        self._reader = None
         self.is_connected = False
 
+        if self.parser:
+            release_parser(self.parser)
+            self.parser = None
+
         self.revision = None
         self.interrupt_id = None
 
@@ -96,27 +105,30 @@ class ProBCli():
             logging.debug('Sending interrupt to probcli via %s',
                           self.interrupt_cmd_path)
             subprocess.run([self.interrupt_cmd_path, str(self.interrupt_id)])
-        else:
+        elif self.cli_process:
             # If the interrupt command is not available, we can try to
             # send a user interrupt via the socket.
             logging.debug('Sending SIGINT to probcli')
             self.cli_process.send_signal(subprocess.signal.SIGINT)
-
-        self.is_connected = False
+        else:
+            # Connected via `connect`; the process is not ours to signal.
+            logging.debug('No probcli process to interrupt')
 
     def send_prolog(self, prolog):
         if prolog[-1] != '.':
             prolog += '.'
         self._socket.sendall(prolog.encode('utf-8') + b'\0')
 
-    def receive_prolog(self):
-        data = b''
-        while True:
-            data += self._socket.recv(1024)
-            if b'\x01' in data:  # Prolog terminates with \x01
-                break
-        data = data.decode('utf-8').strip('\x01')
-        return answerparser.parse_answer(data)
+    def receive_prolog(self, compact=False, lazy=False):
+        """
+        Receive and parse the next answer of probcli. If `compact` is set,
+        the bindings are returned in the compact term format of
+        `answerparser`. If `lazy` is set, the bound values are only parsed
+        on access (see `answerparser.LazyTerm`).
+        """
+        # Prolog terminates with \x01
+        data = self._reader.receive().decode('utf-8')
+        return answerparser.parse_answer(data, compact=compact, lazy=lazy)
 
     def query_probcli_version_info(self):
         """
@@ -11,111 +11,407 @@ The finally parsed format is a dictionary with the following keys
 
 The main entry points are `parse_term` and `parse_terms`.
 
+Alternatively, all parse functions accept `compact=True` to produce a
+compact representation that avoids the wrapping dictionaries:
+- numbers are ints or floats
+- atoms are strings
+- variables are `Var` objects (a subclass of str)
+- compounds are `Compound` objects with `functor` and `args` slots
+- lists are python lists of terms
+
+With `lazy=True`, `parse_answer` only parses the variable names of the
+bindings of a yes answer. The bound values are `LazyTerm` objects, which
+are parsed on first access of their `term` property and whose top-level
+`functor` can be read without parsing the arguments.
+
+Internally, the parser works on a single string and an offset into it
+(the `_*_at` functions), so that parsing is linear in the length of the
+answer. The string based functions like `parse_atom` or `parse_number`
+return the unconsumed rest of their input as before.
+
 Utility functions exist in the form of:
 - `translate_prolog_dot_list`: translates a parsed prolog list in dot
    notation into a python list
 - `translate_bindings`: translates a list of =/2 compounds into a dictionary
    such that e.g. `=(a, 1), =(b, 2)` becomes `{'a': 1, 'b': 2}`.
+- `to_dict_term`: translates a compact term into the dictionary format.
 """
+from contextlib import contextmanager
+import gc
+import re
+
+_SYMBOL_CHARS = '+-*/\\^<>=~:.?@#$&'
+
+_WORD = re.compile(r'\w*')
+_WHITESPACE = re.compile(r'\s*')
+_SYMBOLS = re.compile(r'[+\-*/\\^<>=~:.?@#$&]*')
+# Body of a quoted atom; backslashes escape the following character.
+_QUOTED_BODY = re.compile(r"[^'\\]*(?:\\.[^'\\]*)*", re.DOTALL)
+# Tokens which are relevant to find the end of a term without parsing it.
+_SKIP_TOKENS = re.compile(r"'[^'\\]*(?:\\.[^'\\]*)*'|[()\[\]{},]",
+                          re.DOTALL)
+_DIGITS = {
+    2: re.compile(r'[01]*'),
+    8: re.compile(r'[0-7]*'),
+    10: re.compile(r'[0-9]*'),
+    16: re.compile(r'[0-9a-fA-F]*'),
+}
+
+
+class Compound:
+    """
+    Compact representation of a compound term `functor(args...)`.
+    """
+    __slots__ = ('functor', 'args')
+
+    def __init__(self, functor, args):
+        self.functor = functor
+        self.args = args
+
+    def __eq__(self, other):
+        if not isinstance(other, Compound):
+            return NotImplemented
+        return self.functor == other.functor and self.args == other.args
+
+    def __repr__(self):
+        return f"Compound({self.functor!r}, {self.args!r})"
+
+
+class Var(str):
+    """
+    Compact representation of a Prolog variable. Compares equal to the
+    string of its name.
+    """
+    __slots__ = ()
+
+    def __repr__(self):
+        return f"Var({str.__repr__(self)})"
+
 
-def parse_answer(answer):
+class LazyTerm:
+    """
+    A term within an answer which is only parsed when accessed.
+    """
+    __slots__ = ('_text', '_start', '_end', '_compact', '_term')
+
+    def __init__(self, text, start, end, compact=False):
+        self._text = text
+        self._start = start
+        self._end = end
+        self._compact = compact
+        self._term = None
+
+    @property
+    def text(self):
+        """
+        The unparsed text of the term.
+        """
+        return self._text[self._start:self._end].strip()
+
+    @property
+    def functor(self):
+        """
+        Name of the atom or of the compound's functor, None for other terms.
+        The arguments of a compound are not parsed.
+        """
+        c = self._text[self._start]
+        if c in '0123456789.+-' or c.isupper() or c == '_':
+            return None
+        elif c.islower() or c == '\'' or c in _SYMBOL_CHARS or c in '!;':
+            functor, _ = _parse_atom_at(self._text, self._start)
+            return functor
+        elif self._text.startswith('{}', self._start):
+            return '{}'
+        return None
+
+    @property
+    def term(self):
+        """
+        The parsed term; parsed on first access.
+        """
+        if self._term is None:
+            with _gc_paused():
+                self._term, _ = _parse_term_at(self._text, self._start,
+                                               self._compact)
+        return self._term
+
+    def __repr__(self):
+        return f"LazyTerm({self.text!r})"
+
+
+def parse_answer(answer, compact=False, lazy=False):
     """
     Parse a prob prolog CLI answer into a response and additional information.
 
     For a yes answer, the information is a dictionary containing the
     accompanying bindings.
+    If `compact` is set, the bound values are in the compact term format.
+    If `lazy` is set, the bound values of a yes answer are `LazyTerm`
+    objects which are only parsed on access.
 
     The info might be None.
     """
-    term, _ = parse_term(answer)
+    if lazy and answer.startswith('yes('):
+        bindings, pos = _parse_lazy_bindings_at(answer, 4, compact)
+        _consume_at(')', answer, _WHITESPACE.match(answer, pos).end())
+        return 'yes', bindings
+
+    term, _ = parse_term(answer, compact=compact)
 
     response = None
     info = None
 
-    if term['type'] == 'compound':
-        response = term['value'][0]
-        if response == 'yes':
-            info = term['value'][1]
-            value_list = translate_prolog_dot_list(term['value'][1][0])
-            info = translate_bindings(value_list)
-        elif response in ('progress, call_back'):
-            info = term['value'][1]
+    if compact:
+        if isinstance(term, Compound):
+            response = term.functor
+            args = term.args
+        elif isinstance(term, str) and not isinstance(term, Var):
+            return term, None
         else:
             raise ValueError(f"Unexpected answer, got {response}")
+    elif term['type'] == 'compound':
+        response, args = term['value']
     elif term['type'] == 'atom':
-        response = term['value']
+        return term['value'], None
+    else:
+        raise ValueError(f"Unexpected answer, got {response}")
+
+    if response == 'yes':
+        value_list = translate_prolog_dot_list(args[0])
+        info = translate_bindings(value_list)
+    elif response in ('progress, call_back'):
+        info = args
     else:
         raise ValueError(f"Unexpected answer, got {response}")
 
     return response, info
 
 
-def parse_term(answer):
-    type = None
-    if answer[0] in '0123456789.+-':
-        term, answer = parse_number(answer)
-        type = 'number'
-    elif answer[0].isupper() or answer[0] == '_':
-        term, answer = parse_var(answer)
-        type = 'variable'
-    elif answer[0].islower() or answer[0] == '\'' or answer[0] in '+-*/\\^<>=~:.?@#$&!;':
-        term, answer = parse_atom(answer)
-        type = 'atom'
-        if answer and answer[0] == '(':
-            type = 'compound'
-            answer = consume('(', answer)
-            args, answer = parse_terms(answer)
-            term = (term, args)
-            answer = consume(')', answer)
-    elif answer[0] == '[':
-        type = 'list'
-        answer = consume('[', answer)
-        if answer[0] == ']':
-            term = []
+def parse_term(answer, compact=False):
+    with _gc_paused():
+        term, pos = _parse_term_at(answer, 0, compact)
+    return term, answer[pos:]
+
+
+def parse_terms(answer, compact=False):
+    with _gc_paused():
+        terms, pos = _parse_terms_at(answer, 0, compact)
+    return terms, answer[pos:]
+
+
+@contextmanager
+def _gc_paused():
+    # Parsed terms are acyclic, yet the many allocations of a large answer
+    # repeatedly trigger the cyclic garbage collector over the growing term.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _parse_term_at(s, pos, compact=False):
+    # Compounds and lists are parsed with an explicit stack instead of
+    # recursion, so that the nesting depth of a term (e.g. long dot lists)
+    # is not bound by Python's recursion limit.
+    # Each stack entry is a pair (functor, args), where functor is None
+    # for lists.
+    stack = []
+    n = len(s)
+    while True:
+        # Start of a new term; skip whitespace in front of arguments.
+        if stack:
+            pos = _WHITESPACE.match(s, pos).end()
+        if pos >= n:
+            raise ValueError(f"Expected term, got {s[pos:]}")
+
+        c = s[pos]
+        type = None
+        if c in '0123456789.+-':
+            term, pos = _parse_number_at(s, pos)
+            type = 'number'
+        elif c.isupper() or c == '_':
+            term, pos = _parse_var_at(s, pos)
+            type = 'variable'
+        elif c.islower() or c == '\'' or c in _SYMBOL_CHARS or c in '!;':
+            term, pos = _parse_atom_at(s, pos)
+            type = 'atom'
+            if s.startswith('(', pos):
+                stack.append((term, []))
+                pos += 1
+                continue
+        elif c == '[':
+            if s.startswith(']', pos + 1):
+                type = 'list'
+                term = []
+                pos += 2
+            else:
+                stack.append((None, []))
+                pos += 1
+                continue
+        elif c == '{':
+            # ProB sends {} back as empty set
+            pos = _consume_at('}', s, pos + 1)
+            type = 'atom'
+            term = r'{}'
         else:
-            term, answer = parse_terms(answer)
-        answer = consume(']', answer)
-    elif answer[0] == '{':
-        # ProB sends {} back as empty set
-        answer = consume('{', answer)
-        answer = consume('}', answer)
-        type = 'atom'
-        term = r'{}'
-    else:
-        raise ValueError(f"Expected term, got {answer}")
+            raise ValueError(f"Expected term, got {s[pos:]}")
 
-    return {'type': type, 'value': term}, answer
+        if not compact:
+            parsed = {'type': type, 'value': term}
+        elif type == 'variable':
+            parsed = Var(term)
+        else:
+            parsed = term
+
+        # Attach the finished term to its parent; close all compounds and
+        # lists which end after it.
+        while stack:
+            functor, args = stack[-1]
+            args.append(parsed)
+            pos = _WHITESPACE.match(s, pos).end()
+            if s.startswith(',', pos):
+                pos += 1
+                break
+            stack.pop()
+            if functor is None:
+                pos = _consume_at(']', s, pos)
+                if compact:
+                    parsed = args
+                else:
+                    parsed = {'type': 'list', 'value': args}
+            else:
+                pos = _consume_at(')', s, pos)
+                if compact:
+                    parsed = Compound(functor, args)
+                else:
+                    parsed = {'type': 'compound', 'value': (functor, args)}
+        else:
+            return parsed, pos
+
+
+def _skip_term_at(s, pos):
+    # Returns the end position of the term starting at pos without parsing
+    # it: the first ',' or closing bracket outside of the term's brackets.
+    depth = 0
+    for match in _SKIP_TOKENS.finditer(s, pos):
+        c = s[match.start()]
+        if c in '([{':
+            depth += 1
+        elif c in ')]}':
+            if depth == 0:
+                return match.start()
+            depth -= 1
+        elif c == ',' and depth == 0:
+            return match.start()
+    return len(s)
+
+
+def _parse_lazy_bindings_at(s, pos, compact=False):
+    # Parses a list of =/2 bindings, in list or dot notation, into a
+    # dictionary of lazily parsed values.
+    bindings = {}
+    open_dots = 0
+    while True:
+        pos = _WHITESPACE.match(s, pos).end()
+        if s.startswith('[]', pos):
+            pos += 2
+            break
+        elif s.startswith("'.'(", pos):
+            key, value, pos = _parse_lazy_binding_at(s, pos + 4, compact)
+            bindings[key] = value
+            pos = _consume_at(',', s, _WHITESPACE.match(s, pos).end())
+            open_dots += 1
+        elif s.startswith('[', pos):
+            pos += 1
+            while True:
+                key, value, pos = _parse_lazy_binding_at(s, pos, compact)
+                bindings[key] = value
+                pos = _WHITESPACE.match(s, pos).end()
+                if not s.startswith(',', pos):
+                    break
+                pos += 1
+            pos = _consume_at(']', s, pos)
+            break
+        else:
+            raise ValueError(f"Expected prolog list, got {s[pos:]}")
 
+    for _ in range(open_dots):
+        pos = _consume_at(')', s, _WHITESPACE.match(s, pos).end())
+    return bindings, pos
 
-def parse_terms(answer):
+
+def _parse_lazy_binding_at(s, pos, compact=False):
+    pos = _WHITESPACE.match(s, pos).end()
+    if s.startswith("'='(", pos):
+        pos += 4
+    else:
+        pos = _consume_at('=(', s, pos)
+    pos = _WHITESPACE.match(s, pos).end()
+    key, pos = _parse_term_at(s, pos)
+    if key['type'] not in ('atom', 'variable'):
+        raise ValueError(
+            f"Expected atom or variable as key, got {key['type']}")
+    pos = _consume_at(',', s, _WHITESPACE.match(s, pos).end())
+    start = _WHITESPACE.match(s, pos).end()
+    end = _skip_term_at(s, start)
+    pos = _consume_at(')', s, end)
+    return key['value'], LazyTerm(s, start, end, compact), pos
+
+
+def _parse_terms_at(s, pos, compact=False):
     terms = []
-    while answer:
-        if answer[0].isspace():
-            answer = trim_whitespace(answer)
+    n = len(s)
+    while pos < n:
+        if s[pos].isspace():
+            pos = _WHITESPACE.match(s, pos).end()
         else:
-            term, answer = parse_term(answer)
+            term, pos = _parse_term_at(s, pos, compact)
             terms.append(term)
-            if answer:
-                answer = trim_whitespace(answer)
-            if answer and answer[0] == ',':
-                answer = consume(',', answer)
+            pos = _WHITESPACE.match(s, pos).end()
+            if s.startswith(',', pos):
+                pos += 1
             else:
                 break
-    return terms, answer
+    return terms, pos
 
 
 def translate_prolog_dot_list(dot_compound):
     """
     Translates a parsed prolog list in dot notation into a python list.
+    The list cells are followed iteratively, so arbitrarily long lists can
+    be translated.
     """
+    if not isinstance(dot_compound, dict):
+        return _translate_compact_dot_list(dot_compound)
+
     elems = []
-    if dot_compound['type'] == 'list':
-        return dot_compound['value']
-    elif dot_compound['type'] == 'compound' and dot_compound['value'][0] == '.':
+    while (dot_compound['type'] == 'compound'
+           and dot_compound['value'][0] == '.'):
         elems.append(dot_compound['value'][1][0])
-        elems.extend(translate_prolog_dot_list(dot_compound['value'][1][1]))
-    else:
+        dot_compound = dot_compound['value'][1][1]
+
+    if dot_compound['type'] != 'list':
         raise ValueError(f"Expected prolog list, got {dot_compound}")
+    if not elems:
+        return dot_compound['value']
+    elems.extend(dot_compound['value'])
+    return elems
+
+
+def _translate_compact_dot_list(dot_compound):
+    elems = []
+    while isinstance(dot_compound, Compound) and dot_compound.functor == '.':
+        elems.append(dot_compound.args[0])
+        dot_compound = dot_compound.args[1]
+
+    if not isinstance(dot_compound, list):
+        raise ValueError(f"Expected prolog list, got {dot_compound}")
+    if not elems:
+        return dot_compound
+    elems.extend(dot_compound)
     return elems
 
 
@@ -139,6 +435,10 @@ def translate_bindings(bindings_list):
     """
     bindings = {}
     for binding in bindings_list:
+        if not isinstance(binding, dict):
+            key, value = _translate_compact_binding(binding)
+            bindings[key] = value
+            continue
         if binding['type'] != 'compound' or binding['value'][0] != '=':
             raise ValueError(f"Expected binding over =/2, got {binding}")
         if len(binding['value'][1]) != 2:
@@ -158,43 +458,78 @@ def translate_bindings(bindings_list):
     return bindings
 
 
+def _translate_compact_binding(binding):
+    if (not isinstance(binding, Compound) or binding.functor != '='
+            or len(binding.args) != 2):
+        raise ValueError(f"Expected binding over =/2, got {binding}")
+    lhs, rhs = binding.args
+    if not isinstance(lhs, str):
+        raise ValueError(f"Expected atom or variable as key, got {lhs}")
+    return str(lhs), rhs
+
+
+def to_dict_term(term):
+    """
+    Translates a term in the compact format into the dictionary format.
+    Terms already in the dictionary format are returned unchanged.
+    """
+    if isinstance(term, dict):
+        return term
+    if isinstance(term, Compound):
+        return {'type': 'compound',
+                'value': (term.functor, [to_dict_term(t) for t in term.args])}
+    if isinstance(term, list):
+        return {'type': 'list', 'value': [to_dict_term(t) for t in term]}
+    if isinstance(term, Var):
+        return {'type': 'variable', 'value': str(term)}
+    if isinstance(term, str):
+        return {'type': 'atom', 'value': term}
+    return {'type': 'number', 'value': term}
+
+
 def parse_number(answer):
+    num, pos = _parse_number_at(answer, 0)
+    return num, answer[pos:]
+
+
+def _parse_number_at(s, pos):
     # number = {float} float
     #        | {integer} integer;
     sign = 1
     num = None
-    if answer[0] in '+-':
-        if answer[0] == '-':
+    if s.startswith(('+', '-'), pos):
+        if s[pos] == '-':
             sign = -1
-        answer = answer[1:]
-    if answer.startswith('0b'):
-        num, answer = parse_int_format(answer[2:], 2)
-    elif answer.startswith('0o'):
-        num, answer = parse_int_format(answer[2:], 8)
-    elif answer.startswith('0x'):
-        num, answer = parse_int_format(answer[2:], 16)
+        pos += 1
+    if s.startswith('0b', pos):
+        num, pos = _parse_int_format_at(s, pos + 2, 2)
+    elif s.startswith('0o', pos):
+        num, pos = _parse_int_format_at(s, pos + 2, 8)
+    elif s.startswith('0x', pos):
+        num, pos = _parse_int_format_at(s, pos + 2, 16)
     # Todo: quoted_atom_item ?
-    elif answer[0] == '.':  # . digit+
-        answer = consume('.', answer)
+    elif s.startswith('.', pos):  # . digit+
+        pos += 1
+        numstr, pos = _parse_int_format_at(s, pos, 10, cast_to_int=False)
+        if not numstr:
+            raise ValueError(f"Expected digits, got {s[pos:]}")
         exp = ''
-        if answer[0].isdigit():
-            numstr, answer = parse_int_format(answer, 10, cast_to_int=False)
-        if answer and answer[0] in 'eE':
-            exp, answer = parse_int(answer[1:], cast_to_int=False)
+        if s.startswith(('e', 'E'), pos):
+            exp, pos = _parse_int_at(s, pos + 1, cast_to_int=False)
             exp = 'E' + exp
         numstr = f'.{numstr}{exp}'
         # parse float
         num = float(numstr)
     else:
-        numstr, answer = parse_int_format(answer, 10, cast_to_int=False)
+        numstr, pos = _parse_int_format_at(s, pos, 10, cast_to_int=False)
         is_float = False
-        if answer and answer[0] == '.':
-            answer = consume('.', answer)
-            numstr2, answer = parse_int_format(answer, 10, cast_to_int=False)
+        if s.startswith('.', pos):
+            numstr2, pos = _parse_int_format_at(s, pos + 1, 10,
+                                                cast_to_int=False)
             numstr += f'.{numstr2}'
             is_float = True
-        if answer and answer[0] in 'eE':
-            exp, answer = parse_int(answer[1:], cast_to_int=False)
+        if s.startswith(('e', 'E'), pos):
+            exp, pos = _parse_int_at(s, pos + 1, cast_to_int=False)
             exp = 'E' + exp
             numstr += exp
             is_float = True
@@ -202,73 +537,76 @@ def parse_number(answer):
             num = float(numstr)
         else:
             num = int(numstr)
-    return sign * num, answer
+    return sign * num, pos
 
 
 def parse_int(answer, cast_to_int=True):
+    num, pos = _parse_int_at(answer, 0, cast_to_int=cast_to_int)
+    return num, answer[pos:]
+
+
+def _parse_int_at(s, pos, cast_to_int=True):
     sign = 1
-    if answer[0] in '+-':
-        if answer[0] == '-':
+    if s.startswith(('+', '-'), pos):
+        if s[pos] == '-':
             sign = -1
-        answer = answer[1:]
-    num, answer = parse_int_format(answer, 10, cast_to_int=cast_to_int)
+        pos += 1
+    num, pos = _parse_int_format_at(s, pos, 10, cast_to_int=cast_to_int)
 
     if cast_to_int:
-        return sign * num, answer
+        return sign * num, pos
     else:
-        s = '-' if sign == -1 else ''
-        return s + num, answer
+        prefix = '-' if sign == -1 else ''
+        return prefix + num, pos
 
 
 def parse_int_format(answer, base, cast_to_int=True):
-    digits = '0123456789abcdef'[0:base]
-    numstr = ''
-    while answer:
-        if answer[0].lower() in digits:
-            numstr += answer[0]
-            answer = answer[1:]
-        else:
-            break
+    num, pos = _parse_int_format_at(answer, 0, base, cast_to_int=cast_to_int)
+    return num, answer[pos:]
+
+
+def _parse_int_format_at(s, pos, base, cast_to_int=True):
+    end = _DIGITS[base].match(s, pos).end()
+    numstr = s[pos:end]
     if cast_to_int:
-        return int(numstr, base), answer
+        return int(numstr, base), end
     else:
-        return numstr, answer
+        return numstr, end
 
 
 def parse_var(answer):
+    var, pos = _parse_var_at(answer, 0)
+    return var, answer[pos:]
+
+
+def _parse_var_at(s, pos):
     # variable = '_' alpha* | capital_letter alpha*;
-    var = ''
-    while answer and (answer[0].isalnum() or answer[0] == '_'):
-        var += answer[0]
-        answer = answer[1:]
-    return var, answer
+    end = _WORD.match(s, pos).end()
+    return s[pos:end], end
 
 
 def parse_atom(answer):
-    atom = ''
-    if answer[0] == '\'':
-        answer = consume('\'', answer)
-        while answer and answer[0] != '\'':
-            atom += answer[0]
-            # Beware of escape chars!
-            if answer[0] == '\\':
-                atom += answer[1]
-                answer = answer[2:]
-            else:
-                answer = answer[1:]
-        answer = consume('\'', answer)
-    elif answer[0] in '+-*/\\^<>=~:.?@#$&':  # special characters
-        while answer and (answer[0] in '+-*/\\^<>=~:.?@#$&'):
-            atom += answer[0]
-            answer = answer[1:]
-    elif answer[0] in '!;':  # Single chars
-        atom = answer[0]
-        answer = answer[1:]
+    atom, pos = _parse_atom_at(answer, 0)
+    return atom, answer[pos:]
+
+
+def _parse_atom_at(s, pos):
+    c = s[pos]
+    if c == '\'':
+        # Escape sequences are kept verbatim.
+        end = _QUOTED_BODY.match(s, pos + 1).end()
+        atom = s[pos + 1:end]
+        end = _consume_at('\'', s, end)
+    elif c in _SYMBOL_CHARS:  # special characters
+        end = _SYMBOLS.match(s, pos).end()
+        atom = s[pos:end]
+    elif c in '!;':  # Single chars
+        end = pos + 1
+        atom = c
     else:
-        while answer and (answer[0].isalnum() or answer[0] == '_'):
-            atom += answer[0]
-            answer = answer[1:]
-    return atom, answer
+        end = _WORD.match(s, pos).end()
+        atom = s[pos:end]
+    return atom, end
 
 
 def consume(c, s):
@@ -278,7 +616,12 @@ def consume(c, s):
         raise ValueError(f"Expected {c}, got {s}")
 
 
+def _consume_at(c, s, pos):
+    if s.startswith(c, pos):
+        return pos + len(c)
+    else:
+        raise ValueError(f"Expected {c}, got {s[pos:]}")
+
+
 def trim_whitespace(answer):
-    while answer and answer[0].isspace():
-        answer = answer[1:]
-    return answer
+    return answer[_WHITESPACE.match(answer).end():]
@@ -1,63 +1,198 @@
+import atexit
+import logging
+import os
 import socket
 import subprocess
+import threading
+import time
 from typing import Union, NoReturn
 
 from probcli.answerparser import parse_term
+from probcli.framing import FramedReader
 
 
 class BParser():
 
-    def __init__(self, jar_path):
+    def __init__(self, jar_path, port=None):
         """
         Parameters
         ----------
         jar_path : str
             The path to the BParser jar file.
+        port : int
+            Port of an already running parser server to connect to. If not
+            given, a new parser server is started from the jar.
         """
         self.jar = jar_path
+        self._socket = None
+        self._lock = threading.Lock()
+        self.process = None
 
-        # Start the ProB CLI Parser server
-        args = ['java', '-jar', self.jar, '-prepl']
-        process = subprocess.Popen(args,
-                                   stdout=subprocess.PIPE,
-                                   stdin=subprocess.PIPE)
+        start = time.perf_counter()
 
-        # Get reported port
-        l = process.stdout.readline().decode('utf-8').strip()
-        dot_pos = l.find('.')
-        self.port = int(l[:dot_pos])  # Port has format "\d+\.", e.g. "41835."
+        if port is None:
+            # Start the ProB CLI Parser server
+            args = ['java', '-jar', self.jar, '-prepl']
+            self.process = subprocess.Popen(args,
+                                            stdout=subprocess.PIPE,
+                                            stdin=subprocess.PIPE)
+
+            # Get reported port
+            l = self.process.stdout.readline().decode('utf-8').strip()
+            dot_pos = l.find('.')
+            port = int(l[:dot_pos])  # Port has format "\d+\.", e.g. "41835."
+        self.port = port
 
         # Connect to the server
         self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self._socket.connect(('localhost', self.port))
+        self._reader = FramedReader(self._socket, b'\n')
+
+        self.startup_time = time.perf_counter() - start
 
     def parse_to_prolog(self, text) -> Union[str, NoReturn]:
         """
         Parses a given classical B predicate into a Prolog AST.
         Throws an exception if the parsing fails.
         """
-        self._socket.sendall(b'predicate\n')
-        self._socket.sendall(text.encode('utf-8') + b'\n')
+        # The parser might be shared by solvers in different threads.
+        with self._lock:
+            self._socket.sendall(_predicate_command(text))
+            parsed = self._receive_answer()
+        return _translate_answer(parsed)
 
-        parsed = self._receive_answer()
-        if parsed.startswith('parse_exception'):
-            exception = parse_term(parsed)
-            exception_text = exception[0]['value'][1][1]['value']
-            raise ValueError(f'Parsing failed: {exception_text}')
+    def parse_many(self, texts, window=64) -> list:
+        """
+        Parses the given classical B predicates into Prolog ASTs, in order.
+        The predicates are pipelined, i.e. up to `window` of them are sent
+        before the first answer is read. Predicates which fail to parse
+        yield None.
+        """
+        texts = list(texts)
+        answers = []
+        with self._lock:
+            for sent, text in enumerate(texts, 1):
+                self._socket.sendall(_predicate_command(text))
+                if sent - len(answers) >= window:
+                    answers.append(self._receive_answer())
+            while len(answers) < len(texts):
+                answers.append(self._receive_answer())
 
-        if parsed[-1] == '.':
-            parsed = parsed[:-1]
-        return parsed
+        results = []
+        for text, parsed in zip(texts, answers):
+            try:
+                results.append(_translate_answer(parsed))
+            except ValueError as e:
+                logging.warning('Could not parse %s: %s', text, e)
+                results.append(None)
+        return results
 
     def _receive_answer(self):
         data = b''
-        while True:
-            data += self._socket.recv(1024)
-            if b'\n' in data:  # Parser terminates with \n
-                break
+        while not data:  # Parser terminates with \n; skip empty lines.
+            data = self._reader.receive()
 
-        return data.decode('utf-8').strip('\n')
+        return data.decode('utf-8')
 
-    def __del__(self):
-        self._socket.sendall(b'halt\n')
+    def close(self):
+        """
+        Halts the parser server and waits for its process to end.
+        """
+        if self._socket is None:
+            return
+        try:
+            self._socket.sendall(b'halt\n')
+        except OSError:
+            pass
         self._socket.close()
+        self._socket = None
+        if self.process is None:
+            return
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.terminate()
+            self.process.wait()
+
+    def __del__(self):
+        self.close()
+
+
+def _predicate_command(text):
+    return b'predicate\n' + text.encode('utf-8') + b'\n'
+
+
+def _translate_answer(parsed):
+    if parsed.startswith('parse_exception'):
+        exception = parse_term(parsed)
+        exception_text = exception[0]['value'][1][1]['value']
+        raise ValueError(f'Parsing failed: {exception_text}')
+
+    if parsed[-1] == '.':
+        parsed = parsed[:-1]
+    return parsed
+
+
+# Shared parsers by jar path: every parser process can serve all probcli
+# instances of the same ProB distribution.
+_shared = {}  # real jar path -> [parser, reference count, reuses]
+_shared_lock = threading.Lock()
+
+
+def acquire_parser(jar_path, port=None) -> BParser:
+    """
+    Returns the shared parser for the given jar, starting it if necessary.
+    If a port is given and the parser is not running yet, it connects to
+    the parser server at that port instead of starting one.
+    Each call must be matched by a call to `release_parser`.
+    """
+    key = os.path.realpath(jar_path)
+    with _shared_lock:
+        if key in _shared:
+            entry = _shared[key]
+            entry[1] += 1
+            entry[2] += 1
+        else:
+            entry = [BParser(jar_path, port=port), 1, 0]
+            _shared[key] = entry
+            logging.info('Started parser %s in %.2fs', jar_path,
+                         entry[0].startup_time)
+        return entry[0]
+
+
+def release_parser(parser):
+    """
+    Releases a parser obtained by `acquire_parser`. The parser is closed
+    once it is released by all users.
+    """
+    key = os.path.realpath(parser.jar)
+    with _shared_lock:
+        entry = _shared.get(key)
+        if entry is None or entry[0] is not parser:
+            parser.close()
+            return
+        entry[1] -= 1
+        if entry[1] > 0:
+            return
+        del _shared[key]
+    _close_shared(parser, entry[2])
+
+
+def shutdown_parsers():
+    """
+    Closes all shared parsers regardless of their users.
+    """
+    with _shared_lock:
+        entries = list(_shared.values())
+        _shared.clear()
+    for parser, _, reuses in entries:
+        _close_shared(parser, reuses)
+
+
+def _close_shared(parser, reuses):
+    logging.info('Closing parser %s; reused %d times, saving ~%.1fs startup',
+                 parser.jar, reuses, reuses * parser.startup_time)
+    parser.close()
+
+
+atexit.register(shutdown_parsers)
@@ -0,0 +1,56 @@
+class FramedReader():
+    """
+    Reads messages from a socket which are delimited by a terminator, e.g.
+    the '\\x01' after each answer of probcli.
+
+    Received bytes are collected in a single buffer and only newly received
+    bytes are searched for the terminator. Bytes received after a
+    terminator are kept for the next message.
+
+    The usage is as follows:
+
+        reader = FramedReader(sock, b'\\x01')
+        message = reader.receive()  # bytes without the terminator
+    """
+
+    def __init__(self, sock, terminator, bufsize=65536):
+        """
+        Parameters
+        ----------
+        sock : socket.socket
+            The connected socket to read from.
+        terminator : bytes
+            The byte sequence which ends each message.
+        bufsize : int
+            Maximum number of bytes read from the socket at once.
+        """
+        self._socket = sock
+        self.terminator = terminator
+        self._buffer = bytearray()
+        self._chunk = memoryview(bytearray(bufsize))
+
+    def receive(self) -> bytes:
+        """
+        Returns the next message without its terminator. Blocks until the
+        message is complete.
+        """
+        scan_from = 0
+        while True:
+            end = self._buffer.find(self.terminator, scan_from)
+            if end != -1:
+                message = bytes(self._buffer[:end])
+                del self._buffer[:end + len(self.terminator)]
+                return message
+
+            # The terminator might be split over two chunks.
+            scan_from = max(0, len(self._buffer) - len(self.terminator) + 1)
+            received = self._socket.recv_into(self._chunk)
+            if received == 0:
+                raise ConnectionError('Connection closed within a message')
+            self._buffer += self._chunk[:received]
+
+    def pending(self) -> int:
+        """
+        Number of bytes received but not yet returned as a message.
+        """
+        return len(self._buffer)
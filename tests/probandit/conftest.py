@@ -0,0 +1,82 @@
+import io
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from probandit.__main__ import run_bf
+from probandit.solver import Solver
+
+
+class StopFuzzing(Exception):
+    pass
+
+
+class FakeIteration():
+    """
+    Stands in for `bf_iteration`. The n-th call returns the candidate
+    'x = n' with margin n, i.e. each call improves on the previous one.
+    Raises StopFuzzing after `stop_after` calls and adds `solve_time` to
+    the reported and wall-clock solving times of each solver per call.
+    """
+
+    def __init__(self, stop_after=None, solve_time=0.0):
+        self.stop_after = stop_after
+        self.solve_time = solve_time
+        self.calls = []  # (raw_ast, mutation) of each call
+        self._lock = threading.Lock()
+
+    def __call__(self, bfuzzer, raw_ast, env, mutation, target_solvers,
+                 reference_solvers, samp_size=1, **kwargs):
+        with self._lock:
+            if len(self.calls) == self.stop_after:
+                raise StopFuzzing()
+            self.calls.append((raw_ast, mutation))
+            margin = len(self.calls)
+        for solver in target_solvers + reference_solvers:
+            solver.reported_time += self.solve_time
+            solver.wall_time += self.solve_time
+        results = {'ref': ('yes', ('solution', {'x': {1, 2}}), 10),
+                   'tar': ('yes', ('solution', {'x': {1, 2}}), 10 + margin)}
+        return f'x = {margin}', f'raw{margin}', 'env', margin, results, (1, None)
+
+
+@pytest.fixture
+def fake_iteration():
+    """
+    Factory of `FakeIteration`s.
+    """
+    return FakeIteration
+
+
+@pytest.fixture
+def make_bfuzzer():
+    """
+    Factory of mocked BanditFuzz instances with the actions 'a' and 'b'.
+    """
+    def make():
+        bfuzzer = MagicMock()
+        bfuzzer.options = []
+        bfuzzer.list_actions.return_value = ['a', 'b']
+        bfuzzer.get_random_state.return_value = (1, 2, 3, 4)
+        return bfuzzer
+    return make
+
+
+@pytest.fixture
+def run_fuzzing(fake_iteration):
+    """
+    Runs `run_bf` with mock solvers and a `FakeIteration` stopping after
+    `stop_after` iterations. Returns the calls of the iteration and the
+    written CSV.
+    """
+    def run(bfuzzer, stop_after, **kwargs):
+        targets = [Solver(path='foo', id='tar', mock=True)]
+        references = [Solver(path='foo', id='ref', mock=True)]
+        csv = io.StringIO()
+        iteration = fake_iteration(stop_after)
+        with patch('probandit.__main__.bf_iteration', iteration):
+            with pytest.raises(StopFuzzing):
+                run_bf(bfuzzer, targets, references, csv, **kwargs)
+        return iteration.calls, csv.getvalue()
+    return run
@@ -0,0 +1,97 @@
+import io
+import os
+import signal
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from probandit.__main__ import run_bf, setup_config, shutdown
+from probandit.budget import Budget, stop_on_signals
+from probandit.solver import Solver
+
+
+def test_iteration_budget():
+    budget = Budget(max_iterations=2)
+    budget.record()
+    assert budget.exhausted() is None
+    budget.record()
+    assert budget.exhausted() == 'iteration budget'
+
+
+def test_solver_time_budget():
+    budget = Budget(max_solver_time=1.0)
+    budget.record(solver_time=0.6, solver_wall_time=2.0)
+    assert budget.exhausted() is None
+    budget.record(solver_time=0.6)
+    assert budget.exhausted() == 'solver time budget'
+
+
+def test_solver_wall_time_budget():
+    budget = Budget(max_solver_wall_time=1.0)
+    budget.record(solver_time=0.1, solver_wall_time=0.6)
+    assert budget.exhausted() is None
+    budget.record(solver_wall_time=0.6)
+    assert budget.exhausted() == 'solver wall-clock budget'
+
+
+def test_time_budget():
+    assert Budget(max_time=0).exhausted() == 'time budget'
+    assert Budget(max_time=60).exhausted() is None
+
+
+def test_signal_stops_budget():
+    budget = Budget()
+    previous = signal.getsignal(signal.SIGTERM)
+    try:
+        assert stop_on_signals(budget)
+        os.kill(os.getpid(), signal.SIGTERM)
+        assert budget.exhausted() == 'SIGTERM'
+        assert signal.getsignal(signal.SIGTERM) == previous
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+
+def test_run_bf_stops_at_budget(make_bfuzzer, fake_iteration):
+    budget = Budget(max_iterations=5)
+    targets = [Solver(path='foo', id='tar', mock=True)]
+    references = [Solver(path='foo', id='ref', mock=True)]
+    with patch('probandit.__main__.bf_iteration',
+               fake_iteration(solve_time=0.5)):
+        run_bf(make_bfuzzer(), targets, references, io.StringIO(),
+               budget=budget)
+
+    assert budget.iterations == 5
+    assert budget.accepted == 4
+    assert budget.solver_time == 5.0
+    assert budget.solver_wall_time == 5.0
+
+
+def test_shutdown_closes_everything():
+    solvers = [MagicMock(), MagicMock()]
+    solvers[0].close.side_effect = OSError('broken pipe')
+    bfuzzer = MagicMock()
+    prefetcher = MagicMock()
+
+    shutdown(bfuzzer, solvers, prefetcher)
+
+    solvers[1].close.assert_called_once()
+    prefetcher.close.assert_called_once()
+    bfuzzer.disconnect.assert_called_once()
+
+
+def test_setup_config_cleans_up_on_error():
+    config = {'fuzzer': {'path': 'banditfuzz.pl', 'targets': ['tar'],
+                         'references': ['ref']},
+              'solvers': {'tar': {'path': 'foo', 'mock': True},
+                          'ref': {'path': 'foo', 'mock': True}}}
+    with patch('probandit.__main__.BFuzzer') as bfuzzer, \
+            patch('probandit.__main__.correct_bf_path', lambda path: path), \
+            patch.object(Solver, 'start', autospec=True,
+                         side_effect=[None, OSError('no probcli')]), \
+            patch.object(Solver, 'close', autospec=True) as close:
+        with pytest.raises(OSError):
+            setup_config(config)
+
+    assert [call.args[0].id for call in close.call_args_list] == ['tar']
+    bfuzzer.return_value.disconnect.assert_called_once()
@@ -0,0 +1,56 @@
+import io
+import queue
+import threading
+
+from probandit import campaign
+from probandit.agents import BfAgent
+from probandit.campaign import (QueueWriter, assign_cpus, worker_path,
+                                _write_lines)
+
+
+class FinishedProcess():
+    exitcode = 0
+
+    def is_alive(self):
+        return False
+
+
+def test_queue_writer_lines_are_written():
+    lines = queue.Queue()
+    writers = [QueueWriter(lines) for _ in range(2)]
+    writers[0].write('1,a\n')
+    writers[1].write('2,b\n')
+    writers[0].write('3,c\n')
+
+    csv = io.StringIO()
+    _write_lines(csv, lines, [FinishedProcess()])
+
+    assert csv.getvalue() == '1,a\n2,b\n3,c\n'
+
+
+def test_assign_cpus(monkeypatch):
+    monkeypatch.setattr(campaign.os, 'sched_getaffinity',
+                        lambda pid: {0, 1, 2, 3, 4}, raising=False)
+
+    assert assign_cpus(2) == [{0, 1}, {2, 3}]
+    assert assign_cpus(7)[5:] == [{0}, {1}]
+
+
+def test_shared_agent_statistics():
+    shared = ({}, threading.Lock())
+    agent1 = BfAgent(actions=['a', 'b'], shared=shared, name='inner')
+    agent2 = BfAgent(actions=['a', 'b'], shared=shared, name='inner')
+    other = BfAgent(actions=['a', 'b'], shared=shared, name='outer')
+
+    agent1.receive_reward('a', 1)
+    agent2.receive_reward('a', 1)
+
+    assert agent1.get_agent('a').get_ab() == (1.95 + 1, 1)
+    assert agent2.get_agent('a').get_ab() == (1.95 + 1, 1)
+    assert other.get_agent('a').get_ab() == (1, 1)
+
+
+def test_worker_path():
+    assert (worker_path('out.csv.checkpoint.json', 3)
+            == 'out.csv.checkpoint.3.json')
+    assert worker_path(None, 3) is None
@@ -0,0 +1,58 @@
+import threading
+
+from probandit.agents import BfAgent
+from probandit.checkpoint import load_checkpoint, save_checkpoint
+
+
+def test_save_and_load_checkpoint(tmp_path):
+    path = str(tmp_path / 'cp.json')
+    save_checkpoint(path, {'best_margin': 1})
+    save_checkpoint(path, {'best_margin': 2})
+
+    assert load_checkpoint(path) == {'best_margin': 2}
+    assert not (tmp_path / 'cp.json.tmp').exists()
+
+
+def test_agent_state_roundtrip():
+    agent = BfAgent(actions=['a', 'b'])
+    agent.receive_reward('a', 1)
+    agent.receive_reward('b', 0)
+
+    restored = BfAgent(actions=['a', 'b', 'c'])
+    restored.set_state(agent.get_state())
+    assert restored.get_state() == dict(agent.get_state(), c=(0, 0))
+
+    shared = BfAgent(actions=['a', 'b'], shared=({}, threading.Lock()))
+    shared.set_state(agent.get_state())
+    assert shared.get_state() == agent.get_state()
+
+
+def test_run_bf_checkpoints(tmp_path, make_bfuzzer, run_fuzzing):
+    path = str(tmp_path / 'cp.json')
+    run_fuzzing(make_bfuzzer(), stop_after=6, checkpoint=path,
+                checkpoint_every=2)
+
+    state = load_checkpoint(path)
+    assert state['iterations'] == 4
+    assert state['best_margin'] == 5
+    assert state['raw_ast'] == 'raw5'
+    assert state['actions'] == ['a', 'b']
+    assert state['rand_state'] == [1, 2, 3, 4]
+
+
+def test_run_bf_resumes(tmp_path, make_bfuzzer, run_fuzzing):
+    path = str(tmp_path / 'cp.json')
+    run_fuzzing(make_bfuzzer(), stop_after=6, checkpoint=path,
+                checkpoint_every=2)
+    state = load_checkpoint(path)
+    state['rand_state'] = [5, 6, 7, 8]
+
+    bfuzzer = make_bfuzzer()
+    calls, csv = run_fuzzing(bfuzzer, stop_after=1, resume=state)
+
+    bfuzzer.set_random_state.assert_called_once_with(5, 6, 7, 8)
+    bfuzzer.list_actions.assert_not_called()
+    # The first iteration after resuming continues from the best candidate
+    # of the checkpoint instead of generating a fresh one.
+    assert calls[0][0] == 'raw5'
+    assert csv == ''
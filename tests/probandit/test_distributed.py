@@ -0,0 +1,123 @@
+import io
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from probandit.budget import Budget
+from probandit.distributed import Coordinator, Worker, is_prolog_term
+
+
+@pytest.fixture
+def make_worker(make_bfuzzer):
+    def make(name, budget=None):
+        return Worker(make_bfuzzer(), [], [], name=name, budget=budget)
+    return make
+
+
+def run_campaign(workers, max_results):
+    csv = io.StringIO()
+    coordinator = Coordinator(['ref', 'tar'], csv)
+    server = threading.Thread(target=coordinator.serve,
+                              args=(max_results,))
+    server.start()
+
+    threads = [threading.Thread(target=serve, args=('localhost',
+                                                    coordinator.port))
+               for serve in workers]
+    for thread in threads:
+        thread.start()
+    server.join(timeout=10)
+    for thread in threads:
+        thread.join(timeout=10)
+    assert not server.is_alive()
+    return coordinator, csv.getvalue()
+
+
+def test_distributed_campaign(make_worker, fake_iteration):
+    with patch('probandit.distributed.bf_iteration', fake_iteration()):
+        workers = [make_worker('w1'), make_worker('w2')]
+        coordinator, csv = run_campaign([w.serve for w in workers], 10)
+
+    assert coordinator.results >= 10
+    assert coordinator.inner_agent.actions == ['a', 'b']
+    assert sum(s[0] for s in coordinator.worker_stats.values()) >= 10
+    # Margins increase with each result, so each result after the first
+    # bootstrap results is a new best candidate. Either worker's bootstrap
+    # result may arrive first.
+    lines = csv.splitlines()
+    assert lines[0] in ('1,10,11,"x = 1","raw1"', '2,10,12,"x = 2","raw2"')
+    assert len(lines) > 5
+
+
+def test_distributed_worker_failure(make_worker, fake_iteration):
+    def failing_serve(host, port):
+        worker = make_worker('failing')
+        reply = make_worker('reply').evaluate({
+            'raw_ast': None, 'env': None, 'mutation': None,
+            'best_margin': None, 'list_actions': True})
+        worker.evaluate = MagicMock(side_effect=[
+            reply, ConnectionError('lost')])
+        try:
+            worker.serve(host, port)
+        except ConnectionError:
+            pass
+
+    with patch('probandit.distributed.bf_iteration', fake_iteration()):
+        coordinator, _ = run_campaign([failing_serve, make_worker('ok').serve],
+                                      20)
+
+    assert coordinator.worker_stats['failing'][0] == 1
+    assert coordinator.worker_stats['ok'][0] >= 19
+
+
+def test_distributed_worker_stops_at_budget(make_worker, fake_iteration):
+    budget = Budget(max_iterations=2)
+
+    def delayed_serve(host, port):
+        # Joins once the limited worker used up its budget, so that the
+        # campaign cannot end before.
+        while budget.iterations < 2:
+            time.sleep(0.01)
+        make_worker('ok').serve(host, port)
+
+    with patch('probandit.distributed.bf_iteration', fake_iteration()):
+        coordinator, _ = run_campaign([make_worker('limited', budget).serve,
+                                       delayed_serve], 20)
+
+    assert budget.iterations == 2
+    assert coordinator.worker_stats['limited'][0] == 2
+    assert coordinator.worker_stats['ok'][0] >= 18
+
+
+def test_distributed_rejects_injected_terms(make_worker, fake_iteration):
+    def injecting_serve(host, port):
+        worker = make_worker('injecting')
+        reply = make_worker('reply').evaluate({
+            'raw_ast': None, 'env': None, 'mutation': None,
+            'best_margin': None, 'list_actions': True})
+        reply['raw_ast'] = 'x),halt,(y'
+        worker.evaluate = MagicMock(return_value=reply)
+        try:
+            worker.serve(host, port)
+        except (ConnectionError, ValueError):
+            pass
+
+    with patch('probandit.distributed.bf_iteration', fake_iteration()):
+        coordinator, csv = run_campaign([injecting_serve,
+                                         make_worker('ok').serve], 5)
+
+    assert coordinator.worker_stats['injecting'][0] == 0
+    assert 'halt' not in csv
+
+
+def test_is_prolog_term():
+    assert is_prolog_term("pred(a,[b,c],'x,y)')")
+    assert is_prolog_term('f(0\',"a.b")')
+    assert not is_prolog_term('f(x)),halt,(g')
+    assert not is_prolog_term('x. halt')
+    assert not is_prolog_term('a,b')
+    assert not is_prolog_term("f('x)")
+    assert not is_prolog_term('f(x) % comment')
+    assert not is_prolog_term('')
@@ -0,0 +1,60 @@
+import socket
+import threading
+
+from probandit.fuzzing import BFuzzer
+from probcli.framing import FramedReader
+
+
+def make_served_fuzzer():
+    # A BFuzzer connected to a fake BanditFuzz server which records the
+    # requests and answers them in order.
+    client, server = socket.socketpair()
+    received = {'requests': [], 'state': 0}
+
+    def serve():
+        reader = FramedReader(server, b'\x00')
+        while True:
+            try:
+                request = reader.receive().decode('utf-8').strip()
+            except ConnectionError:
+                break
+            received['requests'].append(request)
+            if request == 'getrand.':
+                received['state'] += 1
+                answer = f"{received['state']},2,3,4"
+            elif request.startswith('mutate('):
+                action = request[:-2].rsplit(',', 1)[1]
+                answer = f"Raw: {action}(raw)\nWD: '{action}'\nEnv: env"
+            else:
+                answer = 'Raw: raw\nWD: \'x = 1\'\nEnv: env'
+            server.sendall(answer.encode('utf-8') + b'\x00')
+        server.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+
+    bfuzzer = BFuzzer('banditfuzz.pl', options=['samp_size(2)'])
+    bfuzzer._socket = client
+    bfuzzer._reader = FramedReader(client, b'\x00')
+    return bfuzzer, received
+
+
+def test_generate_many_piggybacks_random_state():
+    bfuzzer, received = make_served_fuzzer()
+
+    candidates = bfuzzer.generate_many(2)
+    bfuzzer._socket.close()
+
+    assert candidates == [('x = 1', 'raw', 'env', (1, 2, 3, 4)),
+                          ('x = 1', 'raw', 'env', (2, 2, 3, 4))]
+    assert received['requests'] == ['getrand.', 'generate([samp_size(2)]).'] * 2
+
+
+def test_mutate_many():
+    bfuzzer, _ = make_served_fuzzer()
+
+    candidates = bfuzzer.mutate_many('raw', 'env', ['a', 'b'])
+    assert bfuzzer.mutate('raw', 'env', 'c') == ('c', 'c(raw)', 'env')
+    bfuzzer._socket.close()
+
+    assert [c[:3] for c in candidates] == [('a', 'a(raw)', 'env'),
+                                           ('b', 'b(raw)', 'env')]
@@ -1,7 +1,7 @@
 from unittest.mock import patch
 
 from probandit.solver import Solver
-from probandit.__main__ import eval_solvers
+from probandit.__main__ import cross_check_ast, eval_solvers
 
 
 def test_eval_socket_timeout():
@@ -26,3 +26,82 @@ def test_eval_discard_socket_timeout():
                                 discard_socket_timeouts=True)
 
             assert actual == expected
+
+
+def test_eval_parallel_matches_sequential():
+    def solve(self, pred, par2=True, timing_only=False, ast=None):
+        return ('yes', ('solution', {}), 10 * len(self.id))
+
+    with patch.object(Solver, 'solve', autospec=True, side_effect=solve):
+        solvers = [Solver(path='foo', id=id, mock=True)
+                   for id in ['a', 'bb', 'ccc']]
+
+        expected = eval_solvers(solvers, 'pred', samp_size=2)
+        actual = eval_solvers(solvers, 'pred', samp_size=2, max_parallel=3)
+
+        assert actual == expected
+        assert list(actual) == ['a', 'bb', 'ccc']
+
+
+def test_eval_parallel_discard_socket_timeout():
+    def solve(self, pred, par2=True, timing_only=False, ast=None):
+        if self.id == 'bar':
+            raise TimeoutError()
+        return ('yes', ('solution', {}), 10)
+
+    with patch.object(Solver, 'solve', autospec=True, side_effect=solve):
+        with patch('probandit.solver.Solver.restart'):
+            solvers = [Solver(path='foo', id=id, mock=True)
+                       for id in ['foo', 'bar']]
+
+            actual = eval_solvers(solvers, 'pred', max_parallel=2,
+                                  discard_socket_timeouts=True)
+
+            assert actual is None
+
+
+def test_eval_with_ast_skips_parsing():
+    def solve(self, pred, par2=True, timing_only=False, ast=None):
+        return ('yes', ('solution', {}), 10 if ast == 'raw' else 20)
+
+    with patch.object(Solver, 'solve', autospec=True, side_effect=solve):
+        s = Solver(path='foo', id='foo', mock=True)
+
+        actual = eval_solvers([s], 'pred', ast='raw')
+
+        assert actual == {'foo': ('yes', ('solution', {}), 10)}
+
+
+def test_cross_check_ast(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    def solve(self, pred, par2=True, timing_only=False, ast=None):
+        if ast == 'bad':
+            return ('yes', ('contradiction_found', None), 10)
+        return ('yes', ('solution', None), 10)
+
+    with patch.object(Solver, 'solve', autospec=True, side_effect=solve):
+        s = Solver(path='foo', id='foo', mock=True)
+
+        assert cross_check_ast(s, 'pred', 'good')
+        assert not cross_check_ast(s, 'pred', 'bad')
+        assert 'bad' in (tmp_path / 'bf_ast_mismatches.txt').read_text()
+
+
+def test_cross_check_ast_resets_solver(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    def solve(self, pred, par2=True, timing_only=False, ast=None):
+        if ast is None:
+            raise ValueError('parse error')
+        return ('yes', ('solution', None), 10)
+
+    with patch.object(Solver, 'solve', autospec=True, side_effect=solve):
+        with patch.object(Solver, 'restart') as restart:
+            s = Solver(path='foo', id='foo', mock=True)
+
+            assert not cross_check_ast(s, 'pred', 'raw')
+            restart.assert_not_called()
+            assert not cross_check_ast(s, 'pred', 'raw',
+                                       reset_after_solve=True)
+            assert restart.call_count == 2
@@ -0,0 +1,89 @@
+import json
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from probandit.metrics import PhaseMetrics
+from probandit.prefetch import THREAD_NAME
+from probandit.solver import Solver
+import probcli.answerparser as answerparser
+
+
+def test_instrumented_phases(tmp_path):
+    path = tmp_path / 'metrics.jsonl'
+    metrics = PhaseMetrics(str(path))
+    original_restart = Solver.restart
+    metrics.instrument()
+    try:
+        s = Solver(path='foo', mock=True)
+        s.cli = MagicMock()
+        s.cli.parser = None
+        s.restart()
+        s.restart()
+        answerparser.parse_answer('yes([])')
+        phases = metrics.end_iteration(1, action='generate')
+        answerparser.parse_answer('no')
+        metrics.end_iteration(2, action='a')
+    finally:
+        metrics.close()
+
+    assert Solver.restart is original_restart
+    assert metrics.totals['restart'][0] == 2
+    assert metrics.totals['answer_parsing'][0] == 2
+    assert set(phases) == {'restart', 'answer_parsing'}
+    assert metrics.rolling_mean('restart') == phases['restart'] / 2
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r['iteration'] for r in records] == [1, 2]
+    assert records[1]['action'] == 'a'
+    assert set(records[1]['phases']) == {'answer_parsing'}
+
+
+def test_prefetch_thread_phase():
+    metrics = PhaseMetrics()
+    metrics.instrument()
+    try:
+        thread = threading.Thread(target=answerparser.parse_answer,
+                                  args=('no',), name=f'{THREAD_NAME}_0')
+        thread.start()
+        thread.join()
+        answerparser.parse_answer('no')
+    finally:
+        metrics.close()
+
+    assert metrics.totals['prefetch'][0] == 1
+    assert metrics.totals['answer_parsing'][0] == 1
+
+
+def test_rolling_window():
+    metrics = PhaseMetrics(window=2)
+    for duration in [1.0, 2.0, 4.0]:
+        metrics.add('fuzzer', duration)
+        metrics.end_iteration(0)
+
+    assert metrics.rolling_mean('fuzzer') == 3.0
+    assert metrics.totals['fuzzer'] == [3, 7.0]
+
+
+def test_solving_and_transport():
+    answer = "yes([=('Res',contradiction_found),=('Msec',12)])"
+    metrics = PhaseMetrics()
+    metrics.instrument()
+    try:
+        s = Solver(path='foo', mock=True)
+        s.cli = MagicMock()
+        s.cli.parser.parse_to_prolog.return_value = 'truth(none)'
+        s.cli.receive_prolog.side_effect = (
+            lambda compact, lazy: answerparser.parse_answer(answer))
+        s.solve('1=1')
+        metrics.add('receive', 0.05)
+        phases = metrics.end_iteration(1)
+    finally:
+        metrics.close()
+
+    assert phases['solving'] == pytest.approx(0.012)
+    assert phases['transport'] == pytest.approx(
+        0.05 - 0.012 - phases['answer_parsing'])
+    assert Solver.solve.__name__ == 'solve'
+    assert not hasattr(Solver.solve, '__wrapped__')
@@ -0,0 +1,60 @@
+from benchmarks.mockservers import MockBanditFuzz, MockBParser, MockProBCli
+from benchmarks.throughput import MockSetup, bench_fuzzing, bench_replay
+from probandit.fuzzing import BFuzzer
+from probandit.solver import Solver
+from probcli import ProBCli
+from probcli.bparser import BParser, acquire_parser, release_parser
+
+
+def test_solver_against_mock_probcli():
+    with MockProBCli(solution_size=3, msec=(42, 42)) as server, \
+            MockBParser() as parser_server:
+        parser = acquire_parser(ProBCli('mock/probcli').parser_path,
+                                port=parser_server.port)
+        solver = Solver('mock/probcli', id='mock', mock=True)
+        solver.with_cli_at(server.port)
+
+        answer, info, time = solver.solve('x = 1')
+        solver.close()
+        release_parser(parser)
+
+    assert answer == 'yes'
+    assert info == ('solution', {'x': frozenset({1, 2, 3})})
+    assert time == 42
+
+
+def test_bparser_against_mock_parser():
+    with MockBParser(ast_size=2) as server:
+        parser = BParser('probcliparser.jar', port=server.port)
+        ast = parser.parse_to_prolog('x = 1')
+        asts = parser.parse_many(['x = 1', 'x = 2'])
+        parser.close()
+
+    assert ast == 'conjunct(none,[truth(none),truth(none)])'
+    assert asts == [ast, ast]
+    assert server.requests == 3
+
+
+def test_bfuzzer_against_mock_banditfuzz():
+    with MockBanditFuzz(predicate_size=2, actions=['a', 'b']) as server:
+        bfuzzer = BFuzzer('mock')
+        bfuzzer.connect(existing_port=server.port)
+        bfuzzer.set_random_state(1, 2, 3, 4)
+
+        wd, raw, env = bfuzzer.generate()
+        candidates = bfuzzer.mutate_many(raw, env, ['a', 'b'])
+        actions = bfuzzer.list_actions(env)
+        bfuzzer.disconnect()
+
+    assert (wd, raw, env) == ('x0 = 1 & x1 = 1', 'pred(1)', 'env([])')
+    assert [c[0] for c in candidates] == ['x0 = 2 & x1 = 2',
+                                          'x0 = 3 & x1 = 3']
+    assert candidates[0][3] == (2, 2, 3, 4)
+    assert actions == ['a', 'b']
+
+
+def test_benchmarks_run():
+    with MockSetup(solution_size=10) as setup:
+        assert bench_fuzzing(setup, 5) > 0
+        assert bench_replay(setup, 5) > 0
+        assert setup.bf_server.candidates == 10
@@ -0,0 +1,111 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from probandit.parsecache import ParseCache, jar_version
+from probandit.solver import Solver
+
+
+def make_parser(jar='probcliparser.jar'):
+    parser = MagicMock()
+    parser.jar = jar
+    parser.parse_to_prolog.side_effect = lambda pred: f'ast({pred})'
+    return parser
+
+
+def test_cache_parses_once():
+    cache = ParseCache()
+    parser = make_parser()
+
+    assert cache.parse(parser, 'x = 1') == 'ast(x = 1)'
+    assert cache.parse(parser, 'x = 1') == 'ast(x = 1)'
+
+    assert parser.parse_to_prolog.call_count == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cache_distinguishes_jars():
+    cache = ParseCache()
+    parser1 = make_parser('a/probcliparser.jar')
+    parser2 = make_parser('b/probcliparser.jar')
+
+    cache.parse(parser1, 'x = 1')
+    cache.parse(parser2, 'x = 1')
+
+    assert cache.misses == 2
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ParseCache(maxsize=2)
+    parser = make_parser()
+
+    cache.parse(parser, 'a')
+    cache.parse(parser, 'b')
+    cache.parse(parser, 'a')
+    cache.parse(parser, 'c')  # Evicts 'b'
+    cache.parse(parser, 'a')
+    cache.parse(parser, 'b')
+
+    assert len(cache) == 2
+    assert cache.hits == 2
+    assert parser.parse_to_prolog.call_count == 4
+
+
+def test_cache_does_not_store_errors():
+    cache = ParseCache()
+    parser = make_parser()
+    parser.parse_to_prolog.side_effect = ValueError('Parsing failed')
+
+    with pytest.raises(ValueError):
+        cache.parse(parser, 'x = ')
+    assert len(cache) == 0
+
+
+def test_cache_persistence(tmp_path):
+    cache_file = str(tmp_path / 'asts.json')
+    cache = ParseCache()
+    cache.parse(make_parser(), 'x = 1')
+    cache.save(cache_file)
+
+    restored = ParseCache()
+    assert restored.load(cache_file) == 1
+    parser = make_parser()
+    assert restored.parse(parser, 'x = 1') == 'ast(x = 1)'
+    assert parser.parse_to_prolog.call_count == 0
+
+
+def test_jar_version_hashes_contents(tmp_path):
+    jar1 = tmp_path / 'a.jar'
+    jar2 = tmp_path / 'b.jar'
+    jar1.write_bytes(b'parser')
+    jar2.write_bytes(b'parser')
+
+    assert jar_version(str(jar1)) == jar_version(str(jar2))
+    assert jar_version('missing.jar') == 'missing.jar'
+
+
+def test_solver_uses_parse_cache():
+    s1 = Solver(path='foo', mock=True)
+    s2 = Solver(path='bar', mock=True)
+    parser = make_parser('shared/probcliparser.jar')
+    for s in (s1, s2):
+        s.cli = MagicMock()
+        s.cli.parser = parser
+        s.cli.receive_prolog.return_value = ('no', None)
+
+    s1.solve('y = 42')
+    s2.solve('y = 42')
+
+    assert parser.parse_to_prolog.call_count == 1
+
+
+def test_cache_parse_many_parses_missing_only():
+    cache = ParseCache()
+    parser = make_parser()
+    parser.parse_many.side_effect = lambda preds: [
+        None if pred == 'bad' else f'ast({pred})' for pred in preds]
+    cache.parse(parser, 'a')
+
+    assert cache.parse_many(parser, ['a', 'b', 'b', 'bad']) == 1
+    parser.parse_many.assert_called_once_with(['b', 'bad'])
+    assert cache.parse(parser, 'b') == 'ast(b)'
@@ -0,0 +1,71 @@
+from itertools import count
+import time
+from unittest.mock import patch
+
+from probandit.pool import CliPool
+from probandit.solver import Solver
+
+
+class FakeCli():
+    ports = count(5000)
+
+    def __init__(self, path):
+        self.path = path
+        self.parser = None
+        self.closed = False
+
+    def start(self, port=None, args=[]):
+        time.sleep(0.05)
+        return next(self.ports)
+
+    def close(self):
+        self.closed = True
+
+
+def test_pool_hands_out_fresh_instances():
+    with patch('probandit.pool.ProBCli', FakeCli):
+        pool = CliPool('probcli', size=2)
+        cli1, port1 = pool.get()
+        cli2, port2 = pool.get()
+        cli3, port3 = pool.get()
+        pool.close()
+
+        assert len({port1, port2, port3}) == 3
+        assert pool.startups >= 3
+
+
+def test_pool_hides_startup_time():
+    with patch('probandit.pool.ProBCli', FakeCli):
+        pool = CliPool('probcli', size=1)
+        time.sleep(0.2)
+        pool.get()
+        time.sleep(0.2)
+        pool.get()
+        pool.close()
+
+        assert pool.exposed_time < 0.05
+        assert pool.hidden_time() > 0.05
+
+
+def test_pool_retire_closes_instance():
+    with patch('probandit.pool.ProBCli', FakeCli):
+        pool = CliPool('probcli', size=1)
+        cli, _ = pool.get()
+        pool.retire(cli)
+        pool.close()
+
+        assert cli.closed
+
+
+def test_solver_restart_uses_standby():
+    with patch('probandit.pool.ProBCli', FakeCli):
+        s = Solver(path='foo', id='foo', mock=True, standby=1)
+        s.start()
+        first_cli = s.cli
+        s.restart()
+        second_cli = s.cli
+        s.close()
+
+        assert first_cli is not second_cli
+        assert first_cli.closed and second_cli.closed
+        assert s.pool is None
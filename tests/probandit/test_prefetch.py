@@ -0,0 +1,86 @@
+import time
+
+from probandit.agents import BfAgent
+from probandit.prefetch import Prefetcher
+
+
+class FakeFuzzer():
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.generated = 0
+        self.mutated = []
+        self.disconnected = False
+
+    def get_random_state(self):
+        return 1, 2, 3, 4
+
+    def generate(self):
+        time.sleep(self.delay)
+        self.generated += 1
+        return f'pred{self.generated}', f'raw{self.generated}', 'env'
+
+    def mutate(self, raw_ast, env, action):
+        self.mutated.append(action)
+        return f'{action}({raw_ast})', f'{action}({raw_ast})', env
+
+    def generate_many(self, k):
+        return [(*self.generate(), self.get_random_state()) for _ in range(k)]
+
+    def mutate_many(self, raw_ast, env, actions):
+        time.sleep(self.delay)
+        return [(*self.mutate(raw_ast, env, action), self.get_random_state())
+                for action in actions]
+
+    def disconnect(self):
+        self.disconnected = True
+
+
+def test_likely_actions():
+    agent = BfAgent(actions=['a', 'b', 'c'])
+    agent.receive_reward('b', 1)
+    agent.receive_reward('c', 0)
+
+    assert agent.likely_actions(2) == ['b', 'a']
+
+
+def test_prefetched_generate_is_used():
+    fuzzer = FakeFuzzer()
+    prefetcher = Prefetcher(fuzzer)
+
+    assert prefetcher.generate() is None
+    prefetcher.prefetch(None, None)
+    assert prefetcher.generate() == ('pred1', 'raw1', 'env')
+    prefetcher.close()
+
+    assert prefetcher.used == 1
+    assert fuzzer.disconnected
+
+
+def test_prefetch_mutations_of_best_predicate():
+    fuzzer = FakeFuzzer()
+    agent = BfAgent(actions=['a', 'b', 'c'])
+    agent.receive_reward('b', 1)
+    prefetcher = Prefetcher(fuzzer, agent=agent, mutations=2)
+
+    prefetcher.prefetch('raw', 'env')
+    assert prefetcher.mutate('raw', 'env', 'c') is None
+    assert prefetcher.mutate('raw', 'env', 'b') == ('b(raw)', 'b(raw)', 'env')
+    assert prefetcher.mutate('raw', 'env', 'a') == ('a(raw)', 'a(raw)', 'env')
+
+    prefetcher.prefetch('raw', 'env')
+    prefetcher.prefetch('other', 'env')  # The mutation of 'raw' is stale.
+    assert prefetcher.mutate('raw', 'env', 'b') is None
+    prefetcher.close()
+
+
+def test_prefetch_overlap():
+    fuzzer = FakeFuzzer(delay=0.05)
+    prefetcher = Prefetcher(fuzzer)
+
+    prefetcher.prefetch(None, None)
+    time.sleep(0.1)  # Solving
+    prefetcher.generate()
+    prefetcher.close()
+
+    assert prefetcher.overlap() > 0.9
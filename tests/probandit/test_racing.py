@@ -0,0 +1,82 @@
+import threading
+from unittest.mock import patch
+
+from probandit.__main__ import eval_solvers
+from probandit.racing import SolverRace
+from probandit.solver import Solver
+
+
+def test_race_undecided_without_target():
+    race = SolverRace(['tar'], best_margin=100)
+    race.finish('ref', 50)
+
+    assert not race.is_decided()
+    assert not race.is_cancelled()
+
+
+def test_race_cut_off():
+    race = SolverRace(['tar'], best_margin=100)
+    race.finish('ref', 50)
+    race.finish('tar', 120)
+
+    assert race.is_decided()
+    assert race.is_cancelled()
+
+
+def test_race_can_still_win():
+    race = SolverRace(['tar'], best_margin=100)
+    race.finish('ref', 50)
+    race.finish('tar', 500)
+
+    assert not race.is_cancelled()
+
+
+def test_race_skips_remaining_targets():
+    times = {'ref': 50, 'tar1': 60, 'tar2': 5000}
+
+    def solve(self, pred, par2=True, timing_only=False, ast=None):
+        return ('yes', ('solution', None), times[self.id])
+
+    with patch.object(Solver, 'solve', autospec=True,
+                      side_effect=solve) as mock_solve:
+        ref = Solver(path='foo', id='ref', mock=True)
+        targets = [Solver(path='foo', id=id, mock=True)
+                   for id in ['tar1', 'tar2']]
+        race = SolverRace(['tar1', 'tar2'], best_margin=100)
+
+        ref_results = eval_solvers([ref], 'pred', samp_size=3, race=race)
+        tar_results = eval_solvers(targets, 'pred', samp_size=3, race=race)
+
+        assert ref_results == {'ref': ('yes', ('solution', None), 50)}
+        assert tar_results == {'tar1': ('yes', ('solution', None), 60)}
+        assert mock_solve.call_count == 6
+        assert race.skipped_solves == 3
+        assert race.saved_time() == 165
+
+
+def test_race_interrupts_running_solver():
+    slow_started = threading.Event()
+    interrupted = threading.Event()
+
+    def solve(self, pred, par2=True, timing_only=False, ast=None):
+        if self.id == 'slow':
+            slow_started.set()
+            interrupted.wait(5)
+            return ('yes', ('time_out', None), 2500)
+        slow_started.wait(5)
+        return ('yes', ('solution', None), 10)
+
+    with patch.object(Solver, 'solve', autospec=True, side_effect=solve), \
+            patch.object(Solver, 'interrupt', autospec=True,
+                         side_effect=lambda self: interrupted.set()), \
+            patch.object(Solver, 'restart') as mock_restart:
+        solvers = [Solver(path='foo', id=id, mock=True)
+                   for id in ['ref', 'fast', 'slow']]
+        race = SolverRace(['fast', 'slow'], best_margin=0)
+
+        results = eval_solvers(solvers, 'pred', max_parallel=3, race=race)
+
+        assert interrupted.is_set()
+        assert set(results) == {'ref', 'fast'}
+        assert race.interrupted_solves == 1
+        mock_restart.assert_called_once()
@@ -0,0 +1,190 @@
+import logging
+import threading
+import types
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from probandit.__main__ import write_results
+from probandit.parsecache import shared_cache
+from probandit.replay import (pin_solver_sets, preparse, read_csv,
+                              replay_parallel, replay_results, split_shards)
+from probandit.selection import ReplaySelection
+
+RESULTS = {'ref': ('yes', ('solution', {}), 10),
+           'tar': ('yes', ('solution', {}), 25)}
+
+
+def write_csv(path, rows, header='margin,ref,tar,pred,raw_ast\n'):
+    with open(path, 'w') as csv:
+        csv.write(header)
+        for pred, raw_ast, results, margin in rows:
+            write_results(csv, pred, raw_ast, results, margin, ['ref', 'tar'])
+
+
+def test_read_csv_round_trip(tmp_path):
+    path = str(tmp_path / 'results.csv')
+    preds = ['x = 1', 's = "a","b"', 's = ""', 'x = "", y = "\'"']
+    write_csv(path, [(pred, f'raw("{i}")', RESULTS, i + 1)
+                     for i, pred in enumerate(preds)])
+
+    results = list(read_csv(path))
+
+    assert [r['pred'] for r in results] == preds
+    assert [r['raw_ast'] for r in results] == [f'raw("{i}")'
+                                               for i in range(4)]
+    assert results[0] == {'margin': 1, 'ref': 10, 'tar': 25, 'pred': 'x = 1',
+                          'raw_ast': 'raw("0")', 'number': 1}
+
+
+def test_read_csv_missing_solver_columns(tmp_path):
+    path = str(tmp_path / 'results.csv')
+    write_csv(path, [('x = 1', 'raw', {'tar': ('no', None, 7.5)}, 3)])
+
+    [result] = read_csv(path)
+
+    assert result['ref'] is None
+    assert result['tar'] == 7.5
+
+
+def test_read_csv_legacy_rows(tmp_path):
+    path = tmp_path / 'results.csv'
+    path.write_text('margin,ref,tar,pred,raw_ast\n'
+                    '5,1,6,"s = "a"","raw"\n'
+                    '5,1,6,"x = 1","raw(\'a\')"\n')
+
+    results = list(read_csv(str(path)))
+
+    assert [(r['pred'], r['raw_ast']) for r in results] == [
+        ('s = "a"', 'raw'), ('x = 1', "raw('a')")]
+
+
+def test_read_csv_skips_malformed_rows(tmp_path):
+    path = tmp_path / 'results.csv'
+    path.write_text('margin,ref,tar,pred,raw_ast\n'
+                    '5,1,6\n'
+                    '\n'
+                    'x,1,6,"x = 1","raw"\n'
+                    '5,1,6,x = 1,raw\n'
+                    '2,1,3,"x = 2","raw"\n')
+
+    results = list(read_csv(str(path)))
+
+    assert [(r['pred'], r['number']) for r in results] == [('x = 2', 1)]
+
+
+def test_read_csv_streams(tmp_path):
+    path = str(tmp_path / 'results.csv')
+    write_csv(path, [(f'x = {i}', 'raw', RESULTS, i) for i in range(3)])
+
+    reader = read_csv(path)
+
+    assert isinstance(reader, types.GeneratorType)
+    assert next(reader)['pred'] == 'x = 0'
+
+
+def test_replay_results_keeps_skipped_rows():
+    results = iter([{'pred': 'x = 1', 'margin': 10},
+                    {'pred': 'x = 2', 'margin': 0},
+                    {'pred': 'x = 3', 'margin': 20}])
+    with patch('probandit.replay.replay',
+               side_effect=[(5, {}), (40, {})]) as replay:
+        margins = replay_results(results, {}, {}, independent=False)
+
+    assert margins == [(10, 5), (0, None), (20, 40)]
+    assert replay.call_count == 2
+
+
+def test_replay_results_logs_csv_numbers(tmp_path, caplog):
+    path = str(tmp_path / 'results.csv')
+    write_csv(path, [(f'x = {i}', 'raw', RESULTS, i) for i in range(1, 6)])
+    selection = ReplaySelection(min_margin=4)
+    selection.fit(result['margin'] for result in read_csv(path))
+
+    caplog.set_level(logging.INFO)
+    with patch('probandit.replay.replay', return_value=(1, {})):
+        replay_results(selection.filter(read_csv(path)), {}, {},
+                       independent=False)
+
+    assert 'Benchmark 4: Original margin 4, replay margin 1' in caplog.text
+    assert 'Benchmark 5: Original margin 5, replay margin 1' in caplog.text
+
+
+def make_parser(jar):
+    parser = MagicMock()
+    parser.jar = jar
+    parser.parse_many.side_effect = lambda preds: [f'ast({p})' for p in preds]
+    return parser
+
+
+def test_preparse_parses_ahead_in_chunks():
+    shared_cache.clear()
+    parser = make_parser('preparse.jar')
+    solvers = [MagicMock(parse_cache=True, cli=MagicMock(parser=parser))
+               for _ in range(2)]
+    results = [{'pred': f'x = {i}'} for i in range(5)]
+
+    assert list(preparse(iter(results), solvers, chunk_size=2)) == results
+    assert parser.parse_many.call_count == 3
+    assert shared_cache.parse(parser, 'x = 4') == 'ast(x = 4)'
+    shared_cache.clear()
+
+
+def test_preparse_uses_parsers_of_restarted_solvers():
+    shared_cache.clear()
+    old, new = make_parser('old.jar'), make_parser('new.jar')
+    solver = MagicMock(parse_cache=True, cli=MagicMock(parser=old))
+    results = preparse(iter([{'pred': f'x = {i}'} for i in range(4)]),
+                       [solver], chunk_size=2)
+
+    next(results)
+    solver.cli.parser = new  # e.g. after Solver.restart
+    list(results)
+
+    assert old.parse_many.call_count == 1
+    assert new.parse_many.call_count == 1
+    shared_cache.clear()
+
+
+def test_split_shards():
+    assert split_shards(list(range(7)), 3) == [[0, 1, 2], [3, 4], [5, 6]]
+    assert split_shards([1], 3) == [[1], [], []]
+
+
+def test_replay_parallel_merges_in_order():
+    results = [{'pred': f'x = {i}', 'margin': i} for i in range(10)]
+    solver_sets = [({f'tar{k}': None}, {f'ref{k}': None}) for k in range(3)]
+    replayed = {}  # solver set -> replayed predicates in order
+    lock = threading.Lock()
+
+    def replay(result, target_solvers, reference_solvers, **kwargs):
+        with lock:
+            replayed.setdefault(next(iter(target_solvers)), []).append(
+                result['pred'])
+        return 2 * result['margin'], {}
+
+    with patch('probandit.replay.replay', side_effect=replay):
+        margins = replay_parallel(iter(results), solver_sets,
+                                  independent=False)
+
+    assert margins == [(0, None)] + [(i, 2 * i) for i in range(1, 10)]
+    assert replayed == {'tar0': ['x = 1', 'x = 2', 'x = 3'],
+                        'tar1': ['x = 4', 'x = 5', 'x = 6'],
+                        'tar2': ['x = 7', 'x = 8', 'x = 9']}
+
+
+def test_pin_solver_sets():
+    solver_sets = [({f'tar{k}': MagicMock()}, {f'ref{k}': MagicMock()})
+                   for k in range(2)]
+
+    with patch('os.sched_getaffinity', return_value={0, 1, 2, 3},
+               create=True), \
+            patch('os.sched_setaffinity', create=True):
+        pin_solver_sets(solver_sets)
+        with pytest.raises(ValueError):
+            pin_solver_sets(solver_sets * 3)
+
+    for k, (target_solvers, reference_solvers) in enumerate(solver_sets):
+        cpus = {2 * k, 2 * k + 1}
+        target_solvers[f'tar{k}'].pin.assert_called_once_with(cpus)
+        reference_solvers[f'ref{k}'].pin.assert_called_once_with(cpus)
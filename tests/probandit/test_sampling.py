@@ -0,0 +1,107 @@
+from unittest.mock import patch
+
+import pytest
+
+from probandit.__main__ import eval_adaptive
+from probandit.sampling import AdaptiveSampler, _t_quantile
+from probandit.solver import Solver
+
+
+def test_min_samples():
+    sampler = AdaptiveSampler(min_samples=3, max_samples=10)
+
+    assert sampler.needs_more([100, 100], best_margin=0)
+    assert not sampler.needs_more([100, 100, 100], best_margin=0)
+
+
+def test_max_samples():
+    sampler = AdaptiveSampler(min_samples=2, max_samples=4)
+
+    assert sampler.needs_more([-50, 50, -50], best_margin=0)
+    assert not sampler.needs_more([-50, 50, -50, 50], best_margin=0)
+
+
+def test_no_best_margin():
+    sampler = AdaptiveSampler(min_samples=2, max_samples=10)
+
+    assert not sampler.needs_more([-50, 50], best_margin=None)
+
+
+def test_confidence_interval():
+    sampler = AdaptiveSampler(confidence=0.95)
+
+    low, high = sampler.confidence_interval([10, 20, 30, 40])
+
+    # The t-quantile for 3 degrees of freedom is 3.182
+    assert low == pytest.approx(25 - 3.182 * 6.455, abs=0.01)
+    assert high == pytest.approx(25 + 3.182 * 6.455, abs=0.01)
+
+
+def test_t_quantile():
+    assert _t_quantile(0.975, 1) == pytest.approx(12.706, abs=1e-3)
+    assert _t_quantile(0.975, 2) == pytest.approx(4.303, abs=1e-3)
+    assert _t_quantile(0.975, 30) == pytest.approx(2.042, abs=1e-3)
+    assert _t_quantile(0.995, 5) == pytest.approx(4.032, abs=1e-3)
+
+
+def test_eval_adaptive_stops_early():
+    def solve(self, pred, par2=True, timing_only=False, ast=None):
+        return ('yes', ('solution', None), 1000 if self.id == 'tar' else 10)
+
+    with patch.object(Solver, 'solve', autospec=True,
+                      side_effect=solve) as mock_solve:
+        ref = Solver(path='foo', id='ref', mock=True)
+        tar = Solver(path='foo', id='tar', mock=True)
+        sampler = AdaptiveSampler(min_samples=2, max_samples=10)
+
+        results, margins = eval_adaptive([tar], [ref], 'pred', sampler,
+                                         best_margin=500)
+
+        assert margins == [990, 990]
+        assert results['tar'] == ('yes', ('solution', None), 1000)
+        assert mock_solve.call_count == 4
+
+
+def test_eval_adaptive_samples_close_margins():
+    tar_times = iter([100, 300] * 10)
+
+    def solve(self, pred, par2=True, timing_only=False, ast=None):
+        time = next(tar_times) if self.id == 'tar' else 0
+        return ('yes', ('solution', None), time)
+
+    with patch.object(Solver, 'solve', autospec=True, side_effect=solve):
+        ref = Solver(path='foo', id='ref', mock=True)
+        tar = Solver(path='foo', id='tar', mock=True)
+        sampler = AdaptiveSampler(min_samples=2, max_samples=6)
+
+        results, margins = eval_adaptive([tar], [ref], 'pred', sampler,
+                                         best_margin=200)
+
+        assert len(margins) == 6
+        assert results['tar'][2] == 200
+
+
+def test_hopeless_candidates_get_one_sample():
+    sampler = AdaptiveSampler(min_samples=3, max_samples=10)
+
+    assert not sampler.needs_more([0], best_margin=None)
+    assert not sampler.needs_more([-20], best_margin=100)
+    assert not sampler.needs_more([40], best_margin=100)
+    assert sampler.needs_more([60], best_margin=100)
+
+
+def test_eval_adaptive_discards_after_one_round():
+    def solve(self, pred, par2=True, timing_only=False, ast=None):
+        return ('yes', ('solution', None), 10 if self.id == 'tar' else 50)
+
+    with patch.object(Solver, 'solve', autospec=True,
+                      side_effect=solve) as mock_solve:
+        ref = Solver(path='foo', id='ref', mock=True)
+        tar = Solver(path='foo', id='tar', mock=True)
+        sampler = AdaptiveSampler(min_samples=2, max_samples=10)
+
+        results, margins = eval_adaptive([tar], [ref], 'pred', sampler,
+                                         best_margin=500)
+
+        assert margins == [-40]
+        assert mock_solve.call_count == 2
@@ -0,0 +1,87 @@
+import pytest
+
+from probandit.selection import ReplaySelection, summary_statistics
+
+MARGINS = [5, 0, 40, 10, 30, 0, 20, 50, 15, 25]
+
+
+def test_select_all_but_zero_margins():
+    selection = ReplaySelection()
+
+    assert selection.fit(MARGINS) == [0, 2, 3, 4, 6, 7, 8, 9]
+    assert selection.weights == [1.0] * 8
+    assert selection.total == 10
+
+
+def test_select_thresholds_and_top_k():
+    selection = ReplaySelection(min_margin=10, max_margin=40, top_k=3)
+
+    assert selection.fit(MARGINS) == [2, 4, 9]
+    assert selection.population == 3
+
+
+def test_random_sample_is_reproducible():
+    first = ReplaySelection(sample=3, seed=7)
+    second = ReplaySelection(sample=3, seed=7)
+
+    assert first.fit(MARGINS) == second.fit(MARGINS)
+    assert len(first.indices) == 3
+    assert first.weights == [8 / 3] * 3
+
+
+def test_stratified_sample_covers_strata():
+    margins = list(range(1, 101))
+    selection = ReplaySelection(sample=10, strata=5, seed=1)
+    indices = selection.fit(margins)
+
+    assert len(indices) == 10
+    for stratum in range(5):
+        assert sum(1 for i in indices if stratum * 20 <= i < stratum * 20 + 20
+                   ) == 2
+    assert sum(selection.weights) == pytest.approx(100)
+
+
+def test_filter_streams_selected_rows():
+    selection = ReplaySelection(top_k=2)
+    selection.fit(MARGINS)
+    rows = iter([{'margin': m} for m in MARGINS])
+
+    assert list(selection.filter(rows)) == [{'margin': 40}, {'margin': 50}]
+
+
+def test_solver_ids():
+    assert ReplaySelection().solver_ids(['a', 'b']) == ['a', 'b']
+    assert ReplaySelection(solvers=['b']).solver_ids(['a', 'b']) == ['b']
+
+
+def test_weighted_summary_statistics():
+    margins = [(10, 10), (20, -20), (30, None)]
+    stats = summary_statistics(margins, [3.0, 1.0, 1.0])
+
+    assert stats['mean_factor'] == pytest.approx((3 * 1 - 1) / 4)
+    assert stats['reproduced'] == pytest.approx(0.75)
+    assert stats['mean_margin'] == pytest.approx((30 - 20) / 4)
+    assert summary_statistics([(10, None)], [1.0]) is None
+
+
+def test_invalid_selection():
+    with pytest.raises(ValueError):
+        ReplaySelection(top_k=0)
+    with pytest.raises(ValueError):
+        ReplaySelection(strata=0)
+
+
+def test_restrict_recomputes_margins():
+    results = [{'margin': 30, 'ref1': 10, 'ref2': 40, 'tar1': 70, 'tar2': 90},
+               {'margin': 5, 'ref1': 10, 'ref2': None, 'tar1': 15, 'tar2': 80},
+               {'margin': 20, 'ref1': 5, 'ref2': 50, 'tar1': 70, 'tar2': None}]
+    selection = ReplaySelection(solvers=['ref1', 'tar2'], top_k=1)
+
+    restricted = list(selection.restrict(iter(results), ['tar1', 'tar2'],
+                                         ['ref1', 'ref2']))
+
+    assert [r['margin'] for r in restricted] == [80, 70, None]
+    assert restricted[0]['tar1'] == 70
+    assert selection.fit(r['margin'] for r in restricted) == [0]
+    assert list(ReplaySelection().restrict(iter(results), ['tar1'],
+                                           ['ref1'])) == results
@@ -1,4 +1,9 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
 from probandit.solver import Solver
+from probcli.answerparser import parse_answer, parse_term
 
 
 def test_integer_translation():
@@ -182,3 +187,77 @@ def test_singular_cli_preference():
     actual = s._cli_args
 
     assert actual == expected
+
+
+def test_compact_avl_translation():
+    value, _ = parse_term('avl_set(node(int(2),true,1,empty,'
+                          'node(int(3),true,0,empty,empty)))', compact=True)
+
+    s = Solver(path='foo', mock=True)
+
+    expected = {2, 3}
+    actual = s._translate_solution_value(value)
+
+    assert actual == expected
+
+
+def test_compact_solution_translation():
+    answer = ("solution([binding(x,int(1),'1'),"
+              "binding(s,avl_set(node(','(int(1),string(a)),true,0,empty,empty)),"
+              "'[\"a\"]'),binding(e,[],'{}')])")
+    dict_solution, _ = parse_term(answer)
+    compact_solution, _ = parse_term(answer, compact=True)
+
+    s = Solver(path='foo', mock=True)
+
+    expected = {'x': 1, 's': ('a',), 'e': frozenset()}
+    assert s._translate_solution(dict_solution) == expected
+    assert s._translate_solution(compact_solution) == expected
+
+
+def test_timing_only_solve():
+    answer = ("yes([=('Res',solution([binding(x,int(1),'1')])),"
+              "=('Msec',12)])")
+
+    s = Solver(path='foo', mock=True)
+    s.cli = MagicMock()
+    s.cli.parser.parse_to_prolog.return_value = 'truth(none)'
+    s.cli.receive_prolog.side_effect = (
+        lambda compact, lazy: parse_answer(answer, compact=compact, lazy=lazy))
+
+    assert s.solve('1=1') == ('yes', ('solution', {'x': 1}), 12)
+    assert s.solve('1=1', timing_only=True) == ('yes', ('solution', None), 12)
+    assert s.reported_time == pytest.approx(0.024)
+
+
+def test_timing_only_no_solution_found():
+    answer = "yes([=('Res',no_solution_found(reason)),=('Msec',7)])"
+
+    s = Solver(path='foo', mock=True)
+    s.cli = MagicMock()
+    s.cli.parser.parse_to_prolog.return_value = 'truth(none)'
+    s.cli.receive_prolog.side_effect = (
+        lambda compact, lazy: parse_answer(answer, compact=compact, lazy=lazy))
+
+    expected = s.solve('1=1')
+    actual = s.solve('1=1', timing_only=True)
+
+    assert actual == expected
+    assert actual[1] == ('no_solution_found',
+                         [{'type': 'atom', 'value': 'reason'}])
+
+
+def test_pin_restarted_solver():
+    s = Solver(path='foo', mock=True)
+    s.cli = MagicMock()
+    s.cli.cli_process.pid = 42
+
+    with patch('os.sched_setaffinity', create=True) as setaffinity:
+        s.pin({1})
+        s.cli.cli_process.pid = 43
+        s.pool = MagicMock()
+        s.pool.get.return_value = (s.cli, 5000)
+        s.restart()
+
+    assert [c.args for c in setaffinity.call_args_list] == [(42, {1}),
+                                                             (43, {1})]
@@ -0,0 +1,154 @@
+import io
+import sqlite3
+import time
+
+from probandit.__main__ import is_contradiction, write_results
+from probandit.store import ResultStore
+
+RESULTS = {'ref': ('yes', ('solution', {'x': 1}), 10),
+           'tar': ('yes', ('time_out', None), 2510)}
+
+
+def test_store_benchmarks(tmp_path):
+    store = ResultStore(str(tmp_path / 'results.db'))
+    run_id = store.start_run({'fuzzer': {'targets': ['tar']}})
+
+    store.add_benchmark('x = 1', 'raw1', RESULTS, 2500)
+    assert store.contains('x = 1')
+    assert not store.contains('x = 2')
+    store.end_run(iterations=1)
+    store.close()
+
+    conn = sqlite3.connect(str(tmp_path / 'results.db'))
+    assert conn.execute('SELECT pred, margin, run_id FROM benchmarks'
+                        ).fetchall() == [('x = 1', 2500, run_id)]
+    assert conn.execute('SELECT solver, answer, result, time FROM timings '
+                        'ORDER BY solver').fetchall() == [
+        ('ref', 'yes', 'solution', 10), ('tar', 'yes', 'time_out', 2510)]
+    assert conn.execute('SELECT journal_mode FROM pragma_journal_mode'
+                        ).fetchone() == ('wal',)
+
+
+def test_store_detects_duplicates(tmp_path):
+    store = ResultStore(str(tmp_path / 'results.db'))
+    store.start_run()
+    store.add_benchmark('x = 1', 'raw1', RESULTS, 100)
+    store.start_run()
+
+    store.add_benchmark('x = 1', 'raw1', RESULTS, 50)
+    store.add_benchmark('x = 1', 'raw2', RESULTS, 200)
+    store.flush()
+    assert store.duplicates == 2
+
+    rows = store._conn.execute(
+        'SELECT raw_ast, margin, run_id, occurrences FROM benchmarks'
+    ).fetchall()
+    assert rows == [('raw2', 200, store.run_id, 3)]
+    assert store._conn.execute('SELECT COUNT(*) FROM timings'
+                               ).fetchone() == (2,)
+    store.close()
+
+
+def count_benchmarks(reader, expected, timeout=5):
+    deadline = time.time() + timeout
+    while True:
+        count = reader.execute('SELECT COUNT(*) FROM benchmarks'
+                               ).fetchone()[0]
+        if count == expected or time.time() > deadline:
+            return count
+        time.sleep(0.01)
+
+
+def test_store_writes_batches(tmp_path):
+    path = str(tmp_path / 'results.db')
+    store = ResultStore(path, batch_size=3, commit_interval=3600)
+    reader = sqlite3.connect(path)
+
+    store.add_benchmark('x = 1', 'raw', RESULTS, 1)
+    store.add_benchmark('x = 2', 'raw', RESULTS, 2)
+    time.sleep(0.1)
+    assert count_benchmarks(reader, 0) == 0
+    store.add_benchmark('x = 3', 'raw', RESULTS, 3)
+    assert count_benchmarks(reader, 3) == 3
+
+    store.add_benchmark('x = 4', 'raw', RESULTS, 4)
+    store.close()
+    assert count_benchmarks(reader, 4) == 4
+
+
+def test_store_writes_after_commit_interval(tmp_path):
+    path = str(tmp_path / 'results.db')
+    store = ResultStore(path, commit_interval=0.05)
+    reader = sqlite3.connect(path)
+
+    store.add_benchmark('x = 1', 'raw', RESULTS, 1)
+    assert count_benchmarks(reader, 1) == 1
+    store.close()
+
+
+def test_stores_share_database(tmp_path):
+    path = str(tmp_path / 'results.db')
+    first = ResultStore(path, timeout=5)
+    second = ResultStore(path, timeout=5)
+    first.start_run()
+    second.start_run()
+
+    first.add_benchmark('x = 1', 'raw', RESULTS, 10)
+    first.flush()
+    second.add_benchmark('x = 2', 'raw', RESULTS, 20)
+    second.add_benchmark('x = 1', 'raw2', RESULTS, 30)
+    second.flush()
+    first.add_benchmark('x = 1', 'raw1', RESULTS, 5)
+    first.add_contradiction('x = 3', RESULTS)
+    first.end_run()
+    second.end_run()
+
+    rows = first._conn.execute('SELECT pred, raw_ast, margin, occurrences '
+                               'FROM benchmarks ORDER BY pred').fetchall()
+    assert rows == [('x = 1', 'raw2', 30, 3), ('x = 2', 'raw', 20, 1)]
+    first.close()
+    second.close()
+
+
+def test_store_contradictions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = ResultStore(str(tmp_path / 'results.db'))
+    results = {'ref': ('yes', ('solution', {'x': 1}), 10),
+               'tar': ('yes', ('contradiction_found', None), 20)}
+
+    assert is_contradiction(results, 'x = 1', store=store)
+    store.flush()
+    assert store._conn.execute('SELECT pred FROM contradictions'
+                               ).fetchall() == [('x = 1',)]
+    store.close()
+
+
+def test_export_csv_matches_write_results(tmp_path):
+    store = ResultStore(str(tmp_path / 'results.db'))
+    store.add_benchmark('x = 1', 'raw1', RESULTS, 2500, sampling=(3, 1.5))
+    store.add_benchmark('x = 2', 'raw2', {'ref': ('no', None, 5)}, 7,
+                        sampling=(1, 0.0))
+    csv = io.StringIO()
+    assert store.export_csv(csv) == 2
+    store.close()
+
+    expected = io.StringIO()
+    expected.write('margin,ref,tar,samples,variance,pred,raw_ast\n')
+    write_results(expected, 'x = 1', 'raw1', RESULTS, 2500, ['ref', 'tar'],
+                  sampling=(3, 1.5))
+    write_results(expected, 'x = 2', 'raw2', {'ref': ('no', None, 5)}, 7,
+                  ['ref', 'tar'], sampling=(1, 0.0))
+    assert csv.getvalue() == expected.getvalue()
+
+
+def test_run_bf_stores_new_best_candidates(tmp_path, make_bfuzzer,
+                                           run_fuzzing):
+    store = ResultStore(str(tmp_path / 'results.db'))
+    store.start_run()
+    run_fuzzing(make_bfuzzer(), stop_after=3, store=store)
+    store.flush()
+
+    rows = store._conn.execute('SELECT pred, margin FROM benchmarks '
+                               'ORDER BY id').fetchall()
+    assert rows == [('x = 1', 1), ('x = 2', 2), ('x = 3', 3)]
+    store.close()
@@ -1,4 +1,8 @@
-from probcli.answerparser import parse_term, translate_prolog_dot_list, translate_bindings
+import pytest
+
+from probcli.answerparser import (Compound, Var, parse_answer, parse_term,
+                                  to_dict_term, translate_bindings,
+                                  translate_prolog_dot_list)
 
 
 def test_parse_atom_basic():
@@ -164,3 +168,95 @@ def test_empty_set_parse():
                            {'type': 'atom', 'value': '{}'}])}
     assert result == expected
     assert rest == ''
+
+
+def test_parse_atom_quoted_escape():
+    answer = "'it\\'s'"
+    result, rest = parse_term(answer)
+    assert result == {'type': 'atom', 'value': "it\\'s"}
+    assert rest == ''
+
+
+def test_parse_term_returns_rest():
+    answer = "foo(X, 1), bar"
+    result, rest = parse_term(answer)
+    assert result == {'type': 'compound', 'value': ('foo', [
+        {'type': 'variable', 'value': 'X'},
+        {'type': 'number', 'value': 1}
+    ])}
+    assert rest == ', bar'
+
+
+def test_parse_long_list():
+    answer = '[' + ','.join(str(i) for i in range(100000)) + ']'
+    result, rest = parse_term(answer)
+    assert len(result['value']) == 100000
+    assert result['value'][-1] == {'type': 'number', 'value': 99999}
+    assert rest == ''
+
+
+def test_parse_long_dot_list():
+    n = 100000
+    answer = "'.'(0, " * n + '[]' + ')' * n
+    result, rest = parse_term(answer)
+    lst = translate_prolog_dot_list(result)
+    assert len(lst) == n
+    assert lst[0] == {'type': 'number', 'value': 0}
+    assert rest == ''
+
+
+def test_parse_deeply_nested_list():
+    n = 100000
+    answer = '[' * n + 'a' + ']' * n
+    result, rest = parse_term(answer)
+    depth = 0
+    while result['type'] == 'list':
+        result = result['value'][0]
+        depth += 1
+    assert depth == n
+    assert result == {'type': 'atom', 'value': 'a'}
+    assert rest == ''
+
+
+def test_parse_unclosed_compound():
+    with pytest.raises(ValueError):
+        parse_term('foo(a, b')
+
+
+def test_parse_compact():
+    answer = "foo(X, [a, 1], '{}')"
+    result, rest = parse_term(answer, compact=True)
+    assert result == Compound('foo', [Var('X'), ['a', 1], '{}'])
+    assert isinstance(result.args[0], Var)
+    assert rest == ''
+
+
+def test_compact_to_dict_term():
+    answer = "binding(f,[X],{})"
+    expected, _ = parse_term(answer)
+    compact, _ = parse_term(answer, compact=True)
+    assert to_dict_term(compact) == expected
+
+
+def test_compact_dot_list_translation():
+    answer = "'.'(a, '.'(b, []))"
+    result, _ = parse_term(answer, compact=True)
+    assert translate_prolog_dot_list(result) == ['a', 'b']
+
+
+def test_parse_answer_compact():
+    answer = "yes('.'(=('Res', solution([])), '.'(=('Msec', 12), [])))"
+    response, info = parse_answer(answer, compact=True)
+    assert response == 'yes'
+    assert info == {'Res': Compound('solution', [[]]), 'Msec': 12}
+
+
+def test_parse_answer_lazy():
+    answer = ("yes('.'(=('Res', solution([binding(x, int(1), 'a,(b')])), "
+              "'.'(=('Msec', 12), [])))")
+    response, info = parse_answer(answer, lazy=True)
+    _, expected = parse_answer(answer)
+    assert response == 'yes'
+    assert info['Res'].functor == 'solution'
+    assert info['Msec'].functor is None
+    assert {k: v.term for k, v in info.items()} == expected
@@ -0,0 +1,111 @@
+import socket
+import threading
+from unittest.mock import MagicMock, patch
+
+from probcli import bparser
+from probcli.bparser import (BParser, acquire_parser, release_parser,
+                             shutdown_parsers)
+from probcli.framing import FramedReader
+
+
+class FakeParser():
+    started = 0
+
+    def __init__(self, jar_path, port=None):
+        FakeParser.started += 1
+        self.jar = jar_path
+        self.startup_time = 1.5
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_parser_is_shared_per_jar():
+    with patch('probcli.bparser.BParser', FakeParser):
+        FakeParser.started = 0
+        p1 = acquire_parser('/tmp/a/probcliparser.jar')
+        p2 = acquire_parser('/tmp/a/probcliparser.jar')
+        p3 = acquire_parser('/tmp/b/probcliparser.jar')
+
+        assert p1 is p2
+        assert p1 is not p3
+        assert FakeParser.started == 2
+
+        release_parser(p1)
+        assert not p1.closed
+        release_parser(p2)
+        assert p1.closed
+
+        release_parser(p3)
+        assert p3.closed
+        assert not bparser._shared
+
+
+def test_released_parser_is_restarted():
+    with patch('probcli.bparser.BParser', FakeParser):
+        p1 = acquire_parser('/tmp/a/probcliparser.jar')
+        release_parser(p1)
+        p2 = acquire_parser('/tmp/a/probcliparser.jar')
+        release_parser(p2)
+
+        assert p1 is not p2
+
+
+def test_shutdown_closes_all_parsers():
+    with patch('probcli.bparser.BParser', FakeParser):
+        p1 = acquire_parser('/tmp/a/probcliparser.jar')
+        acquire_parser('/tmp/a/probcliparser.jar')
+        shutdown_parsers()
+
+        assert p1.closed
+        assert not bparser._shared
+
+
+def make_served_parser():
+    # A BParser connected to a fake -prepl server which answers each
+    # predicate command with its text wrapped in ast(...).
+    client, server = socket.socketpair()
+
+    def serve():
+        lines = server.makefile('rb')
+        for command in lines:
+            if command == b'halt\n':
+                break
+            text = next(lines).decode('utf-8').strip()
+            if text == 'bad':
+                answer = "parse_exception(pos(1,1),'Unexpected token').\n"
+            else:
+                answer = f'ast({text}).\n'
+            server.sendall(answer.encode('utf-8'))
+        server.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+
+    parser = object.__new__(BParser)
+    parser.jar = 'probcliparser.jar'
+    parser.process = MagicMock()
+    parser._socket = client
+    parser._reader = FramedReader(client, b'\n')
+    parser._lock = threading.Lock()
+    return parser
+
+
+def test_parse_many_keeps_order():
+    parser = make_served_parser()
+    texts = [f'x = {i}' for i in range(200)]
+
+    actual = parser.parse_many(texts, window=16)
+    parser.close()
+
+    assert actual == [f'ast({text})' for text in texts]
+
+
+def test_parse_many_failures():
+    parser = make_served_parser()
+
+    actual = parser.parse_many(['x = 1', 'bad', 'x = 2'])
+    assert parser.parse_to_prolog('x = 3') == 'ast(x = 3)'
+    parser.close()
+
+    assert actual == ['ast(x = 1)', None, 'ast(x = 2)']
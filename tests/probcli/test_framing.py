@@ -0,0 +1,64 @@
+import socket
+import threading
+
+import pytest
+
+from probcli.framing import FramedReader
+
+
+def test_receive_single_message():
+    a, b = socket.socketpair()
+    with a, b:
+        a.sendall(b'yes(foo)\x01')
+        reader = FramedReader(b, b'\x01')
+
+        assert reader.receive() == b'yes(foo)'
+        assert reader.pending() == 0
+
+
+def test_receive_keeps_leftover():
+    a, b = socket.socketpair()
+    with a, b:
+        a.sendall(b'first\x00second\x00thi')
+        reader = FramedReader(b, b'\x00')
+
+        assert reader.receive() == b'first'
+        assert reader.receive() == b'second'
+        assert reader.pending() == 3
+
+        a.sendall(b'rd\x00')
+        assert reader.receive() == b'third'
+
+
+def test_receive_split_terminator():
+    a, b = socket.socketpair()
+    with a, b:
+        reader = FramedReader(b, b'\r\n', bufsize=4)
+        a.sendall(b'abcdef\r')
+        a.sendall(b'\nnext\r\n')
+
+        assert reader.receive() == b'abcdef'
+        assert reader.receive() == b'next'
+
+
+def test_receive_large_message():
+    a, b = socket.socketpair()
+    with a, b:
+        payload = b'x' * 1000000
+        reader = FramedReader(b, b'\x01', bufsize=1024)
+        sender = threading.Thread(target=a.sendall, args=(payload + b'\x01',))
+        sender.start()
+
+        assert reader.receive() == payload
+        sender.join()
+
+
+def test_receive_closed_connection():
+    a, b = socket.socketpair()
+    with b:
+        a.sendall(b'incomplete')
+        a.close()
+        reader = FramedReader(b, b'\x01')
+
+        with pytest.raises(ConnectionError):
+            reader.receive()